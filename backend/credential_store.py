@@ -0,0 +1,441 @@
+"""
+Armazenamento de Credenciais por Registro
+SQLite (WAL) com uma linha criptografada por (usuário, ferramenta): leituras e
+escritas tocam apenas a credencial afetada, e cada escrita é uma transação.
+As escritas passam por uma thread em segundo plano que agrupa rajadas de
+atualizações em um único commit (criptografia e I/O fora do event loop)
+"""
+import os
+import json
+import time
+import logging
+import sqlite3
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Dict, Any, Optional, Iterable, Tuple, List
+
+logger = logging.getLogger(__name__)
+
+# user_id usado para credenciais de sistema (Tipo B)
+SYSTEM_USER = ""
+
+# Maior caractere Unicode: user_id < prefixo + _MAX_CHAR cobre todos os
+# user_ids que começam com o prefixo (busca por faixa no índice)
+_MAX_CHAR = "\U0010ffff"
+
+
+class CredentialStore:
+    """
+    Guarda credenciais criptografadas (Fernet) em SQLite, uma linha por
+    (user_id, tool_name). Credenciais de sistema usam user_id vazio.
+    """
+
+    def __init__(self, path: str, cipher, flush_window: float = None):
+        self.path = path
+        self.cipher = cipher
+        self._lock = threading.Lock()
+
+        # Janela (segundos) em que atualizações são agrupadas em um commit
+        if flush_window is None:
+            flush_window = float(os.getenv("VAULT_FLUSH_WINDOW_MS", "50")) / 1000
+        self.flush_window = flush_window
+        # Tentativas de gravar um lote (ex: banco bloqueado por outro processo)
+        self.write_attempts = max(1, int(os.getenv("VAULT_WRITE_ATTEMPTS", "3")))
+
+        # Escritas pendentes: (user_id, tool_name) -> registro + futures
+        # "_flushing" guarda o lote sendo gravado, para leituras consistentes
+        self._cond = threading.Condition()
+        self._pending: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._flushing: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._barriers: List[Future] = []
+        self._closed = False
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # FULL: cada commit faz fsync do WAL (durável quando o future resolve)
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS credentials (
+                user_id TEXT NOT NULL,
+                tool_name TEXT NOT NULL,
+                tool_type TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (user_id, tool_name)
+            ) WITHOUT ROWID
+        """)
+        # Usado para descobrir o que outros processos alteraram
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_credentials_updated_at ON credentials (updated_at)"
+        )
+        # Ferramenta -> usuários: filtro "tool" da listagem paginada
+        # (usuário -> ferramentas usa a chave primária)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_credentials_tool ON credentials (tool_name, user_id)"
+        )
+        # Geração da listagem de ferramentas (ETag de /api/admin/tools): os
+        # triggers a incrementam quando uma credencial é criada, removida ou
+        # muda de tipo, mas não quando apenas o conteúdo (ex: token) é renovado
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('tools_generation', 0)")
+        for name, event in (
+            ("insert", "AFTER INSERT ON credentials"),
+            ("delete", "AFTER DELETE ON credentials"),
+            ("type", "AFTER UPDATE OF tool_type ON credentials WHEN OLD.tool_type != NEW.tool_type")
+        ):
+            self._conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS credentials_tools_{name} {event}
+                BEGIN
+                    UPDATE meta SET value = value + 1 WHERE key = 'tools_generation';
+                END
+            """)
+
+        self._writer = threading.Thread(target=self._writer_loop, name="vault-writer", daemon=True)
+        self._writer.start()
+
+    def _encrypt(self, credentials: Dict[str, Any]) -> bytes:
+        return self.cipher.encrypt(json.dumps(credentials).encode())
+
+    def _decrypt(self, payload: bytes) -> Dict[str, Any]:
+        return json.loads(self.cipher.decrypt(payload).decode())
+
+    def put(
+        self,
+        user_id: str,
+        tool_name: str,
+        tool_type: str,
+        credentials: Dict[str, Any]
+    ) -> Future:
+        """
+        Agenda a gravação de uma credencial (não bloqueia)
+        A credencial fica visível para leituras imediatamente
+
+        Returns:
+            Future resolvido quando a gravação estiver durável em disco
+        """
+        future: Future = Future()
+        key = (user_id, tool_name)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("CredentialStore fechado")
+            previous = self._pending.get(key)
+            self._pending[key] = {
+                "tool_type": tool_type,
+                "credentials": credentials,
+                "updated_at": datetime.now().isoformat(),
+                # Atualizações repetidas da mesma chave viram uma única escrita
+                "futures": (previous["futures"] if previous else []) + [future]
+            }
+            self._cond.notify()
+        return future
+
+    def flush(self) -> Future:
+        """
+        Future resolvido quando todas as escritas agendadas até agora
+        estiverem duráveis
+        """
+        future: Future = Future()
+        with self._cond:
+            if not self._pending and not self._flushing:
+                future.set_result(None)
+                return future
+            self._barriers.append(future)
+            self._cond.notify()
+        return future
+
+    def close(self, timeout: float = None):
+        """Grava o que estiver pendente, encerra a thread de escrita e fecha o banco"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._writer.join(timeout)
+        # Com a thread ainda gravando (timeout), a conexão fica aberta
+        if not self._writer.is_alive():
+            with self._lock:
+                self._conn.close()
+
+    def _writer_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._barriers and not self._closed:
+                    self._cond.wait()
+                if self._closed and not self._pending and not self._barriers:
+                    return
+
+            # Esperar a janela para agrupar a rajada de atualizações
+            if not self._closed:
+                time.sleep(self.flush_window)
+
+            with self._cond:
+                batch, self._pending = self._pending, {}
+                barriers, self._barriers = self._barriers, []
+                self._flushing = batch
+
+            futures = [f for record in batch.values() for f in record["futures"]] + barriers
+            try:
+                error = self._write_batch(batch)
+            finally:
+                with self._cond:
+                    self._flushing = {}
+
+            for future in futures:
+                if error is None:
+                    future.set_result(None)
+                else:
+                    future.set_exception(error)
+
+    def _write_batch(self, batch: Dict[Tuple[str, str], Dict[str, Any]]) -> Optional[Exception]:
+        """
+        Grava o lote, repetindo falhas (ex: banco bloqueado) até
+        write_attempts vezes
+
+        Returns:
+            None se gravou; a última exceção se todas as tentativas falharam
+            (o lote é descartado e os futures recebem a exceção)
+        """
+        records = [
+            (user_id, tool_name, record["tool_type"], record["credentials"])
+            for (user_id, tool_name), record in batch.items()
+        ]
+        for attempt in range(self.write_attempts):
+            try:
+                self.put_many(records)
+                return None
+            except Exception as e:
+                error = e
+                if attempt < self.write_attempts - 1:
+                    logger.warning("Falha ao gravar %d credencial(is) no cofre, tentando de novo: %s", len(records), e)
+                    time.sleep(0.1 * 2 ** attempt)
+        logger.error(
+            "Credenciais não gravadas após %d tentativas (%s): %s",
+            self.write_attempts,
+            ", ".join(f"{tool_name}/{user_id or 'sistema'}" for user_id, tool_name, _, _ in records),
+            error
+        )
+        return error
+
+    def _pending_record(self, key: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            return self._pending.get(key) or self._flushing.get(key)
+
+    def put_many(self, records: Iterable[Tuple[str, str, str, Dict[str, Any]]]):
+        """
+        Insere ou atualiza várias credenciais em uma única transação (síncrono)
+        Usado pela thread de escrita; a transação garante que o lote é
+        gravado por inteiro ou não é gravado
+        """
+        now = datetime.now().isoformat()
+        rows = [
+            (user_id, tool_name, tool_type, self._encrypt(credentials), now, now)
+            for user_id, tool_name, tool_type, credentials in records
+        ]
+        if not rows:
+            return
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.executemany("""
+                    INSERT INTO credentials
+                        (user_id, tool_name, tool_type, payload, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (user_id, tool_name) DO UPDATE SET
+                        tool_type = excluded.tool_type,
+                        payload = excluded.payload,
+                        updated_at = excluded.updated_at
+                """, rows)
+
+    def get(self, user_id: str, tool_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Busca uma credencial
+
+        Returns:
+            {"type", "credentials", "created_at", "updated_at"} ou None
+        """
+        pending = self._pending_record((user_id, tool_name))
+        if pending is not None:
+            return {
+                "type": pending["tool_type"],
+                "credentials": pending["credentials"],
+                "created_at": pending["updated_at"],
+                "updated_at": pending["updated_at"]
+            }
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT tool_type, payload, created_at, updated_at FROM credentials "
+                "WHERE user_id = ? AND tool_name = ?",
+                (user_id, tool_name)
+            ).fetchone()
+        if row is None:
+            return None
+        tool_type, payload, created_at, updated_at = row
+        return {
+            "type": tool_type,
+            "credentials": self._decrypt(payload),
+            "created_at": created_at,
+            "updated_at": updated_at
+        }
+
+    def data_version(self) -> int:
+        """
+        Muda sempre que outra conexão (outro processo) grava no banco
+        As gravações deste processo não alteram o valor
+        """
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def changed_since(self, since: str) -> List[Tuple[str, str]]:
+        """Chaves (user_id, tool_name) gravadas a partir de `since` (ISO 8601)"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT user_id, tool_name FROM credentials WHERE updated_at >= ?",
+                (since,)
+            ).fetchall()
+
+    def tools_generation(self) -> int:
+        """
+        Número que muda sempre que a lista de ferramentas muda (inclusive por
+        gravações de outros processos); não inclui escritas ainda pendentes
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT value FROM meta WHERE key = 'tools_generation'"
+            ).fetchone()[0]
+
+    def list_tools(
+        self,
+        cursor: str = None,
+        limit: int = None,
+        tool: str = None,
+        user_prefix: str = None
+    ) -> Dict[str, Any]:
+        """
+        Lista ferramentas de sistema e ferramentas por usuário (sem descriptografar),
+        paginada por usuário: até `limit` usuários após `cursor` (o último
+        user_id da página anterior). Percorre apenas os índices, então o custo
+        depende do tamanho da página e não do total de usuários. Escritas
+        ainda pendentes não aparecem (use flush antes)
+
+        Args:
+            cursor: next_cursor da página anterior (None na primeira)
+            limit: usuários por página (None para todos)
+            tool: apenas credenciais desta ferramenta
+            user_prefix: apenas usuários cujo user_id começa com o prefixo
+
+        Returns:
+            {"system_tools", "user_tools", "next_cursor", "generation"};
+            system_tools só vem na primeira página
+        """
+        # Um único limite inferior: com dois, o SQLite pode escolher o menos
+        # seletivo e percorrer o índice desde o início
+        if user_prefix and (cursor or SYSTEM_USER) < user_prefix:
+            conditions = ["user_id >= ?"]
+            params: List[Any] = [user_prefix]
+        else:
+            conditions = ["user_id > ?"]
+            params = [cursor or SYSTEM_USER]
+        if user_prefix:
+            conditions.append("user_id < ?")
+            params.append(user_prefix + _MAX_CHAR)
+        if tool:
+            conditions.append("tool_name = ?")
+            params.append(tool)
+        where = " AND ".join(conditions)
+        # Um usuário a mais indica se existe próxima página
+        page_limit = -1 if limit is None else limit + 1
+
+        with self._lock:
+            # Leituras na mesma transação: geração e listagem do mesmo estado
+            self._conn.execute("BEGIN")
+            try:
+                generation = self._conn.execute(
+                    "SELECT value FROM meta WHERE key = 'tools_generation'"
+                ).fetchone()[0]
+                rows = self._conn.execute(f"""
+                    SELECT user_id, tool_name FROM credentials
+                    WHERE user_id IN (
+                        SELECT DISTINCT user_id FROM credentials
+                        WHERE {where}
+                        ORDER BY user_id LIMIT ?
+                    ){" AND tool_name = ?" if tool else ""}
+                    ORDER BY user_id, tool_name
+                """, params + [page_limit] + ([tool] if tool else [])).fetchall()
+                system_rows = []
+                if not cursor:
+                    system_rows = self._conn.execute(
+                        "SELECT tool_name FROM credentials WHERE user_id = ?"
+                        + (" AND tool_name = ?" if tool else "")
+                        + " ORDER BY tool_name",
+                        [SYSTEM_USER] + ([tool] if tool else [])
+                    ).fetchall()
+            finally:
+                self._conn.execute("COMMIT")
+
+        user_tools: Dict[str, list] = {}
+        for user_id, tool_name in rows:
+            user_tools.setdefault(user_id, []).append(tool_name)
+        next_cursor = None
+        if limit is not None and len(user_tools) > limit:
+            user_tools.pop(next(reversed(user_tools)))
+            next_cursor = next(reversed(user_tools)) if user_tools else None
+
+        result: Dict[str, Any] = {}
+        if not cursor:
+            result["system_tools"] = [tool_name for (tool_name,) in system_rows]
+        result.update(user_tools=user_tools, next_cursor=next_cursor, generation=generation)
+        return result
+
+    def migrate_from_json(self, json_path: str) -> int:
+        """
+        Importa o formato antigo (credentials/vault.json, blob Fernet único)
+        Registros já existentes no banco não são sobrescritos. Ao final o
+        arquivo antigo é renomeado para <arquivo>.migrated
+
+        Um arquivo ilegível (corrompido ou de outra chave) não impede a
+        inicialização, como no cofre antigo; mas, em vez de ser descartado,
+        fica onde está e a migração é tentada de novo na próxima inicialização
+        (ex: depois de restaurar a chave certa)
+
+        Returns:
+            Quantidade de registros importados
+        """
+        if not os.path.exists(json_path):
+            return 0
+
+        now = datetime.now().isoformat()
+        try:
+            with open(json_path, "rb") as f:
+                data = self._decrypt(f.read())
+            rows = []
+            for tool_name, entry in data.get("tools", {}).items():
+                rows.append((SYSTEM_USER, tool_name, entry.get("type", "system_static"),
+                             self._encrypt(entry.get("credentials", {})),
+                             entry.get("created_at", now), now))
+            for user_id, tools in data.get("users", {}).items():
+                for tool_name, entry in tools.items():
+                    rows.append((user_id, tool_name, entry.get("type", "user_oauth"),
+                                 self._encrypt(entry.get("credentials", {})),
+                                 entry.get("created_at", now), now))
+        except Exception as e:
+            logger.error("Cofre antigo %s ilegível (corrompido ou de outra chave), não migrado: %r", json_path, e)
+            return 0
+
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.executemany("""
+                    INSERT OR IGNORE INTO credentials
+                        (user_id, tool_name, tool_type, payload, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, rows)
+
+        os.replace(json_path, json_path + ".migrated")
+        return len(rows)
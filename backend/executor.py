@@ -0,0 +1,117 @@
+"""
+Executor de Planos
+Executa as ações de um ExecutionPlan respeitando dependências (DAG),
+rodando ações independentes em paralelo com limite de concorrência
+"""
+import asyncio
+import os
+from typing import Dict, Any, List, Tuple, AsyncIterator
+
+from backend.mcp_hub import MCPHub
+from backend.models import ExecutionPlan
+from backend.tracing import span
+
+
+class PlanExecutor:
+    """
+    Executa ações de um plano como um grafo de dependências
+    Ações sem dependência pendente rodam em paralelo (até max_concurrency)
+    e os resultados são devolvidos na ordem do plano
+    """
+
+    def __init__(self, mcp_hub: MCPHub, max_concurrency: int = None):
+        self.mcp_hub = mcp_hub
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv("MAX_PARALLEL_ACTIONS", "4"))
+        self.max_concurrency = max(1, max_concurrency)
+
+    @staticmethod
+    def _dependencies(plan: ExecutionPlan, index: int) -> List[int]:
+        """
+        Dependências válidas de uma ação
+        Apenas ações anteriores são aceitas, o que garante um grafo sem ciclos
+        """
+        return sorted({
+            dep for dep in plan.actions[index].depends_on
+            if isinstance(dep, int) and 0 <= dep < index
+        })
+
+    def _start(
+        self,
+        plan: ExecutionPlan,
+        user_id: str
+    ) -> List[asyncio.Task]:
+        """Cria uma task por ação; cada uma aguarda suas dependências"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks: List[asyncio.Task] = []
+
+        async def run(index: int) -> Dict[str, Any]:
+            action = plan.actions[index]
+            with span("action", index=index, tool=action.tool_name):
+                # Aguardar dependências antes de ocupar uma vaga de execução
+                dependencies = self._dependencies(plan, index)
+                with span("dependency_wait", depends_on=dependencies):
+                    for dep in dependencies:
+                        dep_result = await tasks[dep]
+                        if dep_result.get("status") != "success":
+                            return {
+                                "status": "error",
+                                "tool_name": action.tool_name,
+                                "error": f"Ação ignorada: a ação {dep} da qual ela depende falhou"
+                            }
+
+                with span("queue_wait"):
+                    await semaphore.acquire()
+                try:
+                    return await self.mcp_hub.execute_action(
+                        action.tool_name,
+                        action.parameters,
+                        user_id
+                    )
+                finally:
+                    semaphore.release()
+
+        # Como cada ação só depende de ações anteriores, as tasks das
+        # dependências sempre existem quando uma task começa a aguardá-las
+        for index in range(len(plan.actions)):
+            tasks.append(asyncio.create_task(run(index)))
+        return tasks
+
+    async def execute(
+        self,
+        plan: ExecutionPlan,
+        user_id: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Executa todas as ações do plano
+
+        Args:
+            plan: Plano gerado pelo Router
+            user_id: ID do usuário
+
+        Returns:
+            Lista de resultados na mesma ordem de plan.actions
+        """
+        return list(await asyncio.gather(*self._start(plan, user_id)))
+
+    async def execute_iter(
+        self,
+        plan: ExecutionPlan,
+        user_id: str
+    ) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Executa o plano e produz (índice, resultado) à medida que cada
+        ação termina (ordem de conclusão, não a do plano)
+        """
+        tasks = self._start(plan, user_id)
+
+        async def indexed(index: int) -> Tuple[int, Dict[str, Any]]:
+            return index, await tasks[index]
+
+        try:
+            for next_done in asyncio.as_completed([indexed(i) for i in range(len(tasks))]):
+                yield await next_done
+        finally:
+            # Cliente desconectou no meio do stream: não deixar tasks órfãs
+            for task in tasks:
+                task.cancel()
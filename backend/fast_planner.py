@@ -0,0 +1,276 @@
+"""
+Planejador Rápido
+Gera planos de execução sem LLM para os formatos de comando mais comuns
+(criar evento no Calendar, avisar em um canal do Slack)
+"""
+import os
+import re
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+from backend.models import Action, ExecutionPlan
+from backend.utils import parse_relative_date
+
+_CALENDAR_VERBS = r"(?:marque|marca|marcar|agende|agenda|agendar|crie|criar|adicione|adicionar|coloque|colocar)"
+_SLACK_VERBS = (
+    r"(?:avise|avisar|envie|enviar|mande|mandar|poste|postar|publique|publicar|"
+    r"notifique|notificar|informe|informar|escreva|escrever|diga|dizer)"
+)
+
+# Separa comandos compostos: "marque ... e avise ...", "marque .... Depois avise ..."
+_CLAUSE_SPLIT_RE = re.compile(
+    rf"(?:[,;]?\s+e\s+|,\s*|\.\s+|;\s*)(?=(?:(?:depois|também|tambem|então|entao)\s+)?(?:{_CALENDAR_VERBS}|{_SLACK_VERBS})\b)",
+    re.IGNORECASE
+)
+_CALENDAR_RE = re.compile(rf"^\s*(?:por favor,?\s+)?{_CALENDAR_VERBS}\b\s*(?P<rest>.*)$", re.IGNORECASE | re.DOTALL)
+_SLACK_RE = re.compile(
+    rf"^\s*(?:por favor,?\s+)?(?:depois\s+|também\s+|tambem\s+|então\s+|entao\s+)?{_SLACK_VERBS}\b\s*(?P<rest>.*)$",
+    re.IGNORECASE | re.DOTALL
+)
+
+_DATE_RE = re.compile(
+    r"\b(?:para\s+|pra\s+|no\s+dia\s+|dia\s+|em\s+)?"
+    r"(?P<date>depois de amanh[ãa]|amanh[ãa]|hoje|\d{1,2}/\d{1,2}(?:/\d{4})?)\b",
+    re.IGNORECASE
+)
+_START_TIME_RE = re.compile(
+    r"\b(?:(?:às|as|a\s+partir\s+das|das|de)\s+)?(?P<hour>\d{1,2})(?:\s*h\s*|:(?=\d{2}))(?P<minute>\d{2})?\b(?:\s*min)?",
+    re.IGNORECASE
+)
+_END_TIME_RE = re.compile(
+    r"\b(?:até|ate|às|as|-)\s*(?:às\s+|as\s+)?(?P<hour>\d{1,2})(?:\s*h\s*|:(?=\d{2}))(?P<minute>\d{2})?\b",
+    re.IGNORECASE
+)
+_CALENDAR_TARGET_RE = re.compile(
+    r"\b(?:no|na|em)\s+(?:meu\s+|minha\s+)?(?:google\s+)?(?:calendar|calendário|calendario|agenda)\b",
+    re.IGNORECASE
+)
+_DURATION_RE = re.compile(
+    r"\b(?:de|por|durante|com\s+dura[çc][ãa]o\s+de)\s+(?P<amount>\d{1,3}|uma|um|meia)\s*"
+    r"(?P<unit>minutos?|min|horas?)\b",
+    re.IGNORECASE
+)
+_LEADING_ARTICLE_RE = re.compile(r"^(?:uma|um|a|o)\s+", re.IGNORECASE)
+
+# Sobras que indicam um trecho não entendido pelas regras (título, horário
+# por extenso, outra ação); nesses casos o título não é confiável
+_UNPARSED_RE = re.compile(
+    rf"#|\b(?:e|depois|também|tambem|então|entao|chamad[oa]|intitulad[oa]|t[íi]tulo|"
+    rf"dura[çc][ãa]o|minutos?|horas?|às|até|{_CALENDAR_VERBS}|{_SLACK_VERBS})\b",
+    re.IGNORECASE
+)
+_SLACK_AUDIENCE_RE = re.compile(
+    r"^(?:(?:o|a|os|as|um|uma)\s+)?(?:pessoal|time|equipe|galera|todos|todo\s+mundo|mensagem|aviso|recado|lembrete)?$",
+    re.IGNORECASE
+)
+
+_CHANNEL_RE = re.compile(r"(?:\b(?:no|na|em|pro|para\s+o)\s+)?(?:canal\s+)?#(?P<channel>[\w\-]+)", re.IGNORECASE)
+_SLACK_TARGET_RE = re.compile(r"\b(?:do|no|pelo)\s+slack\b", re.IGNORECASE)
+_QUOTED_RE = re.compile(r"[\"“](?P<text>[^\"”]+)[\"”]")
+_MESSAGE_RE = re.compile(r"^\s*(?:,|:|que|dizendo(?:\s+que)?|com\s+a\s+mensagem)\s*:?\s*(?P<message>.+)$", re.IGNORECASE | re.DOTALL)
+
+# Mensagens que se referem ao evento criado antes (ex: "a reunião foi marcada")
+_REFERS_TO_EVENT_RE = re.compile(r"\b(?:reuni[ãa]o|evento|marcad[oa]|agendad[oa]|criad[oa])\b", re.IGNORECASE)
+
+
+class FastPlanner:
+    """
+    Planejador determinístico baseado em expressões regulares
+    Retorna um ExecutionPlan completo com um score de confiança; o Router
+    só chama o LLM quando a confiança fica abaixo do limiar
+    """
+
+    def __init__(self, threshold: float = None):
+        if threshold is None:
+            threshold = float(os.getenv("FAST_PLANNER_THRESHOLD", "0.8"))
+        self.threshold = threshold
+
+    def plan(self, prompt: str) -> ExecutionPlan:
+        """
+        Gera plano a partir do prompt
+
+        Returns:
+            ExecutionPlan com confidence entre 0 e 1 (0 se algum trecho do
+            comando não foi reconhecido)
+        """
+        actions: List[Action] = []
+        confidence = 1.0
+
+        for clause in self._split_clauses(prompt):
+            parsed = self._parse_calendar(clause) or self._parse_slack(clause)
+            if parsed is None:
+                confidence = 0.0
+                continue
+
+            tool_name, parameters, clause_confidence = parsed
+            depends_on = []
+            if tool_name == "slack" and _REFERS_TO_EVENT_RE.search(parameters["message"]):
+                depends_on = [
+                    i for i, action in enumerate(actions)
+                    if action.tool_name == "google_calendar"
+                ]
+            actions.append(Action(tool_name=tool_name, parameters=parameters, depends_on=depends_on))
+            confidence = min(confidence, clause_confidence)
+
+        if not actions:
+            confidence = 0.0
+
+        return ExecutionPlan(
+            actions=actions,
+            reasoning="Plano gerado pelo planejador rápido (regras)",
+            confidence=round(confidence, 2)
+        )
+
+    def is_confident(self, plan: ExecutionPlan) -> bool:
+        """Indica se o plano pode ser usado sem consultar o LLM"""
+        return bool(plan.actions) and (plan.confidence or 0.0) >= self.threshold
+
+    @staticmethod
+    def _split_clauses(prompt: str) -> List[str]:
+        clauses = _CLAUSE_SPLIT_RE.split(prompt.strip())
+        return [c.strip().rstrip(".!") for c in clauses if c and c.strip(" .!")]
+
+    @staticmethod
+    def _parse_calendar(clause: str) -> Optional[Tuple[str, Dict[str, Any], float]]:
+        match = _CALENDAR_RE.match(clause)
+        if not match:
+            return None
+        # Trechos reconhecidos viram "\0": o que sobra entre eles é o título
+        rest = match.group("rest")
+        confidence = 1.0
+
+        date_match = _DATE_RE.search(rest)
+        if date_match:
+            date_str = date_match.group("date")
+            if not _is_valid_date(date_str):
+                return None
+            rest = _blank(rest, date_match.start(), date_match.end())
+        else:
+            # Sem data explícita: assume hoje, mas o LLM deve confirmar
+            date_str = "hoje"
+            confidence = min(confidence, 0.5)
+
+        duration = None
+        duration_match = _DURATION_RE.search(rest)
+        if duration_match:
+            duration = _duration_minutes(duration_match.group("amount"), duration_match.group("unit"))
+            rest = _blank(rest, duration_match.start(), duration_match.end())
+
+        start_match = _START_TIME_RE.search(rest)
+        if start_match:
+            time_str = _time_str(start_match)
+            if time_str is None:
+                return None
+            rest = _blank(rest, start_match.start(), start_match.end())
+            end_match = _END_TIME_RE.search(rest, start_match.end())
+            if end_match and end_match.start() - start_match.end() <= 3:
+                end_str = _time_str(end_match)
+                if end_str is None:
+                    return None
+                rest = _blank(rest, end_match.start(), end_match.end())
+            else:
+                end_str = None
+        else:
+            time_str = "10:00"
+            end_str = None
+            confidence = min(confidence, 0.5)
+
+        start_time, end_time = parse_relative_date(date_str, time_str)
+        if end_str:
+            explicit_end, _ = parse_relative_date(date_str, end_str)
+            if explicit_end > start_time:
+                end_time = explicit_end
+        elif duration:
+            end_time = (datetime.fromisoformat(start_time) + timedelta(minutes=duration)).isoformat()
+
+        pieces = []
+        for piece in rest.split("\0"):
+            piece = _CALENDAR_TARGET_RE.sub(" ", piece)
+            piece = re.sub(r"\s+", " ", piece).strip(" ,.-:")
+            if piece:
+                pieces.append(_LEADING_ARTICLE_RE.sub("", piece))
+
+        title = " ".join(pieces)
+        if len(pieces) > 1 or _UNPARSED_RE.search(title):
+            # Texto fora do padrão "verbo título data horário": o LLM decide
+            confidence = min(confidence, 0.3)
+        if not title:
+            title = "Evento"
+            confidence = min(confidence, 0.6)
+        else:
+            title = title[0].upper() + title[1:]
+
+        return "google_calendar", {
+            "title": title,
+            "start_time": start_time,
+            "end_time": end_time,
+            "description": ""
+        }, confidence
+
+    @staticmethod
+    def _parse_slack(clause: str) -> Optional[Tuple[str, Dict[str, Any], float]]:
+        match = _SLACK_RE.match(clause)
+        if not match:
+            return None
+        rest = match.group("rest")
+
+        channel_match = _CHANNEL_RE.search(rest)
+        if not channel_match:
+            return None
+        channel = f"#{channel_match.group('channel')}"
+
+        quoted = _QUOTED_RE.search(rest)
+        if quoted:
+            message = quoted.group("text").strip()
+        else:
+            after = _SLACK_TARGET_RE.sub(" ", rest[channel_match.end():])
+            message_match = _MESSAGE_RE.match(after)
+            message = message_match.group("message").strip() if message_match else ""
+
+        if not message:
+            return "slack", {"channel": channel, "message": ""}, 0.3
+
+        confidence = 1.0
+        before = _QUOTED_RE.sub(" ", _SLACK_TARGET_RE.sub(" ", rest[:channel_match.start()]))
+        if not _SLACK_AUDIENCE_RE.match(re.sub(r"\s+", " ", before).strip(" ,.:")):
+            # Destinatário ou conteúdo antes do canal que as regras não entendem
+            confidence = 0.5
+        if not quoted and "#" in message:
+            confidence = 0.5
+
+        message = message[0].upper() + message[1:]
+        if message[-1] not in ".!?":
+            message += "."
+        return "slack", {"channel": channel, "message": message}, confidence
+
+
+def _blank(text: str, start: int, end: int) -> str:
+    """Marca o trecho [start, end) como reconhecido, preservando as posições"""
+    return text[:start] + "\0" * (end - start) + text[end:]
+
+
+def _time_str(match: "re.Match") -> Optional[str]:
+    """Horário HH:MM de um match de horário, ou None se for inválido (ex: 25h)"""
+    hour = int(match.group("hour"))
+    minute = int(match.group("minute") or 0)
+    if hour > 23 or minute > 59:
+        return None
+    return f"{hour}:{minute:02d}"
+
+
+def _is_valid_date(date_str: str) -> bool:
+    """Rejeita datas numéricas inexistentes (ex: 31/02)"""
+    if "/" not in date_str:
+        return True
+    parts = [int(p) for p in date_str.split("/")]
+    try:
+        datetime(parts[2] if len(parts) == 3 else 2000, parts[1], parts[0])
+    except ValueError:
+        return False
+    return True
+
+
+def _duration_minutes(amount: str, unit: str) -> int:
+    value = {"um": 1, "uma": 1, "meia": 0.5}.get(amount.lower())
+    value = value if value is not None else int(amount)
+    return int(value * 60) if unit.lower().startswith("h") else int(value)
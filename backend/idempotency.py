@@ -0,0 +1,190 @@
+"""
+Chaves de Idempotência
+Deduplica requisições repetidas (ex: o usuário clica em "Executar" de novo):
+enquanto a original roda, as repetições aguardam o mesmo resultado; depois,
+recebem o resultado guardado até o TTL expirar
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Awaitable, Optional, Tuple
+
+from backend.shared_state import SharedStateStore, CLAIMED, RUNNING, DONE, CONFLICT
+
+
+CONFLICT_MESSAGE = "Chave de idempotência já utilizada com uma requisição diferente"
+
+
+class IdempotencyConflict(Exception):
+    """A chave já foi usada com um conteúdo de requisição diferente"""
+
+
+async def _resolved(value: Any) -> Any:
+    return value
+
+
+def request_fingerprint(payload: Dict[str, Any]) -> str:
+    """Hash estável do conteúdo da requisição (para detectar reuso indevido da chave)"""
+    data = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Execuções indexadas por (user_id, chave)
+
+    A execução roda em uma task própria, desacoplada da conexão: se o
+    cliente desconectar, ela termina e o resultado fica disponível para a
+    nova tentativa. Execuções que falham com exceção são descartadas, para
+    que a próxima tentativa rode de novo.
+
+    Com vários workers, `shared` (SharedStateStore) registra as chaves no
+    SQLite compartilhado: só um processo executa, e repetições em outro
+    processo aguardam o resultado consultando o banco a cada
+    IDEMPOTENCY_POLL_INTERVAL segundos (padrão 0.2)
+
+    Configuração: IDEMPOTENCY_TTL (segundos, padrão 600) e
+    IDEMPOTENCY_MAX_ENTRIES (padrão 10000)
+    """
+
+    def __init__(self, ttl: float = None, max_entries: int = None, shared: Optional[SharedStateStore] = None):
+        if ttl is None:
+            ttl = float(os.getenv("IDEMPOTENCY_TTL", "600"))
+        if max_entries is None:
+            max_entries = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.shared = shared
+        self.poll_interval = float(os.getenv("IDEMPOTENCY_POLL_INTERVAL", "0.2"))
+        # (user_id, chave) -> {"fingerprint", "task", "expires_at"}
+        # Em andamento ficam em _running; concluídas vão para o fim de
+        # _completed, que fica em ordem de expiração (TTL único): a limpeza
+        # só olha o início da fila
+        self._running: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._completed: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.joined = 0
+        self.misses = 0
+
+    async def begin(
+        self,
+        user_id: str,
+        key: str,
+        fingerprint: str,
+        factory: Callable[[], Awaitable[Any]]
+    ) -> Tuple[asyncio.Task, bool]:
+        """
+        Retorna a execução da chave, iniciando-a com factory() se não existir
+
+        Returns:
+            (task, True) se a execução foi iniciada agora; (task, False) se é
+            uma repetição (em andamento ou já concluída, neste ou em outro worker)
+
+        Raises:
+            IdempotencyConflict: se a chave foi usada com outro conteúdo
+        """
+        self._prune()
+        entry_key = (user_id, key)
+        repeated = self._repeated(entry_key, fingerprint)
+        if repeated is not None:
+            return repeated, False
+        if self.shared is None:
+            return self._start(entry_key, fingerprint, factory), True
+
+        state, result = await asyncio.to_thread(self.shared.claim, user_id, key, fingerprint)
+        # Outra requisição deste processo pode ter registrado a chave durante o await
+        repeated = self._repeated(entry_key, fingerprint)
+        if repeated is not None:
+            return repeated, False
+        if state == CONFLICT:
+            raise IdempotencyConflict(CONFLICT_MESSAGE)
+        if state == DONE:
+            self.hits += 1
+            return asyncio.create_task(_resolved(result)), False
+        if state == RUNNING:
+            self.joined += 1
+            return asyncio.create_task(self._await_shared(user_id, key, fingerprint, factory)), False
+        return self._start(entry_key, fingerprint, lambda: self._run_shared(user_id, key, factory)), True
+
+    def _repeated(self, entry_key: Tuple[str, str], fingerprint: str) -> Optional[asyncio.Task]:
+        """Execução local da chave (em andamento ou concluída), se houver"""
+        entry = self._running.get(entry_key) or self._completed.get(entry_key)
+        if entry is None:
+            return None
+        if entry["fingerprint"] != fingerprint:
+            raise IdempotencyConflict(CONFLICT_MESSAGE)
+        if entry["task"].done():
+            self.hits += 1
+        else:
+            self.joined += 1
+        return entry["task"]
+
+    def _start(self, entry_key: Tuple[str, str], fingerprint: str, factory: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        self.misses += 1
+        task = asyncio.create_task(factory())
+        entry = {"fingerprint": fingerprint, "task": task, "expires_at": None}
+        self._running[entry_key] = entry
+        task.add_done_callback(lambda t: self._finish(entry_key, entry, t))
+        return task
+
+    async def _run_shared(self, user_id: str, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Executa e publica o resultado para os outros workers (ou libera a chave se falhar)"""
+        try:
+            result = await factory()
+        except BaseException:
+            await asyncio.shield(asyncio.to_thread(self.shared.release, user_id, key))
+            raise
+        await asyncio.to_thread(self.shared.complete, user_id, key, result, self.ttl)
+        return result
+
+    async def _await_shared(
+        self,
+        user_id: str,
+        key: str,
+        fingerprint: str,
+        factory: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Aguarda a execução de outro worker; se ela falhar (chave liberada), executa aqui"""
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            state, result = await asyncio.to_thread(self.shared.claim, user_id, key, fingerprint)
+            if state == DONE:
+                return result
+            if state == CONFLICT:
+                raise IdempotencyConflict(CONFLICT_MESSAGE)
+            if state == CLAIMED:
+                return await self._run_shared(user_id, key, factory)
+
+    def _finish(self, entry_key: Tuple[str, str], entry: Dict[str, Any], task: asyncio.Task):
+        if self._running.get(entry_key) is not entry:
+            return
+        del self._running[entry_key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        entry["expires_at"] = time.monotonic() + self.ttl
+        self._completed[entry_key] = entry
+
+    def _prune(self):
+        """Remove resultados expirados e, acima do limite, os concluídos mais antigos"""
+        now = time.monotonic()
+        while self._completed:
+            entry_key, entry = next(iter(self._completed.items()))
+            if entry["expires_at"] > now:
+                break
+            del self._completed[entry_key]
+
+        while self._completed and len(self._running) + len(self._completed) >= self.max_entries:
+            self._completed.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._running) + len(self._completed),
+            "in_flight": len(self._running),
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "joined": self.joined,
+            "misses": self.misses
+        }
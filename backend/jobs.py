@@ -0,0 +1,227 @@
+"""
+Execução Assíncrona (jobs)
+O cliente envia o comando e recebe um job_id na hora; um conjunto fixo de
+workers executa plano → ações → consolidação, e o cliente consulta (ou
+aguarda) o resultado. A fila tem tamanho máximo: quando cheia, novos jobs
+são recusados em vez de acumular tasks no event loop
+"""
+import asyncio
+import os
+import time
+import uuid
+from typing import Dict, Any, Callable, Awaitable, Optional, List
+
+from backend.shared_state import SharedStateStore
+
+
+class JobQueueFull(Exception):
+    """Fila de jobs cheia; retry_after sugere quando tentar de novo (segundos)"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Fila de execução cheia, tente novamente mais tarde")
+        self.retry_after = retry_after
+
+
+class JobManager:
+    """
+    Fila limitada de jobs com um pool de workers
+
+    Configuração:
+    - JOB_WORKERS: jobs executados ao mesmo tempo (padrão 4)
+    - JOB_QUEUE_SIZE: jobs aguardando na fila (padrão 100)
+    - JOB_TTL: segundos que o resultado fica disponível (padrão 3600)
+
+    Com vários workers, `shared` (SharedStateStore) publica cada mudança de
+    estado no SQLite compartilhado: o job roda no worker que o recebeu, mas
+    pode ser consultado (e aguardado) em qualquer worker
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+    def __init__(
+        self,
+        runner: Callable[[Any], Awaitable[Dict[str, Any]]],
+        workers: int = None,
+        max_queue: int = None,
+        ttl: float = None,
+        shared: Optional[SharedStateStore] = None
+    ):
+        if workers is None:
+            workers = int(os.getenv("JOB_WORKERS", "4"))
+        if max_queue is None:
+            max_queue = int(os.getenv("JOB_QUEUE_SIZE", "100"))
+        if ttl is None:
+            ttl = float(os.getenv("JOB_TTL", "3600"))
+        self.runner = runner
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.ttl = ttl
+        self.shared = shared
+        self.poll_interval = float(os.getenv("JOB_POLL_INTERVAL", "0.2"))
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._done_events: Dict[str, asyncio.Event] = {}
+
+        # Média móvel da duração dos jobs (para estimar o Retry-After)
+        self._avg_duration = 5.0
+        self.submitted = 0
+        self.rejected = 0
+
+    def start(self):
+        """Cria a fila e os workers (chamar com o event loop rodando)"""
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(), name=f"job-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self):
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    async def submit(self, payload: Any, user_id: str) -> Dict[str, Any]:
+        """
+        Enfileira um job
+
+        Raises:
+            JobQueueFull: se a fila estiver cheia
+            RuntimeError: se start() ainda não foi chamado
+        """
+        if self._queue is None:
+            raise RuntimeError("JobManager não iniciado: chame start() antes de enviar jobs")
+        self._prune()
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "user_id": user_id,
+            "status": self.QUEUED,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None
+        }
+        if self._queue.full():
+            self.rejected += 1
+            raise JobQueueFull(self.retry_after())
+
+        # Com vários workers, o job é publicado antes de entrar na fila: as
+        # gravações seguintes (início e fim) vêm do worker, em ordem
+        if self.shared is not None:
+            try:
+                await asyncio.to_thread(self.shared.prune_jobs)
+            except Exception:
+                pass
+            await self._publish(job)
+        try:
+            self._queue.put_nowait((job_id, payload))
+        except asyncio.QueueFull:
+            # A fila encheu durante a publicação: o job recusado não pode
+            # ficar visível como "queued" nos outros workers
+            self.rejected += 1
+            if self.shared is not None:
+                try:
+                    await asyncio.to_thread(self.shared.delete_job, job_id)
+                except Exception:
+                    pass
+            raise JobQueueFull(self.retry_after())
+
+        self._jobs[job_id] = job
+        self._done_events[job_id] = asyncio.Event()
+        self.submitted += 1
+        return dict(job)
+
+    async def _publish(self, job: Dict[str, Any]):
+        """
+        Grava o estado do job no banco compartilhado (com vários workers)
+        Uma falha na gravação não interrompe o job: ele segue visível no
+        worker que o executa
+        """
+        if self.shared is None:
+            return
+        try:
+            await asyncio.to_thread(self.shared.put_job, dict(job), self.ttl)
+        except Exception:
+            pass
+
+    def retry_after(self) -> int:
+        """Estimativa de segundos até abrir vaga na fila (um job terminar)"""
+        return max(1, round(self._avg_duration / self.workers))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Aguarda o job terminar por até timeout segundos (long-poll)"""
+        if job_id in self._jobs or self.shared is None:
+            event = self._done_events.get(job_id)
+            if event is not None and timeout > 0:
+                try:
+                    await asyncio.wait_for(event.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            return self.get(job_id)
+
+        # Job de outro worker: consultar o banco compartilhado até terminar
+        deadline = time.monotonic() + timeout
+        while True:
+            job = await asyncio.to_thread(self.shared.get_job, job_id)
+            if job is None or job["finished_at"] is not None or time.monotonic() >= deadline:
+                return job
+            await asyncio.sleep(min(self.poll_interval, max(0.0, deadline - time.monotonic())))
+
+    async def _worker(self):
+        while True:
+            job_id, payload = await self._queue.get()
+            job = self._jobs.get(job_id)
+            try:
+                if job is None:
+                    continue
+                job["status"] = self.RUNNING
+                job["started_at"] = time.time()
+                await self._publish(job)
+                try:
+                    job["result"] = await self.runner(payload)
+                    job["status"] = self.SUCCEEDED
+                except Exception as e:
+                    job["error"] = str(e)
+                    job["status"] = self.FAILED
+                job["finished_at"] = time.time()
+                duration = job["finished_at"] - job["started_at"]
+                self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+                await self._publish(job)
+                self._done_events.pop(job_id).set()
+            finally:
+                self._queue.task_done()
+
+    def _prune(self):
+        """Remove jobs concluídos há mais de ttl segundos"""
+        cutoff = time.time() - self.ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["finished_at"] is not None and job["finished_at"] < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {
+            "workers": self.workers,
+            "queue_size": self._queue.qsize() if self._queue else 0,
+            "max_queue": self.max_queue,
+            "jobs": counts,
+            "avg_duration": round(self._avg_duration, 3),
+            "submitted": self.submitted,
+            "rejected": self.rejected
+        }
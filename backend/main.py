@@ -2,12 +2,19 @@
 Gateway Unificado - Backend principal
 Passo 2: O "Porteiro" - ponto único de entrada para todas as requisições
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Header, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal, Callable, Tuple
 from dotenv import load_dotenv
-import uvicorn
+import os
+import csv
+import json
+import asyncio
+import importlib
+import time
+from contextlib import asynccontextmanager
 
 # Carregar variáveis de ambiente
 load_dotenv()
@@ -15,8 +22,79 @@ load_dotenv()
 from backend.router import Router
 from backend.vault import Vault
 from backend.mcp_hub import MCPHub
+from backend.executor import PlanExecutor
+from backend.models import ExecutionPlan
+from backend.plan_cache import normalize_prompt
+from backend.idempotency import IdempotencyStore, IdempotencyConflict, request_fingerprint
+from backend.jobs import JobManager, JobQueueFull
+from backend.shared_state import SharedStateStore
+from backend.metrics import EXECUTIONS_IN_FLIGHT, InFlightMiddleware, render as render_metrics
+from backend import tracing
+from backend.utils import parse_events_csv, parse_events_ics, default_end_time, worker_count
 
-app = FastAPI(title="Gateway Inteligente", version="1.0.0")
+# Componentes criados no lifespan: importar o módulo não constrói nada nem
+# carrega os SDKs pesados (Gemini, Google, Slack, cryptography)
+router: Optional[Router] = None
+vault: Optional[Vault] = None
+mcp_hub: Optional[MCPHub] = None
+executor: Optional[PlanExecutor] = None
+idempotency = IdempotencyStore()
+
+# Limites do endpoint de lote
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+# Limite de tamanho dos arquivos de eventos (.ics/.csv); o número de eventos
+# por lote segue BATCH_MAX_ITEMS
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(5 * 1024 * 1024)))
+
+
+def _preload_sdks():
+    """Importa os SDKs em segundo plano, para a primeira requisição não pagar o custo"""
+    for module in ("google.generativeai", "googleapiclient.discovery", "google_auth_oauthlib.flow", "slack_sdk"):
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Inicializa os componentes e as tarefas em segundo plano (renovação
+    proativa de tokens, sincronização entre workers e workers de jobs);
+    na saída, encerra tudo e grava credenciais pendentes
+    """
+    global router, vault, mcp_hub, executor
+    router = Router()
+    vault = Vault()
+    mcp_hub = MCPHub(vault)
+    executor = PlanExecutor(mcp_hub)
+    
+    # Com vários workers, chaves de idempotência e jobs vão para o SQLite
+    # compartilhado (a repetição ou a consulta pode cair em outro processo)
+    shared_state = SharedStateStore() if worker_count() > 1 else None
+    idempotency.shared = shared_state
+    job_manager.shared = shared_state
+    
+    token_refresher = asyncio.create_task(vault.run_token_refresher())
+    vault_watcher = asyncio.create_task(vault.run_change_watcher())
+    job_manager.start()
+    if os.getenv("PRELOAD_SDKS", "1") == "1":
+        asyncio.get_running_loop().run_in_executor(None, _preload_sdks)
+    
+    try:
+        yield
+    finally:
+        token_refresher.cancel()
+        vault_watcher.cancel()
+        await job_manager.stop()
+        if shared_state is not None:
+            shared_state.close()
+        # Gravar credenciais pendentes antes de sair
+        await asyncio.to_thread(vault.close)
+
+
+app = FastAPI(title="Gateway Inteligente", version="1.0.0", lifespan=lifespan)
 
 # CORS para permitir comunicação com frontend
 app.add_middleware(
@@ -26,17 +104,48 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-
-# Inicializar componentes
-router = Router()
-vault = Vault()
-mcp_hub = MCPHub(vault)
+app.add_middleware(InFlightMiddleware)
 
 
 class UserRequest(BaseModel):
     """Modelo para requisição do usuário"""
     prompt: str
     user_id: Optional[str] = "default_user"
+    # "template" (padrão, sem LLM), "llm" (resposta escrita pelo modelo)
+    # ou "none" (apenas "details", sem consolidação)
+    response_mode: Literal["template", "llm", "none"] = "template"
+    # Repetições com a mesma chave não executam as ações de novo
+    # (também aceita o header Idempotency-Key)
+    idempotency_key: Optional[str] = None
+    # Inclui em "timing" a árvore de spans da execução (planejamento, cada
+    # ação com credenciais e chamada ao serviço, consolidação e filas)
+    debug: bool = False
+
+
+class BatchRequest(BaseModel):
+    """Vários comandos executados em uma única requisição"""
+    requests: List[UserRequest]
+
+
+class CalendarEvent(BaseModel):
+    """Evento para criação em lote"""
+    title: str
+    start_time: str
+    end_time: Optional[str] = None
+    description: Optional[str] = ""
+
+
+class BulkEventsRequest(BaseModel):
+    """Modelo para criação de eventos em lote"""
+    events: List[CalendarEvent]
+    user_id: Optional[str] = "default_user"
+
+
+class BroadcastRequest(BaseModel):
+    """Modelo para envio da mesma mensagem a vários canais do Slack"""
+    channels: List[str]
+    message: str
+    user_id: Optional[str] = "default_user"
 
 
 class ToolConfig(BaseModel):
@@ -56,40 +165,378 @@ async def root():
     }
 
 
+async def _run_execution(
+    request: UserRequest,
+    plan: Optional[ExecutionPlan] = None,
+    queued_at: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Planeja (se o plano não for informado), executa e consolida um comando
+    queued_at (time.perf_counter) marca quando o comando entrou em uma fila,
+    para o span "queue_wait" do modo debug
+    """
+    with tracing.trace("execute", enabled=request.debug, start=queued_at, user_id=request.user_id) as current:
+        if queued_at is not None:
+            tracing.add_span("queue_wait", queued_at, time.perf_counter())
+        with EXECUTIONS_IN_FLIGHT.labels().track():
+            # Passo 3: Roteamento Inteligente
+            if plan is None:
+                with tracing.span("planning"):
+                    plan = await router.plan_execution(request.prompt, request.user_id)
+            else:
+                tracing.annotate(plan="precomputed")
+            
+            # Passo 4: Executar ações via Hub de MCPs (independentes em paralelo)
+            with tracing.span("execution", actions=len(plan.actions)):
+                results = await executor.execute(plan, request.user_id)
+            
+            # Passo 6: Consolidação de Respostas
+            with tracing.span("consolidation", mode=request.response_mode):
+                consolidated_response = await router.consolidate_response(
+                    request.prompt,
+                    results,
+                    mode=request.response_mode
+                )
+    
+    result = {
+        "success": True,
+        "response": consolidated_response,
+        "details": results
+    }
+    if current is not None:
+        result["timing"] = await _publish_timing(current)
+    return result
+
+
+async def _publish_timing(current: tracing.Trace) -> Dict[str, Any]:
+    """Serializa o trace e, com TRACE_FILE definido, grava no arquivo JSONL"""
+    timing = current.to_dict()
+    if os.getenv("TRACE_FILE"):
+        await asyncio.to_thread(tracing.write_trace, timing)
+    return timing
+
+
+def _idempotency_fingerprint(request: UserRequest) -> str:
+    return request_fingerprint({"prompt": request.prompt, "response_mode": request.response_mode})
+
+
+async def _execute(
+    request: UserRequest,
+    key: Optional[str] = None,
+    plan: Optional[ExecutionPlan] = None,
+    queued_at: Optional[float] = None
+) -> Tuple[Dict[str, Any], bool]:
+    """
+    Executa o comando, deduplicando pela chave de idempotência (se houver)
+    
+    Returns:
+        (resultado, True se veio de uma execução anterior com a mesma chave)
+    
+    Raises:
+        IdempotencyConflict: se a chave foi usada com outro comando
+    """
+    key = request.idempotency_key or key
+    if not key:
+        return await _run_execution(request, plan, queued_at), False
+    
+    task, started = await idempotency.begin(
+        request.user_id,
+        key,
+        _idempotency_fingerprint(request),
+        lambda: _run_execution(request, plan, queued_at)
+    )
+    # shield: se o cliente desconectar, a execução continua para a repetição
+    return await asyncio.shield(task), not started
+
+
+async def _run_job(payload: Tuple[UserRequest, float]) -> Dict[str, Any]:
+    request, queued_at = payload
+    result, _ = await _execute(request, queued_at=queued_at)
+    return result
+
+
+job_manager = JobManager(_run_job)
+
+
 @app.post("/api/execute")
-async def execute_command(request: UserRequest):
+async def execute_command(
+    request: UserRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """
     Endpoint principal: recebe comando em linguagem natural e executa
     Passo 2: Gateway Unificado
+    
+    Com chave de idempotência, repetições aguardam/recebem o resultado da
+    primeira execução (header "Idempotent-Replayed: true")
+    
+    Com "debug": true, a resposta inclui "timing": spans com início relativo
+    (start_ms) e duração (duration_ms); com TRACE_FILE, o trace também é
+    gravado nesse arquivo (JSON lines)
     """
     try:
-        # Passo 3: Roteamento Inteligente
-        plan = await router.plan_execution(request.prompt, request.user_id)
-        
-        # Passo 4: Executar ações via Hub de MCPs
-        results = []
-        for action in plan.actions:
-            result = await mcp_hub.execute_action(
-                action.tool_name,
-                action.parameters,
-                request.user_id
+        result, replayed = await _execute(request, idempotency_key)
+        if replayed:
+            response.headers["Idempotent-Replayed"] = "true"
+        return result
+    
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/execute/batch")
+async def execute_batch(batch: BatchRequest):
+    """
+    Executa vários comandos em uma requisição
+    
+    Os planos são gerados juntos (planejador rápido, cache e prompts
+    agrupados em poucas chamadas ao LLM); os comandos rodam com
+    concorrência limitada (BATCH_MAX_CONCURRENCY) e cada um é devolvido ao
+    terminar, como uma linha JSON (NDJSON): {"index", "success",
+    "response", "details"} ou {"index", "success": false, "error"}
+    """
+    if len(batch.requests) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Máximo de {BATCH_MAX_ITEMS} comandos por lote")
+    
+    async def lines():
+        try:
+            plans = await router.plan_batch(
+                [request.prompt for request in batch.requests],
+                [request.user_id for request in batch.requests]
             )
-            results.append(result)
+        except Exception as e:
+            yield json.dumps({"success": False, "error": str(e)}, ensure_ascii=False) + "\n"
+            return
         
-        # Passo 6: Consolidação de Respostas
-        consolidated_response = await router.consolidate_response(
-            request.prompt,
-            results
-        )
+        semaphore = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
         
-        return {
-            "success": True,
-            "response": consolidated_response,
-            "details": results
+        async def run(index: int, queued_at: float) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    result, _ = await _execute(batch.requests[index], plan=plans[index], queued_at=queued_at)
+                    return {"index": index, **result}
+                except Exception as e:
+                    return {"index": index, "success": False, "error": str(e)}
+        
+        queued_at = time.perf_counter()
+        tasks = [asyncio.create_task(run(i, queued_at)) for i in range(len(batch.requests))]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done, ensure_ascii=False) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.post("/api/jobs", status_code=202)
+async def submit_job(
+    request: UserRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """
+    Variante assíncrona de /api/execute: enfileira o comando e retorna o
+    job_id imediatamente; o resultado é consultado em GET /api/jobs/{job_id}
+    Com a fila cheia, responde 429 com Retry-After
+    """
+    if idempotency_key and not request.idempotency_key:
+        request.idempotency_key = idempotency_key
+    try:
+        job = await job_manager.submit((request, time.perf_counter()), request.user_id)
+    except JobQueueFull as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    return {**job, "status_url": f"/api/jobs/{job['job_id']}"}
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = Query(0, ge=0, le=30)):
+    """
+    Status do job ("queued", "running", "succeeded" ou "failed") e, ao
+    terminar, o mesmo resultado de /api/execute em "result"
+    Com wait > 0, aguarda até wait segundos o job terminar (long-poll)
+    """
+    job = await job_manager.wait(job_id, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado ou expirado")
+    return job
+
+
+def _sse_event(event: str, data: Any) -> str:
+    """Formata um evento no padrão Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _stream_execution(request: UserRequest, emit: Callable[[str, Any], None]) -> Dict[str, Any]:
+    """Mesmo fluxo de _run_execution, emitindo eventos de progresso"""
+    with tracing.trace("execute_stream", enabled=request.debug, user_id=request.user_id) as current:
+        with EXECUTIONS_IN_FLIGHT.labels().track():
+            with tracing.span("planning"):
+                plan = await router.plan_execution(request.prompt, request.user_id)
+            emit("plan", plan.model_dump())
+            
+            results: List[Optional[Dict[str, Any]]] = [None] * len(plan.actions)
+            with tracing.span("execution", actions=len(plan.actions)):
+                async for index, result in executor.execute_iter(plan, request.user_id):
+                    results[index] = result
+                    emit("result", {"index": index, "result": result})
+            
+            chunks = []
+            with tracing.span("consolidation", mode=request.response_mode):
+                async for chunk in router.stream_consolidation(
+                    request.prompt,
+                    results,
+                    mode=request.response_mode
+                ):
+                    chunks.append(chunk)
+                    emit("response", {"text": chunk})
+    
+    result = {
+        "success": True,
+        "response": "".join(chunks) if chunks else None,
+        "details": results
+    }
+    if current is not None:
+        result["timing"] = await _publish_timing(current)
+    return result
+
+
+@app.post("/api/execute/stream")
+async def execute_command_stream(
+    request: UserRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """
+    Variante em streaming (Server-Sent Events) de /api/execute
+    Eventos: "plan" (plano gerado), "result" (cada ação, ao terminar),
+    "response" (trechos da resposta consolidada), "done" e "error"
+    Com debug, o evento "done" inclui "timing" (árvore de spans)
+    
+    Uma repetição com a mesma chave de idempotência recebe apenas
+    "response" (texto completo) e "done" da execução original
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    
+    async def pipeline():
+        try:
+            return await _stream_execution(request, lambda event, data: queue.put_nowait(_sse_event(event, data)))
+        finally:
+            queue.put_nowait(None)
+    
+    key = request.idempotency_key or idempotency_key
+    if key:
+        try:
+            task, started = await idempotency.begin(
+                request.user_id,
+                key,
+                _idempotency_fingerprint(request),
+                pipeline
+            )
+        except IdempotencyConflict as e:
+            raise HTTPException(status_code=409, detail=str(e))
+    else:
+        task, started = asyncio.create_task(pipeline()), True
+    
+    async def events():
+        try:
+            if started:
+                while (event := await queue.get()) is not None:
+                    yield event
+            result = await asyncio.shield(task)
+            if not started and result["response"]:
+                yield _sse_event("response", {"text": result["response"]})
+            done = {"success": True, "details": result["details"]}
+            if "timing" in result:
+                done["timing"] = result["timing"]
+            yield _sse_event("done", done)
+        except Exception as e:
+            yield _sse_event("error", {"detail": str(e)})
+        finally:
+            # Sem chave, a execução acompanha a conexão
+            if not key:
+                task.cancel()
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            **({"Idempotent-Replayed": "true"} if not started else {})
         }
+    )
+
+
+@app.post("/api/calendar/events/bulk")
+async def bulk_create_events(request: BulkEventsRequest):
+    """
+    Cria muitos eventos no Google Calendar de uma vez, sem passar pelo LLM
+    Os inserts são agrupados em requisições batch da API
+    """
+    if len(request.events) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Máximo de {BATCH_MAX_ITEMS} eventos por lote")
+    events = []
+    for event in request.events:
+        parameters = event.model_dump()
+        if not parameters["end_time"]:
+            parameters["end_time"] = default_end_time(parameters["start_time"])
+        events.append(parameters)
+    return await mcp_hub.execute_bulk("google_calendar", events, request.user_id)
+
+
+@app.post("/api/calendar/events/bulk/upload")
+async def bulk_create_events_upload(
+    file: UploadFile = File(...),
+    user_id: str = Form("default_user")
+):
+    """
+    Cria eventos em lote a partir de um arquivo .ics (iCalendar) ou .csv
+    (colunas: title, start_time, end_time, description), em UTF-8
+    """
+    content = await file.read(UPLOAD_MAX_BYTES + 1)
+    if len(content) > UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Arquivo maior que {UPLOAD_MAX_BYTES} bytes")
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Arquivo deve estar codificado em UTF-8")
     
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    filename = (file.filename or "").lower()
+    try:
+        if filename.endswith(".ics") or text.lstrip().startswith("BEGIN:VCALENDAR"):
+            events = parse_events_ics(text)
+        elif filename.endswith(".csv"):
+            events = parse_events_csv(text)
+        else:
+            raise HTTPException(status_code=400, detail="Formato não suportado: envie um arquivo .ics ou .csv")
+    except (csv.Error, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Arquivo inválido: {str(e)}")
+    
+    if not events:
+        raise HTTPException(status_code=400, detail="Nenhum evento encontrado no arquivo")
+    if len(events) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Máximo de {BATCH_MAX_ITEMS} eventos por lote")
+    return await mcp_hub.execute_bulk("google_calendar", events, user_id)
+
+
+@app.post("/api/slack/broadcast")
+async def slack_broadcast(request: BroadcastRequest):
+    """
+    Envia uma mensagem para vários canais do Slack, na maior taxa permitida
+    pelos limites do Slack, com o resultado de cada canal
+    """
+    return await mcp_hub.execute_action(
+        "slack",
+        {"channels": request.channels, "message": request.message},
+        request.user_id
+    )
 
 
 @app.post("/api/admin/configure-tool")
@@ -98,20 +545,103 @@ async def configure_tool(config: ToolConfig):
     Passo 0: Painel de Controle - Configurar ferramenta
     """
     try:
-        vault.store_credentials(
+        # Configuração pelo painel: confirmar apenas após gravar em disco
+        await asyncio.wrap_future(vault.store_credentials(
             tool_name=config.tool_name,
             tool_type=config.tool_type,
             credentials=config.credentials
-        )
+        ))
         return {"success": True, "message": f"Ferramenta {config.tool_name} configurada com sucesso"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Compara o header If-None-Match ("*" ou lista de ETags) com o ETag atual"""
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(
+        (candidate[2:] if candidate.startswith("W/") else candidate) == etag
+        for candidate in candidates
+    )
+
+
 @app.get("/api/admin/tools")
-async def list_tools():
-    """Lista todas as ferramentas configuradas"""
-    return vault.list_tools()
+async def list_tools(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    tool: Optional[str] = None,
+    user_prefix: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match")
+):
+    """
+    Lista as ferramentas configuradas, paginada por usuário
+    
+    Retorna {"system_tools" (só na primeira página), "user_tools",
+    "next_cursor"}; para a próxima página, envie cursor=next_cursor.
+    Filtros: tool (uma ferramenta) e user_prefix (início do user_id).
+    A resposta tem ETag: com If-None-Match igual, responde 304 sem listar
+    """
+    # Credenciais ainda na fila de escrita entram na listagem
+    await vault.flush()
+    etag = f'"tools-{vault.tools_generation()}"'
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    tools = vault.list_tools(cursor, limit, tool, user_prefix)
+    # A geração lida junto com a listagem (pode ter mudado desde a anterior)
+    etag = f'"tools-{tools.pop("generation")}"'
+    return JSONResponse(tools, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+@app.get("/api/admin/plan-cache")
+async def plan_cache_stats():
+    """Estatísticas do cache de planos"""
+    return router.plan_cache.stats()
+
+
+@app.delete("/api/admin/plan-cache")
+async def invalidate_plan_cache(prompt: Optional[str] = None):
+    """
+    Invalida o cache de planos
+    Sem prompt, limpa o cache inteiro
+    """
+    if prompt:
+        key = normalize_prompt(prompt)
+        # Prompts com tempo relativo a agora nunca são cacheados
+        removed = router.plan_cache.invalidate(key) if key is not None else 0
+    else:
+        removed = router.plan_cache.invalidate()
+    return {"success": True, "removed": removed}
+
+
+@app.get("/api/admin/rate-limits")
+async def rate_limit_stats():
+    """Estado atual dos limites de taxa (global, por ferramenta e por usuário)"""
+    return mcp_hub.rate_limiter.stats()
+
+
+@app.get("/api/admin/circuit-breakers")
+async def circuit_breaker_stats():
+    """Estado dos circuit breakers de cada adaptador"""
+    return mcp_hub.breaker_stats()
+
+
+@app.get("/api/admin/idempotency")
+async def idempotency_stats():
+    """Estatísticas das chaves de idempotência"""
+    return idempotency.stats()
+
+
+@app.get("/api/admin/jobs")
+async def job_stats():
+    """Estado da fila e dos workers de jobs"""
+    return job_manager.stats()
+
+
+@app.get("/metrics")
+async def metrics():
+    """Métricas no formato de texto do Prometheus"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 @app.get("/api/auth/google/authorize")
@@ -233,5 +763,6 @@ async def google_callback(code: str, state: Optional[str] = None):
 
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
 
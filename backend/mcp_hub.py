@@ -2,8 +2,15 @@
 Hub de MCPs - Sala de Máquinas
 Passo 4: Adaptadores para cada ferramenta/API
 """
-from typing import Dict, Any, Optional
+import asyncio
+import time
+from typing import Dict, Any, Optional, List, Tuple
 from backend.vault import Vault
+from backend.metrics import ACTION_SECONDS, ACTION_ERRORS, TOKEN_SECONDS
+from backend.tracing import span, annotate
+from backend.rate_limit import RateLimiter
+from backend.resilience import CircuitBreaker, call_with_resilience
+from backend.utils import AsyncSingleFlight
 
 # Importar MCPs
 from backend.mcps.google_calendar_mcp import GoogleCalendarMCP
@@ -21,6 +28,87 @@ class MCPHub:
             "google_calendar": GoogleCalendarMCP(),
             "slack": SlackMCP()
         }
+        # Buscas de token concorrentes para o mesmo (ferramenta, usuário)
+        # usam uma única thread; as demais aguardam no event loop
+        self._token_flights = AsyncSingleFlight()
+        # Limites de taxa global, por ferramenta e por usuário
+        self.rate_limiter = RateLimiter()
+        # Um circuit breaker por adaptador
+        self.breakers = {
+            tool_name: CircuitBreaker(tool_name)
+            for tool_name in self.mcps
+        }
+    
+    def _circuit_open_error(self, tool_name: str) -> Optional[Dict[str, Any]]:
+        """Resultado de erro imediato se o circuito da ferramenta estiver aberto"""
+        breaker = self.breakers[tool_name]
+        if not breaker.is_rejecting:
+            return None
+        return {
+            "status": "error",
+            "tool_name": tool_name,
+            "error": f"Serviço {tool_name} temporariamente indisponível (circuito aberto)",
+            "retry_after": breaker.stats()["retry_in"]
+        }
+    
+    def breaker_stats(self) -> Dict[str, Any]:
+        """Estado dos circuit breakers (para monitoramento)"""
+        return {tool_name: breaker.stats() for tool_name, breaker in self.breakers.items()}
+    
+    async def _check_rate_limit(
+        self,
+        tool_name: str,
+        user_id: str,
+        cost: float = 1
+    ) -> Optional[Dict[str, Any]]:
+        """Aguarda a vez da ação nos limites de taxa; retorna resultado de erro se o prazo estourar"""
+        allowed, retry_after = await self.rate_limiter.acquire(tool_name, user_id, cost)
+        if allowed:
+            return None
+        return {
+            "status": "error",
+            "tool_name": tool_name,
+            "error": f"Limite de requisições excedido para {tool_name}. Tente novamente em instantes",
+            "retry_after": retry_after
+        }
+    
+    async def _get_access_token(
+        self,
+        tool_name: str,
+        user_id: str
+    ) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """
+        Obtém o token da ferramenta no cofre
+        
+        Returns:
+            Tupla (access_token, None) ou (None, resultado de erro)
+        """
+        # O caminho rápido é o cache em memória; em caso de falta, a busca
+        # (que pode renovar o token via rede) roda fora do event loop
+        try:
+            start = time.perf_counter()
+            access_token = self.vault.get_cached_access_token(tool_name, user_id)
+            if access_token:
+                TOKEN_SECONDS.labels(tool_name, "cache").observe(time.perf_counter() - start)
+                annotate(source="cache")
+            else:
+                access_token = await self._token_flights.do(
+                    (tool_name, user_id),
+                    lambda: asyncio.to_thread(self.vault.get_access_token, tool_name, user_id)
+                )
+        except Exception as e:
+            return None, {
+                "status": "error",
+                "tool_name": tool_name,
+                "error": f"Erro ao obter credenciais para {tool_name}: {str(e)}"
+            }
+        if not access_token:
+            return None, {
+                "status": "error",
+                "tool_name": tool_name,
+                "error": f"Credenciais não configuradas para {tool_name}"
+            }
+        return access_token, None
     
     async def execute_action(
         self,
@@ -40,34 +128,182 @@ class MCPHub:
             Resultado da execução
         """
         if tool_name not in self.mcps:
+            ACTION_ERRORS.labels("unknown", "unknown_tool").inc()
             return {
                 "status": "error",
                 "tool_name": tool_name,
                 "error": f"Ferramenta {tool_name} não encontrada"
             }
         
-        # Obter credenciais do cofre
-        access_token = self.vault.get_access_token(tool_name, user_id)
-        if not access_token:
-            return {
-                "status": "error",
-                "tool_name": tool_name,
-                "error": f"Credenciais não configuradas para {tool_name}"
-            }
+        start = time.perf_counter()
+        result = await self._execute_action(tool_name, parameters, user_id)
+        ACTION_SECONDS.labels(tool_name, result["status"]).observe(time.perf_counter() - start)
+        return result
+    
+    async def _execute_action(
+        self,
+        tool_name: str,
+        parameters: Dict[str, Any],
+        user_id: str
+    ) -> Dict[str, Any]:
+        # Circuito aberto: falhar rápido, sem esperar o timeout do serviço
+        error = self._circuit_open_error(tool_name)
+        if error:
+            ACTION_ERRORS.labels(tool_name, "circuit_open").inc()
+            return error
+        
+        # Cada canal de um broadcast conta como uma requisição; broadcasts
+        # maiores que a rajada reservam as fichas um pedaço de cada vez
+        channels = parameters.get("channels") or [None]
+        chunk_size = self.rate_limiter.max_cost(tool_name, user_id)
+        if chunk_size and len(channels) > chunk_size:
+            return await self._execute_broadcast(tool_name, parameters, user_id, chunk_size)
+        
+        with span("rate_limit_wait"):
+            error = await self._check_rate_limit(tool_name, user_id, cost=len(channels))
+        if error:
+            ACTION_ERRORS.labels(tool_name, "rate_limited").inc()
+            return error
+        
+        with span("credentials"):
+            access_token, error = await self._get_access_token(tool_name, user_id)
+        if error:
+            ACTION_ERRORS.labels(tool_name, "credentials").inc()
+            return error
         
-        # Executar ação via MCP
+        # Executar ação via MCP, com retentativas e circuit breaker.
+        # Cópia dos parâmetros: o MCP pode anotá-los para tornar as
+        # retentativas idempotentes (ex: id do evento no Calendar)
         mcp = self.mcps[tool_name]
+        parameters = dict(parameters)
+        attempts = 0
+        
+        async def call():
+            nonlocal attempts
+            attempts += 1
+            annotate(attempts=attempts)
+            return await mcp.execute(access_token, parameters)
+        
         try:
-            result = await mcp.execute(access_token, parameters)
+            with span("upstream"):
+                result = await call_with_resilience(self.breakers[tool_name], call)
             return {
                 "status": "success",
                 "tool_name": tool_name,
                 "details": result
             }
         except Exception as e:
+            ACTION_ERRORS.labels(tool_name, "upstream").inc()
             return {
                 "status": "error",
                 "tool_name": tool_name,
                 "error": str(e)
             }
-
+    
+    async def _execute_broadcast(
+        self,
+        tool_name: str,
+        parameters: Dict[str, Any],
+        user_id: str,
+        chunk_size: int
+    ) -> Dict[str, Any]:
+        """
+        Envia um broadcast em pedaços de até chunk_size canais, cada um com
+        sua reserva nos limites de taxa: outros usuários são atendidos entre
+        os pedaços em vez de esperar o broadcast inteiro
+        """
+        channels = parameters["channels"]
+        sent = []
+        first_error = None
+        for offset in range(0, len(channels), chunk_size):
+            chunk = channels[offset:offset + chunk_size]
+            result = await self._execute_action(tool_name, {**parameters, "channels": chunk}, user_id)
+            if result["status"] == "success":
+                sent.extend(result["details"]["broadcast"])
+            else:
+                first_error = first_error or result
+                sent.extend(
+                    {"channel": channel, "status": "error", "error": result["error"]}
+                    for channel in chunk
+                )
+        
+        if first_error and all(item["status"] == "error" for item in sent):
+            return first_error
+        return {
+            "status": "success",
+            "tool_name": tool_name,
+            "details": {"broadcast": sent}
+        }
+    
+    @staticmethod
+    def _item_errors(start: int, stop: int, message: str) -> List[Dict[str, Any]]:
+        return [{"index": index, "status": "error", "error": message} for index in range(start, stop)]
+    
+    async def execute_bulk(
+        self,
+        tool_name: str,
+        items: List[Dict[str, Any]],
+        user_id: str
+    ) -> Dict[str, Any]:
+        """
+        Executa muitas ações da mesma ferramenta de uma vez (ex: criação de
+        eventos em lote), usando a operação em lote do MCP
+        
+        Returns:
+            Resultado com a lista "results" (um item por entrada, na ordem)
+        """
+        mcp = self.mcps.get(tool_name)
+        if mcp is None or not hasattr(mcp, "bulk_create"):
+            return {
+                "status": "error",
+                "tool_name": tool_name,
+                "error": f"Ferramenta {tool_name} não suporta operações em lote"
+            }
+        
+        error = self._circuit_open_error(tool_name)
+        if error:
+            return error
+        
+        access_token, error = await self._get_access_token(tool_name, user_id)
+        if error:
+            return error
+        
+        # Cada item do lote conta como uma requisição; as fichas são
+        # reservadas um pedaço de cada vez (no máximo a rajada dos limites),
+        # então outros usuários são atendidos entre os pedaços
+        chunk_size = self.rate_limiter.max_cost(tool_name, user_id) or max(1, len(items))
+        results: List[Dict[str, Any]] = []
+        for offset in range(0, len(items), chunk_size):
+            chunk = items[offset:offset + chunk_size]
+            error = await self._check_rate_limit(tool_name, user_id, cost=len(chunk))
+            if error is None:
+                try:
+                    # Sem retentativa do pedaço inteiro: o resultado já vem por item
+                    chunk_results = await call_with_resilience(
+                        self.breakers[tool_name],
+                        lambda: mcp.bulk_create(access_token, chunk),
+                        max_attempts=1
+                    )
+                except Exception as e:
+                    error = {
+                        "status": "error",
+                        "tool_name": tool_name,
+                        "error": str(e)
+                    }
+            if error:
+                # Nada criado ainda: devolver o erro como antes; senão, os
+                # itens restantes falham e o lote fica parcial
+                if offset == 0:
+                    return error
+                results.extend(self._item_errors(offset, len(items), error["error"]))
+                break
+            results.extend({**r, "index": offset + r["index"]} for r in chunk_results)
+        
+        created = sum(1 for r in results if r.get("status") == "success")
+        return {
+            "status": "success" if created == len(results) else "partial",
+            "tool_name": tool_name,
+            "created": created,
+            "failed": len(results) - created,
+            "results": results
+        }
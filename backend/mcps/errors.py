@@ -0,0 +1,22 @@
+"""
+Erros dos MCPs
+Permitem ao Hub distinguir falhas transitórias (que contam para o circuit
+breaker) e operações seguras para repetir
+"""
+
+
+class MCPError(Exception):
+    """
+    Falha de um MCP ao executar uma ação
+
+    Args:
+        message: Mensagem de erro
+        transient: Falha do serviço externo (indisponível, timeout, 5xx),
+            e não do pedido em si; conta para o circuit breaker
+        retryable: Pode ser repetida sem efeitos duplicados
+    """
+
+    def __init__(self, message: str, transient: bool = False, retryable: bool = False):
+        super().__init__(message)
+        self.transient = transient or retryable
+        self.retryable = retryable
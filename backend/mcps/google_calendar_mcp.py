@@ -2,21 +2,105 @@
 MCP para Google Calendar
 Adaptador que sabe como criar eventos no Google Calendar
 """
-from typing import Dict, Any
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
-from datetime import datetime, timedelta
+import asyncio
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Any, List, Tuple
 import os
 
+from backend.mcps.errors import MCPError
+from backend.utils import is_all_day
+
+# googleapiclient/google.auth/httplib2 são importados no primeiro uso
+# (inicialização mais rápida do backend)
+
+# Status HTTP da API que indicam falha transitória (seguro repetir o insert,
+# já que o id do evento é gerado pelo cliente)
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
 class GoogleCalendarMCP:
     """
     Adaptador para Google Calendar API
     Não contém credenciais - recebe access_token do Cofre
     """
     
+    # Documento de discovery estático (empacotado no google-api-python-client),
+    # carregado e parseado uma única vez por processo
+    _discovery_document = None
+    _discovery_lock = threading.Lock()
+    
+    # Máximo de chamadas por requisição batch aceito pela API do Calendar
+    BATCH_LIMIT = 50
+    
     def __init__(self):
-        self.service = None
+        # Cache de serviços por access_token: token -> (criado_em, serviço, credenciais)
+        # O serviço só monta as requisições; o envio usa o transporte httplib2
+        # da thread (não é thread-safe), então chamadas do mesmo usuário rodam
+        # em paralelo
+        self.service_cache_size = int(os.getenv("CALENDAR_SERVICE_CACHE_SIZE", "256"))
+        self.service_cache_ttl = float(os.getenv("CALENDAR_SERVICE_CACHE_TTL", "3600"))
+        self._services: "OrderedDict[str, Tuple[float, Any, Any]]" = OrderedDict()
+        self._services_lock = threading.Lock()
+        self._local = threading.local()
+        # Endpoint alternativo da API (ex: servidor local nos testes de carga);
+        # requisições batch continuam usando o endpoint do discovery
+        self.api_endpoint = os.getenv("GOOGLE_CALENDAR_API_ENDPOINT")
+    
+    @classmethod
+    def _get_discovery_document(cls) -> Dict[str, Any]:
+        if cls._discovery_document is None:
+            with cls._discovery_lock:
+                if cls._discovery_document is None:
+                    from googleapiclient.discovery_cache import get_static_doc
+                    cls._discovery_document = json.loads(get_static_doc("calendar", "v3"))
+        return cls._discovery_document
+    
+    def _get_service(self, access_token: str) -> Tuple[Any, Any]:
+        """
+        Retorna o serviço do Calendar e as credenciais do token, construindo-o
+        apenas na primeira vez (ou após expirar/ser removido do cache LRU)
+        """
+        now = time.monotonic()
+        with self._services_lock:
+            entry = self._services.get(access_token)
+            if entry is not None and now - entry[0] < self.service_cache_ttl:
+                self._services.move_to_end(access_token)
+                return entry[1], entry[2]
+        
+        from google.oauth2.credentials import Credentials
+        from googleapiclient.discovery import build_from_document
+        
+        # Construir fora do lock global (não bloqueia outros tokens)
+        credentials = Credentials(token=access_token)
+        service = build_from_document(
+            self._get_discovery_document(),
+            credentials=credentials,
+            client_options={"api_endpoint": self.api_endpoint} if self.api_endpoint else None
+        )
+        entry = (now, service, credentials)
+        with self._services_lock:
+            self._services[access_token] = entry
+            self._services.move_to_end(access_token)
+            # Remover expirados e, se ainda cheio, os menos usados
+            for token in [t for t, e in self._services.items() if now - e[0] >= self.service_cache_ttl]:
+                del self._services[token]
+            while len(self._services) > self.service_cache_size:
+                self._services.popitem(last=False)
+        return service, credentials
+    
+    def _thread_http(self, credentials: Any) -> Any:
+        """Transporte da thread atual (conexões keep-alive próprias) autorizado com o token"""
+        from google_auth_httplib2 import AuthorizedHttp
+        from googleapiclient.http import build_http
+        
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = self._local.http = build_http()
+        return AuthorizedHttp(credentials, http=http)
     
     async def execute(
         self,
@@ -35,41 +119,154 @@ class GoogleCalendarMCP:
                 "description": str (opcional)
             }
         """
+        # Id gerado pelo cliente torna o insert idempotente: uma nova tentativa
+        # com os mesmos parâmetros não duplica o evento (a API responde 409).
+        # O id fica em parameters para ser reaproveitado nas retentativas
+        parameters.setdefault("event_id", uuid.uuid4().hex)
+        
+        # O cliente da API do Google é síncrono: rodar em thread para não
+        # bloquear o event loop (e permitir ações em paralelo)
+        return await asyncio.to_thread(self._create_event, access_token, parameters)
+
+    def _create_event(
+        self,
+        access_token: str,
+        parameters: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Cria o evento de forma síncrona"""
+        import httplib2
+        from googleapiclient.errors import HttpError
+        
+        # Serviço em cache para o token (discovery estático)
+        service, credentials = self._get_service(access_token)
+        http = self._thread_http(credentials)
+        
+        event = self._event_body(parameters)
+        
         try:
-            # Criar credenciais a partir do token
-            creds = Credentials(token=access_token)
-            
-            # Construir serviço
-            service = build('calendar', 'v3', credentials=creds)
-            
-            # Preparar evento
-            event = {
-                'summary': parameters.get('title', 'Novo Evento'),
-                'description': parameters.get('description', ''),
-                'start': {
-                    'dateTime': parameters.get('start_time'),
-                    'timeZone': 'America/Sao_Paulo',
-                },
-                'end': {
-                    'dateTime': parameters.get('end_time'),
-                    'timeZone': 'America/Sao_Paulo',
-                },
-            }
-            
             # Criar evento
             created_event = service.events().insert(
                 calendarId='primary',
                 body=event
-            ).execute()
+            ).execute(http=http)
             
-            return {
-                "event_id": created_event.get('id'),
-                "html_link": created_event.get('htmlLink'),
-                "summary": created_event.get('summary'),
-                "start": created_event.get('start'),
-                "end": created_event.get('end')
-            }
+            return self._event_summary(created_event)
         
+        except HttpError as e:
+            status = e.resp.status
+            if status == 409 and event.get('id'):
+                # O evento já foi criado por uma tentativa anterior
+                existing = service.events().get(
+                    calendarId='primary',
+                    eventId=event['id']
+                ).execute(http=http)
+                return self._event_summary(existing)
+            raise MCPError(
+                f"Erro ao criar evento no Google Calendar: {str(e)}",
+                retryable=status in RETRYABLE_STATUS
+            )
+        except (OSError, httplib2.HttpLib2Error) as e:
+            # Falha de conexão/timeout: seguro repetir (insert idempotente)
+            raise MCPError(f"Erro ao criar evento no Google Calendar: {str(e)}", retryable=True)
         except Exception as e:
-            raise Exception(f"Erro ao criar evento no Google Calendar: {str(e)}")
+            raise MCPError(f"Erro ao criar evento no Google Calendar: {str(e)}")
+    
+    @staticmethod
+    def _event_body(parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """Monta o corpo do evento para a API a partir dos parâmetros"""
+        event = {
+            'summary': parameters.get('title', 'Novo Evento'),
+            'description': parameters.get('description', ''),
+            'start': GoogleCalendarMCP._event_time(parameters.get('start_time')),
+            'end': GoogleCalendarMCP._event_time(parameters.get('end_time')),
+        }
+        if parameters.get('event_id'):
+            event['id'] = parameters['event_id']
+        return event
+    
+    @staticmethod
+    def _event_time(value: str) -> Dict[str, Any]:
+        """Data (YYYY-MM-DD) vira evento de dia inteiro; data/hora usa o fuso padrão"""
+        if is_all_day(value):
+            return {'date': value}
+        return {'dateTime': value, 'timeZone': 'America/Sao_Paulo'}
+    
+    @staticmethod
+    def _event_summary(created_event: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "event_id": created_event.get('id'),
+            "html_link": created_event.get('htmlLink'),
+            "summary": created_event.get('summary'),
+            "start": created_event.get('start'),
+            "end": created_event.get('end')
+        }
+    
+    async def bulk_create(
+        self,
+        access_token: str,
+        events: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Cria vários eventos usando requisições batch da API
+        (até BATCH_LIMIT inserts por requisição HTTP)
+        
+        Args:
+            access_token: Token de acesso (obtido do Cofre)
+            events: Lista de parâmetros no mesmo formato de execute()
+            
+        Returns:
+            Um resultado por evento, na mesma ordem:
+            {"index", "status": "success"|"error", "details"|"error"}
+        """
+        return await asyncio.to_thread(self._bulk_create, access_token, events)
+    
+    def _bulk_create(
+        self,
+        access_token: str,
+        events: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Cria os eventos em lote de forma síncrona"""
+        results: List[Dict[str, Any]] = [None] * len(events)
+        
+        # Eventos sem horário de início nem chegam a ser enviados
+        valid = []
+        for index, parameters in enumerate(events):
+            if not parameters.get('start_time') or not parameters.get('end_time'):
+                results[index] = {
+                    "index": index,
+                    "status": "error",
+                    "error": "start_time e end_time são obrigatórios"
+                }
+            else:
+                valid.append(index)
+        
+        def callback(request_id, response, exception):
+            index = int(request_id)
+            if exception is not None:
+                results[index] = {"index": index, "status": "error", "error": str(exception)}
+            else:
+                results[index] = {"index": index, "status": "success", "details": self._event_summary(response)}
+        
+        service, credentials = self._get_service(access_token)
+        http = self._thread_http(credentials)
+        for offset in range(0, len(valid), self.BATCH_LIMIT):
+            batch = service.new_batch_http_request(callback=callback)
+            for index in valid[offset:offset + self.BATCH_LIMIT]:
+                batch.add(
+                    service.events().insert(calendarId='primary', body=self._event_body(events[index])),
+                    request_id=str(index)
+                )
+            try:
+                batch.execute(http=http)
+            except Exception as e:
+                # Falha da requisição batch inteira: marcar os itens sem resposta
+                for index in valid[offset:offset + self.BATCH_LIMIT]:
+                    if results[index] is None:
+                        results[index] = {
+                            "index": index,
+                            "status": "error",
+                            "error": f"Erro ao criar evento no Google Calendar: {str(e)}"
+                        }
+        
+        return results
 
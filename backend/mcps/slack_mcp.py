@@ -2,9 +2,271 @@
 MCP para Slack
 Adaptador que sabe como enviar mensagens no Slack
 """
-from typing import Dict, Any
-from slack_sdk import WebClient
-from slack_sdk.errors import SlackApiError
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, Any, Optional, List, Tuple, Callable, TYPE_CHECKING
+
+from backend.mcps.errors import MCPError
+from backend.utils import SingleFlight, worker_count
+
+# slack_sdk é importado no primeiro uso (inicialização mais rápida do backend)
+if TYPE_CHECKING:
+    from slack_sdk import WebClient
+    from slack_sdk.errors import SlackApiError
+
+# chat.postMessage não é idempotente: só são repetidos erros em que o Slack
+# garante que a mensagem não foi publicada
+RETRYABLE_ERRORS = {"service_unavailable", "request_timeout"}
+# Erros do serviço (e não do pedido), que contam para o circuit breaker
+TRANSIENT_ERRORS = RETRYABLE_ERRORS | {"internal_error", "fatal_error", "ratelimited"}
+
+
+class SlackRateLimiter:
+    """
+    Fila de saída por token que segue os limites do Slack
+    
+    Cada chamada reserva o próximo horário livre para (token, método,
+    escopo) - no chat.postMessage o escopo é o canal (~1 mensagem/s por
+    canal) e há também um teto por workspace. Respostas "ratelimited"
+    bloqueiam o método pelo tempo do header Retry-After e a chamada é
+    refeita (até max_retries vezes).
+    """
+    
+    # (intervalo mínimo em segundos, rajada permitida) por escopo
+    METHOD_LIMITS = {
+        "chat.postMessage": (1.0, 1),      # especial: ~1 por segundo por canal
+        "conversations.list": (3.0, 5),    # Tier 2: ~20 por minuto, com rajadas
+    }
+    
+    def __init__(self, max_retries: int = None, post_per_minute: float = None):
+        if max_retries is None:
+            max_retries = int(os.getenv("SLACK_MAX_RETRIES", "3"))
+        if post_per_minute is None:
+            # Com vários workers, cada processo fica com uma fração do teto
+            post_per_minute = float(os.getenv("SLACK_POST_PER_MINUTE", "300")) / worker_count()
+        self.max_retries = max_retries
+        # Teto de chat.postMessage por workspace (somando todos os canais)
+        self.workspace_limits = {"chat.postMessage": (60.0 / post_per_minute, 10)}
+        # Horário teórico da próxima chamada por escopo (algoritmo GCRA)
+        self._next_slot: Dict[Tuple[str, str, str], float] = {}
+        self._blocked_until: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+    
+    def _take_slot(self, key: Tuple[str, str, str], limit: Tuple[float, int], now: float) -> float:
+        """Reserva a vaga no escopo e retorna o horário permitido para a chamada"""
+        interval, burst = limit
+        slot = max(now, self._next_slot.get(key, 0.0))
+        self._next_slot[key] = slot + interval
+        return slot - (burst - 1) * interval
+    
+    def reserve(self, token: str, method: str, scope: str = "") -> float:
+        """
+        Reserva o próximo horário livre para a chamada
+        
+        Returns:
+            Segundos a aguardar antes de fazer a chamada
+        """
+        with self._lock:
+            now = time.monotonic()
+            allowed_at = max(
+                self._blocked_until.get((token, method), 0.0),
+                self._take_slot((token, method, scope), self.METHOD_LIMITS.get(method, (1.0, 1)), now)
+            )
+            workspace_limit = self.workspace_limits.get(method)
+            if workspace_limit and scope:
+                allowed_at = max(allowed_at, self._take_slot((token, method, "*"), workspace_limit, now))
+            
+            # Evitar crescimento ilimitado: descartar reservas já vencidas
+            if len(self._next_slot) > 10000:
+                self._next_slot = {k: v for k, v in self._next_slot.items() if v > now}
+        return max(0.0, allowed_at - now)
+    
+    def block(self, token: str, method: str, seconds: float):
+        """Bloqueia o método para o token (Retry-After)"""
+        with self._lock:
+            until = time.monotonic() + seconds
+            key = (token, method)
+            self._blocked_until[key] = max(self._blocked_until.get(key, 0.0), until)
+    
+    @staticmethod
+    def retry_after(error: "SlackApiError") -> Optional[float]:
+        """Segundos de espera se o erro for de rate limit, senão None"""
+        response = error.response
+        if getattr(response, "status_code", None) != 429 and response.get("error") != "ratelimited":
+            return None
+        headers = getattr(response, "headers", None) or {}
+        try:
+            return float(headers.get("Retry-After", headers.get("retry-after", 1)))
+        except (TypeError, ValueError):
+            return 1.0
+    
+    async def call(self, token: str, method: str, fn: Callable[[], Any], scope: str = "") -> Any:
+        """Executa fn (síncrona, em thread) respeitando a fila e o Retry-After"""
+        from slack_sdk.errors import SlackApiError
+        
+        for attempt in range(self.max_retries + 1):
+            await asyncio.sleep(self.reserve(token, method, scope))
+            try:
+                return await asyncio.to_thread(fn)
+            except SlackApiError as e:
+                wait = self.retry_after(e)
+                if wait is None or attempt == self.max_retries:
+                    raise
+                self.block(token, method, wait)
+    
+    def call_sync(self, token: str, method: str, fn: Callable[[], Any], scope: str = "") -> Any:
+        """Versão síncrona de call(), para código que já roda em thread"""
+        from slack_sdk.errors import SlackApiError
+        
+        for attempt in range(self.max_retries + 1):
+            time.sleep(self.reserve(token, method, scope))
+            try:
+                return fn()
+            except SlackApiError as e:
+                wait = self.retry_after(e)
+                if wait is None or attempt == self.max_retries:
+                    raise
+                self.block(token, method, wait)
+
+
+class ChannelDirectory:
+    """
+    Índice nome -> ID de canais por token (workspace), com TTL
+    
+    - Carga inicial paginando conversations.list até a última página
+    - Após o TTL, o índice atual continua sendo usado enquanto uma thread
+      em segundo plano o atualiza página a página
+    - Um nome desconhecido força uma recarga (no máximo uma a cada
+      min_reload_interval segundos), para canais recém-criados
+    - O índice só é publicado após percorrer todas as páginas; uma carga
+      que falha não é repetida antes do backoff (dobra a cada falha)
+    - Por padrão lista só canais públicos (scope channels:read); canais
+      privados (SLACK_CHANNEL_TYPES=public_channel,private_channel) exigem
+      também o scope groups:read
+    """
+    
+    PAGE_SIZE = 1000
+    
+    def __init__(
+        self,
+        ttl: float = None,
+        min_reload_interval: float = None,
+        limiter: Optional[SlackRateLimiter] = None
+    ):
+        if ttl is None:
+            ttl = float(os.getenv("SLACK_CHANNEL_CACHE_TTL", "600"))
+        if min_reload_interval is None:
+            min_reload_interval = float(os.getenv("SLACK_CHANNEL_MIN_RELOAD", "30"))
+        self.ttl = ttl
+        self.min_reload_interval = min_reload_interval
+        self.limiter = limiter or SlackRateLimiter()
+        self.channel_types = os.getenv("SLACK_CHANNEL_TYPES", "public_channel")
+        self.failure_backoff = float(os.getenv("SLACK_CHANNEL_FAILURE_BACKOFF", "5"))
+        self.max_failure_backoff = float(os.getenv("SLACK_CHANNEL_MAX_FAILURE_BACKOFF", "300"))
+        # token -> {"channels": {nome: id}, "loaded_at": float, "refreshing": bool}
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        # token -> (momento da última falha, backoff atual em segundos)
+        self._failures: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self._loads = SingleFlight()
+    
+    def resolve(self, client: "WebClient", token: str, name: str) -> Optional[str]:
+        """Retorna o ID do canal (nome sem "#") ou None se não existir (ou se o índice estiver indisponível)"""
+        entry = self._entries.get(token)
+        if entry is None:
+            entry = self._load(client, token)
+            if entry is None:
+                return None
+        elif time.monotonic() - entry["loaded_at"] > self.ttl:
+            self._refresh_in_background(client, token, entry)
+        
+        channel_id = entry["channels"].get(name)
+        if channel_id is None and time.monotonic() - entry["loaded_at"] > self.min_reload_interval:
+            entry = self._load(client, token) or entry
+            channel_id = entry["channels"].get(name)
+        return channel_id
+    
+    def invalidate(self, token: Optional[str] = None):
+        with self._lock:
+            if token is None:
+                self._entries.clear()
+                self._failures.clear()
+            else:
+                self._entries.pop(token, None)
+                self._failures.pop(token, None)
+    
+    def _load(self, client: "WebClient", token: str) -> Optional[Dict[str, Any]]:
+        """Recarrega o índice; None enquanto durar o backoff de uma falha anterior"""
+        failure = self._failures.get(token)
+        if failure is not None and time.monotonic() - failure[0] < failure[1]:
+            return None
+        # Cargas concorrentes para o mesmo token compartilham a mesma paginação
+        return self._loads.do(token, lambda: self._paginate(client, token))
+    
+    def _paginate(self, client: "WebClient", token: str) -> Dict[str, Any]:
+        """
+        Percorre todas as páginas de conversations.list
+        Cada página já é mesclada no índice em uso, se houver (atualização
+        incremental); ao final, nomes que não apareceram mais (renomeados/
+        arquivados) saem. Um índice novo só é publicado completo
+        """
+        entry = self._entries.get(token)
+        seen: Dict[str, str] = {}
+        cursor = None
+        try:
+            while True:
+                response = self.limiter.call_sync(
+                    token,
+                    "conversations.list",
+                    lambda: client.conversations_list(
+                        types=self.channel_types,
+                        exclude_archived=True,
+                        limit=self.PAGE_SIZE,
+                        cursor=cursor
+                    )
+                )
+                page = {ch["name"]: ch["id"] for ch in response["channels"]}
+                seen.update(page)
+                if entry is not None:
+                    entry["channels"].update(page)
+                cursor = (response.get("response_metadata") or {}).get("next_cursor")
+                if not cursor:
+                    break
+        except Exception:
+            with self._lock:
+                failure = self._failures.get(token)
+                backoff = min(failure[1] * 2, self.max_failure_backoff) if failure else self.failure_backoff
+                self._failures[token] = (time.monotonic(), backoff)
+            raise
+        
+        with self._lock:
+            self._failures.pop(token, None)
+            if entry is None:
+                entry = {"channels": seen, "loaded_at": time.monotonic(), "refreshing": False}
+                self._entries[token] = entry
+            else:
+                entry["channels"] = seen
+                entry["loaded_at"] = time.monotonic()
+        return entry
+    
+    def _refresh_in_background(self, client: "WebClient", token: str, entry: Dict[str, Any]):
+        with self._lock:
+            if entry["refreshing"]:
+                return
+            entry["refreshing"] = True
+        
+        def refresh():
+            try:
+                self._load(client, token)
+            except Exception:
+                pass
+            finally:
+                entry["refreshing"] = False
+        
+        threading.Thread(target=refresh, name="slack-channels", daemon=True).start()
+
 
 class SlackMCP:
     """
@@ -13,7 +275,25 @@ class SlackMCP:
     """
     
     def __init__(self):
-        pass
+        # Um WebClient, um índice de canais e uma fila de saída por token
+        self._clients: Dict[str, "WebClient"] = {}
+        self.limiter = SlackRateLimiter()
+        self.channels = ChannelDirectory(limiter=self.limiter)
+        self.broadcast_concurrency = int(os.getenv("SLACK_BROADCAST_CONCURRENCY", "10"))
+        # URL alternativa da API (ex: servidor local nos testes de carga)
+        self.api_url = os.getenv("SLACK_API_URL")
+    
+    def _get_client(self, access_token: str) -> "WebClient":
+        client = self._clients.get(access_token)
+        if client is None:
+            from slack_sdk import WebClient
+            
+            if self.api_url:
+                client = WebClient(token=access_token, base_url=self.api_url)
+            else:
+                client = WebClient(token=access_token)
+            self._clients[access_token] = client
+        return client
     
     async def execute(
         self,
@@ -27,51 +307,100 @@ class SlackMCP:
             access_token: Bot token do Slack (obtido do Cofre)
             parameters: {
                 "channel": str (ex: "#projetos" ou "C1234567890"),
+                "channels": list[str] (opcional, envia para vários canais),
                 "message": str
             }
         """
+        from slack_sdk.errors import SlackApiError
+        
+        message = parameters.get('message', '')
+        if parameters.get('channels'):
+            return {"broadcast": await self.broadcast(access_token, parameters['channels'], message)}
+        
         try:
-            client = WebClient(token=access_token)
-            
-            channel = parameters.get('channel', '#general')
-            message = parameters.get('message', '')
-            
-            # Se o canal começa com #, converter para ID
-            if channel.startswith('#'):
-                channel_name = channel[1:]
-                # Tentar encontrar o canal pelo nome
-                try:
-                    channels = client.conversations_list()
-                    channel_id = None
-                    for ch in channels['channels']:
-                        if ch['name'] == channel_name:
-                            channel_id = ch['id']
-                            break
-                    
-                    if not channel_id:
-                        # Tentar usar o nome diretamente (pode funcionar em alguns casos)
-                        channel_id = channel
-                except:
-                    channel_id = channel
-            else:
-                channel_id = channel
-            
-            # Enviar mensagem
-            response = client.chat_postMessage(
-                channel=channel_id,
-                text=message
+            return await self._send(access_token, parameters.get('channel', '#general'), message)
+        except SlackApiError as e:
+            error = e.response['error']
+            raise MCPError(
+                f"Erro ao enviar mensagem no Slack: {error}",
+                transient=error in TRANSIENT_ERRORS or getattr(e.response, "status_code", 200) >= 500,
+                retryable=error in RETRYABLE_ERRORS
             )
-            
-            return {
-                "ts": response['ts'],
-                "channel": response['channel'],
-                "message": {
-                    "text": response['message']['text']
-                }
+        except OSError as e:
+            # Conexão caiu: a mensagem pode ter sido publicada, então não repetir
+            raise MCPError(f"Erro ao enviar mensagem no Slack: {str(e)}", transient=True)
+        except Exception as e:
+            raise MCPError(f"Erro ao enviar mensagem no Slack: {str(e)}")
+    
+    async def broadcast(
+        self,
+        access_token: str,
+        channels: List[str],
+        message: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Envia a mesma mensagem para vários canais, na maior taxa permitida
+        (o limite do chat.postMessage é por canal, então canais diferentes
+        seguem em paralelo, respeitando o teto por workspace)
+        
+        Returns:
+            Um resultado por canal, na mesma ordem:
+            {"channel", "status": "success"|"error", "details"|"error"}
+        """
+        from slack_sdk.errors import SlackApiError
+        
+        semaphore = asyncio.Semaphore(max(1, self.broadcast_concurrency))
+        
+        async def send_one(channel: str) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    details = await self._send(access_token, channel, message)
+                    return {"channel": channel, "status": "success", "details": details}
+                except SlackApiError as e:
+                    return {"channel": channel, "status": "error", "error": e.response['error']}
+                except Exception as e:
+                    return {"channel": channel, "status": "error", "error": str(e)}
+        
+        return list(await asyncio.gather(*(send_one(channel) for channel in channels)))
+    
+    async def _send(
+        self,
+        access_token: str,
+        channel: str,
+        message: str
+    ) -> Dict[str, Any]:
+        """Resolve o canal e envia a mensagem pela fila de saída do token"""
+        client = self._get_client(access_token)
+        
+        # O WebClient é síncrono: chamadas rodam em thread para não bloquear o event loop
+        channel_id = await asyncio.to_thread(self._resolve_channel, client, access_token, channel)
+        
+        # Enviar mensagem (espaçada por canal e com Retry-After respeitado)
+        response = await self.limiter.call(
+            access_token,
+            "chat.postMessage",
+            lambda: client.chat_postMessage(channel=channel_id, text=message),
+            scope=channel_id
+        )
+        
+        return {
+            "ts": response['ts'],
+            "channel": response['channel'],
+            "channel_name": channel,
+            "message": {
+                "text": response['message']['text']
             }
+        }
+    
+    def _resolve_channel(self, client: "WebClient", access_token: str, channel: str) -> str:
+        """Converte "#nome" em ID pelo índice em cache (IDs passam direto)"""
+        from slack_sdk.errors import SlackApiError
         
-        except SlackApiError as e:
-            raise Exception(f"Erro ao enviar mensagem no Slack: {e.response['error']}")
-        except Exception as e:
-            raise Exception(f"Erro ao enviar mensagem no Slack: {str(e)}")
-
+        if not channel.startswith('#'):
+            return channel
+        try:
+            channel_id = self.channels.resolve(client, access_token, channel[1:])
+        except SlackApiError:
+            channel_id = None
+        # Se não encontrar, tentar usar o nome diretamente
+        return channel_id or channel
@@ -0,0 +1,254 @@
+"""
+Métricas no formato de texto do Prometheus
+Contadores, gauges e histogramas com labels, expostos em GET /metrics.
+Registrar uma observação custa um lock e uma busca binária, então a
+instrumentação pode ficar ligada sob carga
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Tuple, Sequence
+
+# Limites (segundos) dos histogramas de latência
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _escape_help(value: str) -> str:
+    """HELP escapa só barra invertida e quebra de linha (aspas ficam como estão)"""
+    return value.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Base: uma série (filho) por combinação de valores dos labels"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], "_Metric"] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            # Métrica sem labels: a série existe (com zero) desde o início
+            self.labels()
+        REGISTRY.append(self)
+
+    def labels(self, *values: str):
+        """Série para os valores de labels informados (criada no primeiro uso)"""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} espera os labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _series(self) -> List[Tuple[Tuple[str, ...], object]]:
+        with self._lock:
+            return sorted(self._children.items())
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {_escape_help(self.documentation)}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in self._series():
+            lines.extend(child.render(self.name, self.labelnames, values))
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self._value += amount
+
+    def render(self, name, labelnames, values) -> List[str]:
+        return [f"{name}{_format_labels(labelnames, values)} {_format_value(self._value)}"]
+
+
+class _GaugeChild(_CounterChild):
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+    def set(self, value: float):
+        with self._lock:
+            self._value = value
+
+    def track(self):
+        """Context manager: incrementa na entrada e decrementa na saída"""
+        return _Tracked(self)
+
+
+class _Tracked:
+    def __init__(self, gauge: _GaugeChild):
+        self.gauge = gauge
+
+    def __enter__(self):
+        self.gauge.inc()
+
+    def __exit__(self, *exc):
+        self.gauge.dec()
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def time(self):
+        """Context manager que observa a duração do bloco"""
+        return _Timer(self)
+
+    def render(self, name, labelnames, values) -> List[str]:
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self._buckets + (float("inf"),), counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{name}_bucket{_format_labels(labelnames, values, le)} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, values)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, values)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: _HistogramChild):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+
+REGISTRY: List[_Metric] = []
+
+
+def render() -> str:
+    """Todas as métricas no formato de texto do Prometheus (versão 0.0.4)"""
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class InFlightMiddleware:
+    """
+    Middleware ASGI que mantém o gauge de requisições HTTP em andamento
+    (ASGI puro: não interfere em respostas em streaming)
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        with REQUESTS_IN_FLIGHT.labels().track():
+            await self.app(scope, receive, send)
+
+
+# Métricas do gateway
+PLAN_SECONDS = Histogram(
+    "gateway_plan_seconds",
+    "Duração do planejamento por origem do plano (fast, cache, llm, fallback, batch)",
+    ["source"]
+)
+FALLBACK_PLANS = Counter(
+    "gateway_fallback_plans_total",
+    "Planos gerados por fallback (LLM indisponível ou resposta inválida)"
+)
+ACTION_SECONDS = Histogram(
+    "gateway_action_seconds",
+    "Duração de MCPHub.execute_action por ferramenta e status",
+    ["tool", "status"]
+)
+ACTION_ERRORS = Counter(
+    "gateway_action_errors_total",
+    "Ações com erro por ferramenta e motivo",
+    ["tool", "reason"]
+)
+TOKEN_SECONDS = Histogram(
+    "gateway_token_seconds",
+    "Duração da obtenção do access_token por ferramenta e origem (cache, store, refresh, missing)",
+    ["tool", "source"]
+)
+CONSOLIDATION_SECONDS = Histogram(
+    "gateway_consolidation_seconds",
+    "Duração da consolidação da resposta por modo",
+    ["mode"]
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "gateway_requests_in_flight",
+    "Requisições HTTP em andamento"
+)
+EXECUTIONS_IN_FLIGHT = Gauge(
+    "gateway_executions_in_flight",
+    "Comandos em execução (inclui jobs e itens de lote)"
+)
@@ -0,0 +1,21 @@
+"""
+Modelos compartilhados entre Router, planejador rápido e executor
+"""
+from typing import List, Dict, Any, Optional
+from pydantic import BaseModel
+
+
+class Action(BaseModel):
+    """Representa uma ação a ser executada"""
+    tool_name: str
+    parameters: Dict[str, Any]
+    # Índices (no plano) das ações que precisam terminar antes desta
+    depends_on: List[int] = []
+
+
+class ExecutionPlan(BaseModel):
+    """Plano de execução gerado pelo LLM ou pelo planejador rápido"""
+    actions: List[Action]
+    reasoning: str
+    # Confiança do planejador rápido (None quando o plano veio do LLM)
+    confidence: Optional[float] = None
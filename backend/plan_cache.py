@@ -0,0 +1,141 @@
+"""
+Cache de Planos
+Evita chamadas repetidas ao LLM para comandos idênticos (LRU + TTL)
+"""
+import os
+import re
+import time
+import threading
+import unicodedata
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Dict, Any, Optional, Tuple
+
+# Expressões de data relativa resolvidas para a data real na chave do cache.
+# A ordem importa: "depois de amanhã" precisa vir antes de "amanhã"
+_RELATIVE_DATES = [
+    (re.compile(r"\bdepois de amanha\b"), 2),
+    (re.compile(r"\bamanha\b"), 1),
+    (re.compile(r"\bhoje\b"), 0),
+    (re.compile(r"\bontem\b"), -1),
+]
+
+# Expressões que dependem do dia atual mas não são resolvidas acima
+# (ex: "sexta", "semana que vem"); a chave passa a incluir a data de hoje
+_DATE_DEPENDENT = re.compile(
+    r"\b(segunda|terca|quarta|quinta|sexta|sabado|domingo|semana|mes|"
+    r"proxim[oa]s?)\b"
+)
+
+# Tempos relativos ao momento do pedido ("agora", "daqui a 2 horas", "em 30
+# minutos", "em 2 dias"): o plano traz horários absolutos calculados a partir
+# de agora, então esses prompts não são cacheados
+_RELATIVE_TO_NOW = re.compile(
+    r"\b(agora|daqui|dentro de|mais tarde|"
+    r"(em|apos) (\d+|um|uma|dois|duas|tres|quatro|cinco|dez|quinze|vinte|trinta|meia) "
+    r"(minutos?|min|horas?|h|dias?|semanas?|mes|meses))\b"
+)
+
+
+def normalize_prompt(prompt: str, today: Optional[date] = None) -> Optional[str]:
+    """
+    Normaliza um prompt para uso como chave de cache
+
+    - minúsculas, sem acentos e com espaços colapsados
+    - datas relativas ("hoje", "amanhã") substituídas pela data ISO
+
+    Returns:
+        A chave, ou None se o prompt não pode ser cacheado (tempo relativo
+        ao momento do pedido, ex: "daqui a 2 horas")
+    """
+    today = today or date.today()
+    text = unicodedata.normalize("NFKD", prompt.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"\s+", " ", text).strip().rstrip(".!?").strip()
+
+    if _RELATIVE_TO_NOW.search(text):
+        return None
+
+    for pattern, offset in _RELATIVE_DATES:
+        text = pattern.sub((today + timedelta(days=offset)).isoformat(), text)
+
+    if _DATE_DEPENDENT.search(text):
+        text = f"{text} @{today.isoformat()}"
+    return text
+
+
+class PlanCache:
+    """
+    Cache LRU com expiração (TTL) para planos de execução
+    Seguro para uso a partir de múltiplas threads
+    """
+
+    def __init__(self, max_size: int = None, ttl_seconds: float = None):
+        if max_size is None:
+            max_size = int(os.getenv("PLAN_CACHE_SIZE", "1024"))
+        if ttl_seconds is None:
+            ttl_seconds = float(os.getenv("PLAN_CACHE_TTL", "3600"))
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl_seconds > 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Retorna o valor em cache ou None (conta hit/miss)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: Any):
+        """Armazena um valor, removendo o menos usado se o cache estiver cheio"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Optional[str] = None) -> int:
+        """
+        Remove uma entrada (ou todas, se key for None)
+
+        Returns:
+            Quantidade de entradas removidas
+        """
+        with self._lock:
+            if key is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                return removed
+            return 1 if self._entries.pop(key, None) is not None else 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Estatísticas de uso do cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0
+            }
@@ -0,0 +1,219 @@
+"""
+Limitação de Taxa (token bucket)
+Protege as cotas compartilhadas das APIs externas: limites global, por
+ferramenta e por (ferramenta, usuário), com espera em fila até um prazo
+"""
+import asyncio
+import os
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from backend.utils import worker_count
+
+# Limites padrão por ferramenta: (requisições por segundo, rajada)
+TOOL_DEFAULTS = {
+    "google_calendar": (10.0, 20),
+    "slack": (5.0, 10),
+}
+
+
+def _parse_limit(value: Optional[str], default: Tuple[float, int]) -> Tuple[float, int]:
+    """
+    Converte "taxa/rajada" (ex: "5/10") em tupla; "0" desativa o limite
+    Com vários workers, cada processo fica com uma fração do limite
+    """
+    if not value:
+        rate, burst = default
+    else:
+        rate, _, burst = value.partition("/")
+        rate = float(rate)
+        burst = int(burst) if burst else max(1, int(rate))
+    workers = worker_count()
+    return rate / workers, max(1, burst // workers)
+
+
+class TokenBucket:
+    """Balde de fichas: enche a `rate` fichas por segundo até `capacity`"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, cost: float, now: float) -> float:
+        """Segundos até o balde admitir `cost` fichas (no máximo `capacity`)"""
+        self._refill(now)
+        if self.tokens >= cost:
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def take(self, cost: float):
+        """
+        Consome as fichas; o saldo negativo representa reservas ainda em
+        fila (cada uma dorme até ser coberta pela recarga)
+        """
+        self.tokens -= cost
+
+    def refund(self, cost: float):
+        """Devolve fichas de uma reserva não usada"""
+        self._refill(time.monotonic())
+        self.tokens = min(self.capacity, self.tokens + cost)
+
+    def is_idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+    def stats(self) -> Dict[str, Any]:
+        self._refill(time.monotonic())
+        return {
+            "rate": self.rate,
+            "capacity": self.capacity,
+            "tokens": round(self.tokens, 2)
+        }
+
+
+class RateLimiter:
+    """
+    Limites global, por ferramenta e por (ferramenta, usuário)
+
+    Configuração (formato "taxa/rajada", taxa em requisições por segundo;
+    taxa 0 desativa o limite):
+    - RATE_LIMIT_GLOBAL (padrão "100/200")
+    - RATE_LIMIT_TOOL_<FERRAMENTA> (ex: RATE_LIMIT_TOOL_SLACK="5/10")
+    - RATE_LIMIT_USER (por usuário em cada ferramenta, padrão "2/5")
+    - RATE_LIMIT_MAX_WAIT: tempo máximo em fila, em segundos (padrão 5)
+
+    Os limites valem para o conjunto de workers (GATEWAY_WORKERS): cada
+    processo aplica limite / workers
+
+    Roda no event loop: as operações sobre os baldes não têm await entre a
+    verificação e o consumo, então não precisam de lock
+    """
+
+    # Acima deste número de baldes por usuário, os ociosos são descartados
+    MAX_USER_BUCKETS = 10000
+
+    def __init__(self):
+        rate, burst = _parse_limit(os.getenv("RATE_LIMIT_GLOBAL"), (100.0, 200))
+        self.global_bucket = TokenBucket(rate, burst) if rate > 0 else None
+
+        self.tool_buckets: Dict[str, TokenBucket] = {}
+        for tool_name in TOOL_DEFAULTS:
+            self.tool_buckets[tool_name] = self._tool_bucket(tool_name)
+
+        self.user_limit = _parse_limit(os.getenv("RATE_LIMIT_USER"), (2.0, 5))
+        self.user_buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self.max_wait = float(os.getenv("RATE_LIMIT_MAX_WAIT", "5"))
+
+        self.allowed = 0
+        self.rejected = 0
+        self.queued = 0
+
+    @staticmethod
+    def _tool_bucket(tool_name: str) -> Optional[TokenBucket]:
+        rate, burst = _parse_limit(
+            os.getenv(f"RATE_LIMIT_TOOL_{tool_name.upper()}"),
+            TOOL_DEFAULTS.get(tool_name, (10.0, 20))
+        )
+        return TokenBucket(rate, burst) if rate > 0 else None
+
+    def _buckets(self, tool_name: str, user_id: str) -> List[TokenBucket]:
+        if tool_name not in self.tool_buckets:
+            self.tool_buckets[tool_name] = self._tool_bucket(tool_name)
+
+        key = (tool_name, user_id)
+        user_bucket = self.user_buckets.get(key)
+        if user_bucket is None and self.user_limit[0] > 0:
+            if len(self.user_buckets) >= self.MAX_USER_BUCKETS:
+                self._prune_idle()
+            user_bucket = TokenBucket(*self.user_limit)
+            self.user_buckets[key] = user_bucket
+
+        return [b for b in (self.global_bucket, self.tool_buckets[tool_name], user_bucket) if b is not None]
+
+    def _prune_idle(self):
+        """Remove baldes de usuário cheios (equivalentes a um balde novo)"""
+        now = time.monotonic()
+        for key in [k for k, b in self.user_buckets.items() if b.is_idle(now)]:
+            del self.user_buckets[key]
+
+    def max_cost(self, tool_name: str, user_id: str) -> Optional[int]:
+        """
+        Maior custo admitido numa única reserva: a menor rajada entre os
+        baldes aplicáveis (None se não há limite). Trabalhos maiores (lotes,
+        broadcasts) reservam fichas um pedaço de cada vez
+        """
+        return min((b.capacity for b in self._buckets(tool_name, user_id)), default=None)
+
+    async def acquire(self, tool_name: str, user_id: str, cost: float = 1) -> Tuple[bool, float]:
+        """
+        Reserva fichas em todos os baldes aplicáveis, aguardando até
+        max_wait segundos
+
+        As fichas são descontadas na chegada e a requisição dorme até o
+        horário reservado: quem chega depois já vê o saldo reduzido, então a
+        fila é atendida em ordem de chegada (sem polling nem inanição).
+        Custos acima de max_cost() são recusados com ValueError: liberá-los
+        de uma vez esvaziaria os baldes compartilhados para todos os usuários
+
+        Returns:
+            (True, 0) se liberado; (False, segundos sugeridos para nova
+            tentativa) se o prazo seria excedido
+        """
+        buckets = self._buckets(tool_name, user_id)
+        limit = min((b.capacity for b in buckets), default=None)
+        if limit is not None and cost > limit:
+            raise ValueError(f"Custo {cost} acima da rajada máxima ({limit}) para {tool_name}")
+        now = time.monotonic()
+        wait = max((b.wait_time(cost, now) for b in buckets), default=0.0)
+        if wait > self.max_wait:
+            self.rejected += 1
+            return False, round(wait, 2)
+
+        for bucket in buckets:
+            bucket.take(cost)
+        self.allowed += 1
+        if wait > 0:
+            self.queued += 1
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                # Requisição cancelada na fila: libera a vez para as seguintes
+                for bucket in buckets:
+                    bucket.refund(cost)
+                raise
+        return True, 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado atual dos baldes (para o painel de administração)"""
+        now = time.monotonic()
+        active_users = sorted(
+            ((key, bucket) for key, bucket in self.user_buckets.items() if not bucket.is_idle(now)),
+            key=lambda item: item[1].tokens
+        )
+        return {
+            "global": self.global_bucket.stats() if self.global_bucket else None,
+            "tools": {
+                tool_name: bucket.stats() if bucket else None
+                for tool_name, bucket in self.tool_buckets.items()
+            },
+            "users": {
+                "limit": {"rate": self.user_limit[0], "capacity": self.user_limit[1]},
+                "tracked": len(self.user_buckets),
+                "active": len(active_users),
+                # Usuários com menos fichas primeiro (os mais próximos do limite)
+                "most_limited": [
+                    {"tool_name": tool_name, "user_id": user_id, **bucket.stats()}
+                    for (tool_name, user_id), bucket in active_users[:50]
+                ]
+            },
+            "max_wait": self.max_wait,
+            "allowed": self.allowed,
+            "queued": self.queued,
+            "rejected": self.rejected
+        }
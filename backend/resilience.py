@@ -0,0 +1,190 @@
+"""
+Resiliência das chamadas aos MCPs
+Retentativas com backoff exponencial (jitter) e circuit breakers por adaptador
+"""
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from typing import Dict, Any, Callable, Awaitable
+
+from backend.mcps.errors import MCPError
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por taxa de erro em uma janela das últimas chamadas
+
+    - closed: chamadas passam; se a taxa de falhas na janela passar do
+      limiar (com um mínimo de chamadas), o circuito abre
+    - open: chamadas falham imediatamente até open_seconds passarem
+    - half_open: algumas chamadas de teste passam; sucesso fecha o
+      circuito, falha abre de novo
+
+    Usado apenas no event loop, por isso não usa lock
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float = None,
+        min_calls: int = None,
+        window_size: int = None,
+        open_seconds: float = None,
+        half_open_max_calls: int = 1
+    ):
+        if failure_rate_threshold is None:
+            failure_rate_threshold = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+        if min_calls is None:
+            min_calls = int(os.getenv("BREAKER_MIN_CALLS", "10"))
+        if window_size is None:
+            window_size = int(os.getenv("BREAKER_WINDOW", "20"))
+        if open_seconds is None:
+            open_seconds = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self._outcomes = deque(maxlen=window_size)
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self._half_open_in_flight = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def is_rejecting(self) -> bool:
+        """Circuito aberto e ainda dentro do tempo de espera (falhar rápido)"""
+        return self.state == self.OPEN and time.monotonic() - self.opened_at < self.open_seconds
+
+    def allow(self) -> bool:
+        """Indica se a chamada pode seguir (e reserva vaga de teste no half_open)"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                self.rejected += 1
+                return False
+            self.state = self.HALF_OPEN
+            self._half_open_in_flight = 0
+
+        if self.state == self.HALF_OPEN:
+            if self._half_open_in_flight >= self.half_open_max_calls:
+                self.rejected += 1
+                return False
+            self._half_open_in_flight += 1
+        return True
+
+    def record_success(self):
+        if self.state == self.HALF_OPEN:
+            self._close()
+            return
+        self._outcomes.append(True)
+
+    def record_failure(self):
+        if self.state == self.HALF_OPEN:
+            self._open()
+            return
+        self._outcomes.append(False)
+        if len(self._outcomes) >= self.min_calls and self.failure_rate >= self.failure_rate_threshold:
+            self._open()
+
+    def record_ignored(self):
+        """Chamada que não conta para o circuito (ex: erro do cliente) libera a vaga de teste"""
+        if self.state == self.HALF_OPEN and self._half_open_in_flight > 0:
+            self._half_open_in_flight -= 1
+
+    @property
+    def failure_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        self._outcomes.clear()
+
+    def _close(self):
+        self.state = self.CLOSED
+        self._half_open_in_flight = 0
+        self._outcomes.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        retry_in = 0.0
+        if self.state == self.OPEN:
+            retry_in = max(0.0, self.open_seconds - (time.monotonic() - self.opened_at))
+        return {
+            "state": self.state,
+            "failure_rate": round(self.failure_rate, 4),
+            "calls_in_window": len(self._outcomes),
+            "failure_rate_threshold": self.failure_rate_threshold,
+            "min_calls": self.min_calls,
+            "open_seconds": self.open_seconds,
+            "retry_in": round(retry_in, 2),
+            "times_opened": self.times_opened,
+            "rejected": self.rejected
+        }
+
+
+class CircuitOpenError(Exception):
+    """Chamada recusada porque o circuito do adaptador está aberto"""
+
+
+async def call_with_resilience(
+    breaker: CircuitBreaker,
+    fn: Callable[[], Awaitable[Any]],
+    max_attempts: int = None,
+    base_delay: float = None,
+    max_delay: float = None
+) -> Any:
+    """
+    Executa fn passando pelo circuit breaker, com retentativas
+
+    Só são refeitas chamadas que falham com MCPError(retryable=True) (o
+    adaptador sabe quais operações são idempotentes). A espera entre
+    tentativas usa backoff exponencial com "full jitter".
+
+    Raises:
+        CircuitOpenError: se o circuito estiver aberto
+    """
+    if max_attempts is None:
+        max_attempts = int(os.getenv("MCP_MAX_ATTEMPTS", "3"))
+    if base_delay is None:
+        base_delay = float(os.getenv("MCP_RETRY_BASE_DELAY", "0.2"))
+    if max_delay is None:
+        max_delay = float(os.getenv("MCP_RETRY_MAX_DELAY", "2"))
+    # Ao menos uma tentativa (MCP_MAX_ATTEMPTS=0 não pode engolir o erro)
+    max_attempts = max(1, max_attempts)
+
+    for attempt in range(max_attempts):
+        if not breaker.allow():
+            raise CircuitOpenError(
+                f"Serviço {breaker.name} temporariamente indisponível (circuito aberto)"
+            )
+        try:
+            result = await fn()
+        except MCPError as e:
+            if not e.transient:
+                breaker.record_ignored()
+                raise
+            breaker.record_failure()
+            if not e.retryable or attempt == max_attempts - 1:
+                raise
+        except asyncio.CancelledError:
+            # Requisição cancelada: não conta, mas libera a vaga de teste
+            breaker.record_ignored()
+            raise
+        except Exception:
+            breaker.record_failure()
+            raise
+        else:
+            breaker.record_success()
+            return result
+
+        await asyncio.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
@@ -3,25 +3,23 @@ Roteamento Inteligente com LLM
 Passo 3: O "Cérebro" - interpreta comandos e decide ações
 """
 import os
-import google.generativeai as genai
-from typing import List, Dict, Any
-from pydantic import BaseModel
+import json
+import time
+import asyncio
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, AsyncIterator
 from dotenv import load_dotenv
 
 # Carregar variáveis de ambiente
 load_dotenv()
 
-from backend.utils import parse_relative_date
-
-class Action(BaseModel):
-    """Representa uma ação a ser executada"""
-    tool_name: str
-    parameters: Dict[str, Any]
-
-class ExecutionPlan(BaseModel):
-    """Plano de execução gerado pelo LLM"""
-    actions: List[Action]
-    reasoning: str
+from backend.models import Action, ExecutionPlan
+from backend.fast_planner import FastPlanner
+from backend.plan_cache import PlanCache, normalize_prompt
+from backend.metrics import PLAN_SECONDS, FALLBACK_PLANS, CONSOLIDATION_SECONDS
+from backend.tracing import span, annotate
 
 class Router:
     """
@@ -34,8 +32,28 @@ class Router:
         if not api_key:
             raise ValueError("GEMINI_API_KEY não configurada")
         
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-pro')
+        self.api_key = api_key
+        # Endpoint alternativo da API (ex: servidor local nos testes de carga)
+        self.api_endpoint = os.getenv("GEMINI_API_ENDPOINT")
+        self._model = None
+        self._model_lock = threading.Lock()
+        
+        # Pool dedicado para as chamadas (síncronas) ao Gemini, para que elas
+        # nunca bloqueiem o event loop; o tamanho limita chamadas simultâneas
+        self.llm_max_workers = int(os.getenv("LLM_MAX_WORKERS", "8"))
+        self._llm_executor = ThreadPoolExecutor(
+            max_workers=self.llm_max_workers,
+            thread_name_prefix="gemini"
+        )
+        
+        # Planejador determinístico consultado antes do LLM
+        self.fast_planner = FastPlanner()
+        
+        # Cache de planos (chave: prompt normalizado com datas resolvidas)
+        self.plan_cache = PlanCache()
+        
+        # Prompts por chamada ao LLM no planejamento em lote
+        self.plan_batch_size = max(1, int(os.getenv("PLAN_BATCH_SIZE", "10")))
         
         # Lista de ferramentas disponíveis
         self.available_tools = [
@@ -54,11 +72,77 @@ class Router:
                 "description": "Enviar mensagens no Slack",
                 "parameters": {
                     "channel": "string - Canal ou ID do canal (ex: #projetos)",
+                    "channels": "list[string] (opcional) - Vários canais para enviar a mesma mensagem (substitui channel)",
                     "message": "string - Mensagem a ser enviada"
                 }
             }
         ]
     
+    @property
+    def model(self):
+        """
+        Modelo Gemini, criado no primeiro uso: o SDK só é importado quando
+        um prompt realmente precisa do LLM (o planejador rápido não precisa)
+        """
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    import google.generativeai as genai
+                    options = {}
+                    if self.api_endpoint:
+                        options = {"transport": "rest", "client_options": {"api_endpoint": self.api_endpoint}}
+                    genai.configure(api_key=self.api_key, **options)
+                    self._model = genai.GenerativeModel('gemini-pro')
+        return self._model
+    
+    async def _generate(self, prompt: str) -> str:
+        """Chama o modelo no pool dedicado e retorna o texto da resposta"""
+        loop = asyncio.get_running_loop()
+        started = []
+        
+        def generate():
+            started.append(time.perf_counter())
+            return self.model.generate_content(prompt)
+        
+        # self.model é acessado na thread: a importação do SDK no primeiro
+        # uso não bloqueia o event loop
+        with span("llm_call") as llm_span:
+            submitted = time.perf_counter()
+            response = await loop.run_in_executor(self._llm_executor, generate)
+            if llm_span is not None:
+                # Tempo esperando uma thread livre no pool do Gemini
+                llm_span.attributes["queue_ms"] = round((started[0] - submitted) * 1000, 3)
+        return response.text.strip()
+    
+    async def _generate_stream(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Chama o modelo em modo streaming no pool dedicado e produz os
+        trechos de texto conforme são gerados
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+        
+        def produce():
+            try:
+                for chunk in self.model.generate_content(prompt, stream=True):
+                    if chunk.text:
+                        loop.call_soon_threadsafe(queue.put_nowait, chunk.text)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+        
+        producer = loop.run_in_executor(self._llm_executor, produce)
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+        await producer
+    
     async def plan_execution(
         self,
         prompt: str,
@@ -74,9 +158,176 @@ class Router:
         Returns:
             ExecutionPlan com lista de ações
         """
+        start = time.perf_counter()
+        
+        # Caminho rápido: comandos comuns são planejados sem LLM
+        fast_plan = self._fast_plan(prompt)
+        if fast_plan is not None and self.fast_planner.is_confident(fast_plan):
+            PLAN_SECONDS.labels("fast").observe(time.perf_counter() - start)
+            annotate(source="fast")
+            return fast_plan
+        
+        # None: prompt com tempo relativo a agora, sem cache
+        cache_key = normalize_prompt(prompt)
+        cached_plan = self.plan_cache.get(cache_key) if cache_key is not None else None
+        if cached_plan is not None:
+            PLAN_SECONDS.labels("cache").observe(time.perf_counter() - start)
+            annotate(source="cache")
+            return cached_plan.model_copy(deep=True)
+        
+        try:
+            plan = await self._plan_with_llm(prompt)
+        
+        except Exception as e:
+            # Fallback: tentar extrair informações básicas
+            plan = self._fallback_plan(prompt)
+            PLAN_SECONDS.labels("fallback").observe(time.perf_counter() - start)
+            annotate(source="fallback")
+            return plan
+        
+        # Planos de fallback não são cacheados, apenas os gerados pelo LLM
+        if cache_key is not None:
+            self.plan_cache.set(cache_key, plan.model_copy(deep=True))
+        PLAN_SECONDS.labels("llm").observe(time.perf_counter() - start)
+        annotate(source="llm")
+        return plan
+    
+    def _fast_plan(self, prompt: str) -> Optional[ExecutionPlan]:
+        """Plano do planejador rápido; None se as regras falharem (segue para o LLM)"""
+        try:
+            return self.fast_planner.plan(prompt)
+        except Exception:
+            return None
+    
+    async def _plan_with_llm(self, prompt: str) -> ExecutionPlan:
+        """Gera o plano de um prompt com o LLM (exceção se a resposta for inválida)"""
+        system_prompt = f"""{self._planning_instructions()}
+
+COMANDO DO USUÁRIO:
+{prompt}
+
+RESPOSTA (apenas JSON, sem markdown):"""
+
+        response_text = await self._generate(system_prompt)
+        return self._plan_from_data(self._parse_json_response(response_text))
+    
+    async def plan_batch(self, prompts: List[str], user_ids: List[str]) -> List[ExecutionPlan]:
+        """
+        Gera planos para vários prompts com o mínimo de chamadas ao LLM
+        
+        Prompts resolvidos pelo planejador rápido ou pelo cache não vão ao
+        LLM; prompts repetidos são planejados uma vez; os demais são
+        agrupados (PLAN_BATCH_SIZE por chamada) em uma única requisição
+        estruturada. Itens que o modelo não devolver em um lote são
+        planejados individualmente por plan_execution
+        
+        Args:
+            prompts: Comandos em linguagem natural
+            user_ids: ID do usuário de cada comando (mesma ordem)
+        
+        Returns:
+            Planos na mesma ordem dos prompts
+        """
+        start = time.perf_counter()
+        plans: List[Optional[ExecutionPlan]] = [None] * len(prompts)
+        # chave normalizada -> índices dos prompts que ainda precisam do LLM
+        # (prompts sem cache usam a chave (índice,): nem cache nem deduplicação)
+        pending: Dict[Any, List[int]] = {}
+        
+        for i, prompt in enumerate(prompts):
+            fast_plan = self._fast_plan(prompt)
+            if fast_plan is not None and self.fast_planner.is_confident(fast_plan):
+                plans[i] = fast_plan
+                continue
+            cache_key = normalize_prompt(prompt)
+            if cache_key is None:
+                pending[(i,)] = [i]
+                continue
+            cached_plan = self.plan_cache.get(cache_key)
+            if cached_plan is not None:
+                plans[i] = cached_plan.model_copy(deep=True)
+                continue
+            pending.setdefault(cache_key, []).append(i)
+        
+        keys = list(pending)
+        chunks = [keys[i:i + self.plan_batch_size] for i in range(0, len(keys), self.plan_batch_size)]
+        chunk_plans = await asyncio.gather(*(
+            self._plan_chunk([prompts[pending[key][0]] for key in chunk])
+            for chunk in chunks
+        ))
+        
+        missing = []
+        for chunk, generated in zip(chunks, chunk_plans):
+            for key, plan in zip(chunk, generated):
+                if plan is None:
+                    if len(chunk) > 1:
+                        missing.append(key)
+                    else:
+                        # Já foi uma chamada individual: não repetir
+                        for i in pending[key]:
+                            plans[i] = self._fallback_plan(prompts[i])
+                    continue
+                if isinstance(key, str):
+                    self.plan_cache.set(key, plan.model_copy(deep=True))
+                for i in pending[key]:
+                    plans[i] = plan.model_copy(deep=True)
+        
+        single_plans = await asyncio.gather(*(
+            self.plan_execution(prompts[pending[key][0]], user_ids[pending[key][0]]) for key in missing
+        ))
+        for key, plan in zip(missing, single_plans):
+            for i in pending[key]:
+                plans[i] = plan.model_copy(deep=True)
+        
+        PLAN_SECONDS.labels("batch").observe(time.perf_counter() - start)
+        return plans
+    
+    async def _plan_chunk(self, prompts: List[str]) -> List[Optional[ExecutionPlan]]:
+        """Planeja vários prompts em uma chamada; None para itens sem plano válido"""
+        if len(prompts) == 1:
+            try:
+                return [await self._plan_with_llm(prompts[0])]
+            except Exception:
+                return [None]
+        
+        commands = "\n".join(f"[{i}] {prompt}" for i, prompt in enumerate(prompts))
+        system_prompt = f"""{self._planning_instructions()}
+
+MODO LOTE: há vários comandos independentes, numerados. Gere um plano para
+CADA comando, com a estrutura acima, e retorne um JSON no formato:
+{{
+    "plans": [
+        {{"index": 0, "actions": [...], "reasoning": "..."}}
+    ]
+}}
+Os índices em "depends_on" se referem às ações do próprio plano.
+
+COMANDOS:
+{commands}
+
+RESPOSTA (apenas JSON, sem markdown):"""
+
+        plans: List[Optional[ExecutionPlan]] = [None] * len(prompts)
+        try:
+            response_text = await self._generate(system_prompt)
+            plan_list = self._parse_json_response(response_text).get("plans", [])
+        except Exception:
+            return plans
+        
+        for plan_data in plan_list:
+            try:
+                index = int(plan_data.get("index"))
+                if 0 <= index < len(prompts):
+                    plans[index] = self._plan_from_data(plan_data)
+            except Exception:
+                continue
+        return plans
+    
+    def _planning_instructions(self) -> str:
+        """Instruções do prompt de planejamento (sem o comando do usuário)"""
         tools_description = self._format_tools_description()
         
-        system_prompt = f"""Você é um assistente que interpreta comandos em linguagem natural e os converte em ações executáveis.
+        return f"""Você é um assistente que interpreta comandos em linguagem natural e os converte em ações executáveis.
 
 FERRAMENTAS DISPONÍVEIS:
 {tools_description}
@@ -90,7 +341,8 @@ INSTRUÇÕES:
     "actions": [
         {{
             "tool_name": "nome_da_ferramenta",
-            "parameters": {{"param1": "valor1", "param2": "valor2"}}
+            "parameters": {{"param1": "valor1", "param2": "valor2"}},
+            "depends_on": []
         }}
     ],
     "reasoning": "Explicação breve do que será feito"
@@ -100,43 +352,33 @@ IMPORTANTE:
 - Para datas relativas como "amanhã", "hoje", calcule a data real no formato ISO 8601
 - Para horários, use formato ISO 8601 completo (ex: "2024-01-15T10:00:00")
 - Se o usuário mencionar "canal #nome", use "#nome" como channel
+- A data de hoje é {datetime.now().strftime("%Y-%m-%d (%A)")}
 - Seja preciso na extração de parâmetros
 - Se não houver horário de fim especificado, use 1 hora após o início
-
-COMANDO DO USUÁRIO:
-{prompt}
-
-RESPOSTA (apenas JSON, sem markdown):"""
-
-        try:
-            response = self.model.generate_content(system_prompt)
-            response_text = response.text.strip()
-            
-            # Remover markdown code blocks se houver
-            if response_text.startswith("```"):
-                response_text = response_text.split("```")[1]
-                if response_text.startswith("json"):
-                    response_text = response_text[4:]
-                response_text = response_text.strip()
-            
-            # Parse JSON
-            import json
-            plan_data = json.loads(response_text)
-            
-            # Criar ExecutionPlan
-            actions = [
-                Action(**action_data)
-                for action_data in plan_data.get("actions", [])
-            ]
-            
-            return ExecutionPlan(
-                actions=actions,
-                reasoning=plan_data.get("reasoning", "")
-            )
-        
-        except Exception as e:
-            # Fallback: tentar extrair informações básicas
-            return self._fallback_plan(prompt)
+- "depends_on" lista os índices (começando em 0) das ações anteriores que precisam terminar antes desta; use [] quando a ação for independente"""
+    
+    @staticmethod
+    def _parse_json_response(response_text: str) -> Any:
+        """Converte a resposta do modelo em JSON"""
+        # Remover markdown code blocks se houver
+        if response_text.startswith("```"):
+            response_text = response_text.split("```")[1]
+            if response_text.startswith("json"):
+                response_text = response_text[4:]
+            response_text = response_text.strip()
+        return json.loads(response_text)
+    
+    @staticmethod
+    def _plan_from_data(plan_data: Dict[str, Any]) -> ExecutionPlan:
+        """Cria o ExecutionPlan a partir do JSON do modelo"""
+        actions = [
+            Action(**action_data)
+            for action_data in plan_data.get("actions", [])
+        ]
+        return ExecutionPlan(
+            actions=actions,
+            reasoning=plan_data.get("reasoning", "")
+        )
     
     def _format_tools_description(self) -> str:
         """Formata descrição das ferramentas para o prompt"""
@@ -150,6 +392,14 @@ RESPOSTA (apenas JSON, sem markdown):"""
     
     def _fallback_plan(self, prompt: str) -> ExecutionPlan:
         """Plano de fallback caso o LLM falhe"""
+        FALLBACK_PLANS.labels().inc()
+        
+        # Preferir o plano do planejador rápido, mesmo com confiança baixa
+        fast_plan = self._fast_plan(prompt)
+        if fast_plan is not None and fast_plan.actions:
+            fast_plan.reasoning = "Plano gerado via fallback (planejador rápido)"
+            return fast_plan
+        
         # Análise básica de palavras-chave
         actions = []
         prompt_lower = prompt.lower()
@@ -174,13 +424,78 @@ RESPOSTA (apenas JSON, sem markdown):"""
     async def consolidate_response(
         self,
         original_prompt: str,
-        results: List[Dict[str, Any]]
-    ) -> str:
+        results: List[Dict[str, Any]],
+        mode: str = "template"
+    ) -> Optional[str]:
         """
         Consolida múltiplas respostas em uma resposta única e amigável
         Passo 6: O "Porta-Voz"
+        
+        Args:
+            original_prompt: Comando original do usuário
+            results: Resultados das ações
+            mode: "template" (padrão, sem LLM), "llm" (resposta escrita pelo
+                modelo) ou "none" (sem consolidação)
+        """
+        with CONSOLIDATION_SECONDS.labels(mode).time():
+            return await self._consolidate(original_prompt, results, mode)
+    
+    async def _consolidate(
+        self,
+        original_prompt: str,
+        results: List[Dict[str, Any]],
+        mode: str
+    ) -> Optional[str]:
+        if mode == "none":
+            return None
+        if mode != "llm":
+            return self._template_consolidation(results)
+        
+        consolidation_prompt = self._consolidation_prompt(original_prompt, results)
+
+        try:
+            return await self._generate(consolidation_prompt)
+        except:
+            # Fallback: resposta por templates
+            return self._template_consolidation(results)
+    
+    async def stream_consolidation(
+        self,
+        original_prompt: str,
+        results: List[Dict[str, Any]],
+        mode: str = "template"
+    ) -> AsyncIterator[str]:
         """
-        consolidation_prompt = f"""Você recebeu um comando do usuário e várias respostas de execução.
+        Versão em streaming de consolidate_response
+        No modo "llm" produz o texto conforme o modelo gera; nos demais,
+        produz a resposta completa de uma vez (ou nada, no modo "none")
+        """
+        if mode != "llm":
+            response = await self.consolidate_response(original_prompt, results, mode)
+            if response is not None:
+                yield response
+            return
+        
+        sent_any = False
+        with CONSOLIDATION_SECONDS.labels(mode).time():
+            try:
+                async for chunk in self._generate_stream(
+                    self._consolidation_prompt(original_prompt, results)
+                ):
+                    sent_any = True
+                    yield chunk
+            except Exception:
+                # Só usa o template se nada foi enviado ainda
+                if not sent_any:
+                    yield self._template_consolidation(results)
+    
+    def _consolidation_prompt(
+        self,
+        original_prompt: str,
+        results: List[Dict[str, Any]]
+    ) -> str:
+        """Prompt usado para a consolidação via LLM"""
+        return f"""Você recebeu um comando do usuário e várias respostas de execução.
 
 COMANDO ORIGINAL:
 {original_prompt}
@@ -195,13 +510,6 @@ Crie uma resposta consolidada, amigável e em linguagem natural que:
 4. Não seja técnica demais
 
 RESPOSTA (apenas texto, sem formatação):"""
-
-        try:
-            response = self.model.generate_content(consolidation_prompt)
-            return response.text.strip()
-        except:
-            # Fallback: resposta simples
-            return self._simple_consolidation(results)
     
     def _format_results(self, results: List[Dict[str, Any]]) -> str:
         """Formata resultados para o prompt de consolidação"""
@@ -213,13 +521,73 @@ RESPOSTA (apenas texto, sem formatação):"""
             formatted.append(f"  Detalhes: {result.get('details', {})}")
         return "\n".join(formatted)
     
-    def _simple_consolidation(self, results: List[Dict[str, Any]]) -> str:
-        """Consolidação simples sem LLM"""
-        success_count = sum(1 for r in results if r.get("status") == "success")
-        total = len(results)
+    def _template_consolidation(self, results: List[Dict[str, Any]]) -> str:
+        """Consolidação sem LLM: uma frase por ação, a partir de templates por ferramenta"""
+        if not results:
+            return "Não identifiquei nenhuma ação para executar nesse comando."
         
-        if success_count == total:
-            return f"Pronto! Executei {total} ação(ões) com sucesso."
+        templates = {
+            "google_calendar": self._describe_calendar_result,
+            "slack": self._describe_slack_result,
+        }
+        sentences = []
+        for result in results:
+            tool_name = result.get("tool_name", "desconhecida")
+            if result.get("status") != "success":
+                sentences.append(
+                    f"Não consegui concluir a ação em {tool_name}: {result.get('error', 'erro desconhecido')}."
+                )
+                continue
+            describe = templates.get(tool_name)
+            sentences.append(
+                describe(result.get("details") or {}) if describe
+                else f"Executei a ação em {tool_name} com sucesso."
+            )
+        
+        success_count = sum(1 for r in results if r.get("status") == "success")
+        prefix = "Pronto! " if success_count == len(results) else ""
+        return prefix + " ".join(sentences)
+    
+    @staticmethod
+    def _format_datetime(value: Optional[str]) -> str:
+        """Formata data/hora ISO 8601 como "dd/mm às HH:MM" """
+        if not value:
+            return ""
+        try:
+            return datetime.fromisoformat(value).strftime("%d/%m às %H:%M")
+        except ValueError:
+            return value
+    
+    @staticmethod
+    def _format_date(value: str) -> str:
+        """Formata data ISO 8601 (YYYY-MM-DD) como "dd/mm" """
+        try:
+            return datetime.strptime(value, "%Y-%m-%d").strftime("%d/%m")
+        except ValueError:
+            return value
+    
+    def _describe_calendar_result(self, details: Dict[str, Any]) -> str:
+        summary = details.get("summary") or "o evento"
+        start = details.get("start") or {}
+        if start.get("dateTime"):
+            when = f" para {self._format_datetime(start['dateTime'])}"
+        elif start.get("date"):
+            # Evento de dia inteiro
+            when = f" para {self._format_date(start['date'])} (dia inteiro)"
         else:
-            return f"Executei {success_count} de {total} ação(ões) com sucesso. Algumas ações podem ter falhado."
-
+            when = ""
+        return f"Criei \"{summary}\" no seu Google Calendar{when}."
+    
+    def _describe_slack_result(self, details: Dict[str, Any]) -> str:
+        if "broadcast" in details:
+            sent = [r["channel"] for r in details["broadcast"] if r.get("status") == "success"]
+            total = len(details["broadcast"])
+            if len(sent) == total:
+                return f"Enviei a mensagem em {total} canal(is) do Slack: {', '.join(sent)}."
+            failed = [r["channel"] for r in details["broadcast"] if r.get("status") != "success"]
+            return (
+                f"Enviei a mensagem em {len(sent)} de {total} canais do Slack; "
+                f"não consegui enviar em {', '.join(failed)}."
+            )
+        channel = details.get("channel_name") or details.get("channel") or "o canal"
+        return f"Enviei a mensagem em {channel} no Slack."
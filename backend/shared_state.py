@@ -0,0 +1,154 @@
+"""
+Estado Compartilhado entre Workers
+Com vários processos do uvicorn (GATEWAY_WORKERS > 1), chaves de
+idempotência e jobs precisam ser vistos por todos os workers: a repetição
+de uma requisição ou a consulta de um job pode cair em outro processo.
+Guarda ambos em SQLite (WAL) ao lado do cofre; com um único worker o
+estado fica só na memória e este módulo não é usado
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+
+# Estados de uma chave de idempotência no banco
+CLAIMED = "claimed"
+RUNNING = "running"
+DONE = "done"
+CONFLICT = "conflict"
+
+
+class SharedStateStore:
+    """
+    Tabelas idempotency ((user_id, chave) -> execução) e jobs (job_id ->
+    estado do job), com expiração por horário absoluto (time.time(), igual
+    em todos os processos)
+
+    As operações são síncronas e curtas; no event loop, chame-as com
+    asyncio.to_thread
+    """
+
+    def __init__(self, path: str = "credentials/shared_state.db", claim_timeout: float = None):
+        if claim_timeout is None:
+            claim_timeout = float(os.getenv("IDEMPOTENCY_CLAIM_TIMEOUT", "300"))
+        # Execução em andamento sem conclusão após esse prazo (worker que
+        # caiu) deixa de bloquear a chave
+        self.claim_timeout = claim_timeout
+        self.path = path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS idempotency (
+                user_id TEXT NOT NULL,
+                key TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                result TEXT,
+                claimed_at REAL NOT NULL,
+                expires_at REAL,
+                PRIMARY KEY (user_id, key)
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_idempotency_expires_at ON idempotency (expires_at)"
+        )
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_expires_at ON jobs (expires_at)")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def claim(self, user_id: str, key: str, fingerprint: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        Tenta assumir a execução da chave
+
+        Returns:
+            (CLAIMED, None) se este worker deve executar; (RUNNING, None) se
+            outro worker está executando; (DONE, resultado) se já terminou;
+            (CONFLICT, None) se a chave foi usada com outro conteúdo
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM idempotency WHERE expires_at <= ?", (now,))
+                row = self._conn.execute(
+                    "SELECT fingerprint, result, claimed_at FROM idempotency WHERE user_id = ? AND key = ?",
+                    (user_id, key)
+                ).fetchone()
+                if row is not None and row[1] is None and row[2] < now - self.claim_timeout:
+                    row = None
+                if row is None:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO idempotency (user_id, key, fingerprint, result, claimed_at, expires_at) "
+                        "VALUES (?, ?, ?, NULL, ?, NULL)",
+                        (user_id, key, fingerprint, now)
+                    )
+                    state = (CLAIMED, None)
+                elif row[0] != fingerprint:
+                    state = (CONFLICT, None)
+                elif row[1] is None:
+                    state = (RUNNING, None)
+                else:
+                    state = (DONE, json.loads(row[1]))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return state
+
+    def complete(self, user_id: str, key: str, result: Dict[str, Any], ttl: float):
+        """Guarda o resultado da execução até ttl segundos a partir de agora"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE idempotency SET result = ?, expires_at = ? WHERE user_id = ? AND key = ?",
+                (json.dumps(result, ensure_ascii=False, default=str), time.time() + ttl, user_id, key)
+            )
+
+    def release(self, user_id: str, key: str):
+        """Libera a chave de uma execução que falhou (a próxima tentativa roda de novo)"""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM idempotency WHERE user_id = ? AND key = ? AND result IS NULL",
+                (user_id, key)
+            )
+
+    def put_job(self, job: Dict[str, Any], ttl: float):
+        """Publica o estado atual do job (expira ttl segundos após terminar)"""
+        finished_at = job.get("finished_at")
+        expires_at = (finished_at or time.time()) + ttl
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, data, expires_at) VALUES (?, ?, ?)",
+                (job["job_id"], json.dumps(job, ensure_ascii=False, default=str), expires_at)
+            )
+
+    def delete_job(self, job_id: str):
+        """Remove um job publicado que não chegou a entrar na fila"""
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM jobs WHERE job_id = ? AND expires_at > ?",
+                (job_id, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def prune_jobs(self):
+        """Remove jobs expirados (pelo índice de expiração)"""
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE expires_at <= ?", (time.time(),))
@@ -0,0 +1,141 @@
+"""
+Rastreamento por Requisição
+Árvore de spans (planejamento, ações, credenciais, chamada ao serviço,
+consolidação e esperas em fila) com início relativo e duração, para depurar
+comandos lentos. Os spans seguem o contexto (contextvars): tasks e
+asyncio.to_thread criadas dentro de um span herdam o span atual.
+Sem trace ativo, span() não registra nada (custo desprezível)
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Optional, List
+
+_current: ContextVar[Optional["Span"]] = ContextVar("trace_span", default=None)
+_file_lock = threading.Lock()
+
+
+class Span:
+    """Trecho cronometrado com atributos e filhos"""
+
+    def __init__(self, name: str, attributes: Dict[str, Any], start: float = None):
+        self.name = name
+        self.attributes = attributes
+        self.start = time.perf_counter() if start is None else start
+        self.end: Optional[float] = None
+        self.children: List["Span"] = []
+
+    def finish(self, end: float = None):
+        self.end = time.perf_counter() if end is None else end
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        end = self.end if self.end is not None else time.perf_counter()
+        data = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round((end - self.start) * 1000, 3)
+        }
+        if self.attributes:
+            data["attributes"] = self.attributes
+        if self.children:
+            data["children"] = [
+                child.to_dict(origin)
+                for child in sorted(self.children, key=lambda child: child.start)
+            ]
+        return data
+
+
+class Trace:
+    """Raiz de uma árvore de spans (uma por requisição rastreada)"""
+
+    def __init__(self, name: str, start: float = None, **attributes):
+        self.trace_id = uuid.uuid4().hex
+        self.root = Span(name, attributes, start=start)
+        self.started_at = time.time() - (time.perf_counter() - self.root.start)
+
+    def to_dict(self) -> Dict[str, Any]:
+        spans = self.root.to_dict(self.root.start)
+        return {
+            "trace_id": self.trace_id,
+            "started_at": self.started_at,
+            "total_ms": spans["duration_ms"],
+            "spans": spans
+        }
+
+
+@contextmanager
+def trace(name: str, enabled: bool = True, start: float = None, **attributes):
+    """
+    Inicia um trace para o bloco (ou nada, se enabled for False)
+    `start` (time.perf_counter) permite começar antes do bloco, ex: no
+    momento em que a requisição entrou em uma fila
+
+    Yields:
+        Trace ou None
+    """
+    if not enabled:
+        yield None
+        return
+    current = Trace(name, start=start, **attributes)
+    token = _current.set(current.root)
+    try:
+        yield current
+    finally:
+        current.root.finish()
+        _current.reset(token)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Span filho do span atual; sem trace ativo, não faz nada"""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name, attributes)
+    parent.children.append(child)
+    token = _current.set(child)
+    try:
+        yield child
+    finally:
+        child.finish()
+        _current.reset(token)
+
+
+def add_span(name: str, start: float, end: float, **attributes):
+    """Registra um span já medido (ex: espera em fila medida por timestamps)"""
+    parent = _current.get()
+    if parent is None:
+        return
+    child = Span(name, attributes, start=start)
+    child.finish(end)
+    parent.children.append(child)
+
+
+def annotate(**attributes):
+    """Adiciona atributos ao span atual (se houver trace ativo)"""
+    current = _current.get()
+    if current is not None:
+        current.attributes.update(attributes)
+
+
+def is_active() -> bool:
+    return _current.get() is not None
+
+
+def write_trace(data: Dict[str, Any], path: str = None):
+    """
+    Acrescenta o trace em um arquivo JSON lines (TRACE_FILE), para análise
+    offline. Síncrono: chamar fora do event loop
+    """
+    path = path or os.getenv("TRACE_FILE")
+    if not path:
+        return
+    line = json.dumps(data, ensure_ascii=False, default=str)
+    with _file_lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
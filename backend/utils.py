@@ -1,16 +1,32 @@
 """
 Utilitários auxiliares
 """
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import csv
+import io
+import os
 import re
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
 
 def parse_relative_date(date_str: str, time_str: str = "00:00") -> tuple:
     """
     Converte datas relativas em datas absolutas
     
     Args:
-        date_str: String como "amanhã", "hoje", "15/01/2024"
-        time_str: String como "10:00" ou "10h"
+        date_str: String como "amanhã", "hoje", "15/01/2024", "15/01"
+        time_str: String como "10:00", "10h" ou "10h30"
         
     Returns:
         Tupla (start_time, end_time) em formato ISO 8601
@@ -18,7 +34,7 @@ def parse_relative_date(date_str: str, time_str: str = "00:00") -> tuple:
     now = datetime.now()
     
     # Parse do horário
-    time_match = re.search(r'(\d{1,2}):?(\d{2})?', time_str)
+    time_match = re.search(r'(\d{1,2})\s*(?:h|:)?\s*(\d{2})?', time_str)
     if time_match:
         hour = int(time_match.group(1))
         minute = int(time_match.group(2)) if time_match.group(2) else 0
@@ -31,10 +47,10 @@ def parse_relative_date(date_str: str, time_str: str = "00:00") -> tuple:
     
     if "hoje" in date_str_lower:
         target_date = now
+    elif "depois de amanhã" in date_str_lower or "depois de amanha" in date_str_lower:
+        target_date = now + timedelta(days=2)
     elif "amanhã" in date_str_lower or "amanha" in date_str_lower:
         target_date = now + timedelta(days=1)
-    elif "depois de amanhã" in date_str_lower:
-        target_date = now + timedelta(days=2)
     else:
         # Tentar parse de data específica
         try:
@@ -43,6 +59,11 @@ def parse_relative_date(date_str: str, time_str: str = "00:00") -> tuple:
                 parts = date_str.split("/")
                 if len(parts) == 3:
                     target_date = datetime(int(parts[2]), int(parts[1]), int(parts[0]))
+                elif len(parts) == 2:
+                    # Formato DD/MM (próxima ocorrência: datas que já passaram vão para o ano seguinte)
+                    target_date = datetime(now.year, int(parts[1]), int(parts[0]))
+                    if target_date.date() < now.date():
+                        target_date = target_date.replace(year=now.year + 1)
                 else:
                     target_date = now
             else:
@@ -61,3 +82,271 @@ def parse_relative_date(date_str: str, time_str: str = "00:00") -> tuple:
     
     return start_iso, end_iso
 
+
+class SingleFlight:
+    """
+    Garante no máximo uma execução simultânea por chave
+    Chamadas concorrentes com a mesma chave aguardam a execução em andamento
+    e recebem o mesmo resultado (ou a mesma exceção)
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Any, Dict[str, Any]] = {}
+    
+    def do(self, key: Any, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {"done": threading.Event(), "result": None, "error": None}
+                self._calls[key] = call
+        
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+        
+        try:
+            call["result"] = fn()
+            return call["result"]
+        except BaseException as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call["done"].set()
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight para o event loop: a primeira chamada de uma chave cria a
+    tarefa e as concorrentes aguardam a mesma tarefa (sem ocupar threads)
+    O cancelamento de quem aguarda não cancela a tarefa compartilhada
+    """
+    
+    def __init__(self):
+        self._tasks: Dict[Any, "asyncio.Future"] = {}
+    
+    async def do(self, key: Any, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task)
+    
+    def _forget(self, key: Any, task: "asyncio.Future"):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # Evita o aviso de exceção não lida quando todos os chamadores foram cancelados
+        if not task.cancelled():
+            task.exception()
+    
+
+def worker_count() -> int:
+    """Número de processos do backend (GATEWAY_WORKERS, definido por tools/run_workers.py)"""
+    return max(1, int(os.getenv("GATEWAY_WORKERS", "1")))
+
+
+def atomic_write(path: str, data: bytes):
+    """
+    Grava um arquivo de forma atômica: escreve em arquivo temporário no mesmo
+    diretório, faz fsync e renomeia sobre o destino
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def atomic_create(path: str, data: bytes) -> bool:
+    """
+    Cria o arquivo com o conteúdo completo apenas se ele ainda não existir
+    (seguro entre processos: o os.link falha se outro processo criou antes)
+    
+    Returns:
+        True se o arquivo foi criado, False se já existia
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.link(tmp_path, path)
+        return True
+    except FileExistsError:
+        return False
+    finally:
+        os.remove(tmp_path)
+
+
+class InterProcessLock:
+    """
+    Locks por chave entre processos (vários workers do uvicorn)
+    
+    Usa fcntl.lockf sobre faixas de um único arquivo: cada chave é mapeada
+    para um dos `stripes` bytes. Como locks POSIX pertencem ao processo, um
+    threading.Lock por faixa serializa também as threads do mesmo processo.
+    Em sistemas sem fcntl (Windows) o lock vale apenas dentro do processo
+    """
+    
+    def __init__(self, path: str, stripes: int = 1024):
+        self.path = path
+        self.stripes = stripes
+        self._thread_locks = [threading.Lock() for _ in range(stripes)]
+        self._fd: Optional[int] = None
+        if fcntl is not None:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    
+    def _stripe(self, key: Any) -> int:
+        digest = hashlib.blake2b(repr(key).encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big") % self.stripes
+    
+    @contextmanager
+    def hold(self, key: Any):
+        stripe = self._stripe(key)
+        with self._thread_locks[stripe]:
+            if self._fd is None:
+                yield
+                return
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, stripe)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, stripe)
+
+
+def is_all_day(value: str) -> bool:
+    """Data sem horário (YYYY-MM-DD) indica evento de dia inteiro"""
+    return bool(value) and "T" not in value
+
+
+# Aliases aceitos nas colunas de CSV de eventos
+_CSV_COLUMNS = {
+    "title": ("title", "titulo", "título", "summary"),
+    "start_time": ("start_time", "inicio", "início", "start"),
+    "end_time": ("end_time", "fim", "end"),
+    "description": ("description", "descricao", "descrição"),
+}
+
+
+def default_end_time(start_time: str) -> str:
+    """Fim padrão: 1 hora após o início (dia seguinte, para eventos de dia inteiro)"""
+    try:
+        if is_all_day(start_time):
+            return (date.fromisoformat(start_time) + timedelta(days=1)).isoformat()
+        return (datetime.fromisoformat(start_time) + timedelta(hours=1)).isoformat()
+    except ValueError:
+        return ""
+
+
+def parse_events_csv(text: str) -> List[Dict[str, str]]:
+    """
+    Converte um CSV de eventos em parâmetros para o Google Calendar
+    
+    Colunas: title, start_time, end_time (opcional), description (opcional)
+    (também aceita titulo, inicio, fim, descricao)
+    """
+    reader = csv.DictReader(io.StringIO(text))
+    events = []
+    for row in reader:
+        # Valores além das colunas do cabeçalho (chave None) são ignorados
+        normalized = {k.strip().lower(): (v or "").strip() for k, v in row.items() if k is not None}
+        event = {}
+        for field, aliases in _CSV_COLUMNS.items():
+            event[field] = next((normalized[a] for a in aliases if normalized.get(a)), "")
+        if not event["end_time"] and event["start_time"]:
+            event["end_time"] = default_end_time(event["start_time"])
+        events.append(event)
+    return events
+
+
+def _parse_ics_datetime(value: str, params: str = "") -> str:
+    """
+    Converte data/hora iCalendar para ISO 8601
+    20240115T100000Z (UTC), 20240115T100000 com TZID=... (horário local da
+    zona, com offset) ou sem zona (horário flutuante); 20240115 ou
+    VALUE=DATE viram data sem horário (evento de dia inteiro)
+    """
+    value = value.strip()
+    options = {
+        key.upper(): option
+        for key, option in (part.split("=", 1) for part in params.split(";") if "=" in part)
+    }
+    try:
+        if options.get("VALUE", "").upper() == "DATE" or "T" not in value:
+            return datetime.strptime(value[:8], "%Y%m%d").date().isoformat()
+        utc = value.endswith("Z")
+        parsed = datetime.strptime(value.rstrip("Z"), "%Y%m%dT%H%M%S")
+        if utc:
+            return parsed.isoformat() + "+00:00"
+        tzid = options.get("TZID", "").strip('"')
+        if tzid:
+            try:
+                parsed = parsed.replace(tzinfo=ZoneInfo(tzid))
+            except (ZoneInfoNotFoundError, ValueError):
+                # Zona desconhecida (ex: nomes do Windows): mantém horário flutuante
+                pass
+        return parsed.isoformat()
+    except ValueError:
+        return ""
+
+
+_ICS_ESCAPE_RE = re.compile(r"\\([\\;,nN])")
+
+
+def _unescape_ics_text(value: str) -> str:
+    """Desfaz os escapes de TEXT (RFC 5545) em uma única passada"""
+    return _ICS_ESCAPE_RE.sub(lambda m: "\n" if m.group(1) in "nN" else m.group(1), value)
+
+
+def parse_events_ics(text: str) -> List[Dict[str, str]]:
+    """
+    Converte um arquivo iCalendar (.ics) em parâmetros para o Google Calendar
+    Lê SUMMARY, DTSTART, DTEND e DESCRIPTION de cada VEVENT
+    """
+    # Desdobrar linhas continuadas (RFC 5545: linha iniciada por espaço/tab)
+    lines: List[str] = []
+    for raw in text.splitlines():
+        if raw[:1] in (" ", "\t") and lines:
+            lines[-1] += raw[1:]
+        else:
+            lines.append(raw)
+    
+    events = []
+    current: Optional[Dict[str, str]] = None
+    for line in lines:
+        if line == "BEGIN:VEVENT":
+            current = {"title": "", "start_time": "", "end_time": "", "description": ""}
+        elif line == "END:VEVENT" and current is not None:
+            if not current["end_time"] and current["start_time"]:
+                current["end_time"] = default_end_time(current["start_time"])
+            events.append(current)
+            current = None
+        elif current is not None and ":" in line:
+            name, value = line.split(":", 1)
+            name, _, params = name.partition(";")
+            name = name.upper()
+            if name == "SUMMARY":
+                current["title"] = _unescape_ics_text(value)
+            elif name == "DESCRIPTION":
+                current["description"] = _unescape_ics_text(value)
+            elif name == "DTSTART":
+                current["start_time"] = _parse_ics_datetime(value, params)
+            elif name == "DTEND":
+                current["end_time"] = _parse_ics_datetime(value, params)
+    return events
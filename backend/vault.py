@@ -3,18 +3,29 @@ Cofre de Chaves - Gerenciamento Centralizado de Credenciais
 Passo 5: O "Cofre" - segurança e autenticação centralizada
 """
 import os
-import json
-from typing import Dict, Any, Optional
-from datetime import datetime, timedelta
-from cryptography.fernet import Fernet
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import Flow
+import time
+import asyncio
+from typing import Dict, Any, Optional, Tuple, TYPE_CHECKING
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import Future
 from dotenv import load_dotenv
 
+from backend.credential_store import CredentialStore, SYSTEM_USER
+from backend.utils import SingleFlight, InterProcessLock, atomic_create
+from backend.metrics import TOKEN_SECONDS
+from backend.tracing import annotate
+
+# SDKs do Google e cryptography são importados no primeiro uso
+# (inicialização mais rápida do backend)
+if TYPE_CHECKING:
+    from google.oauth2.credentials import Credentials
+
 # Carregar variáveis de ambiente
 load_dotenv()
 
+# Tokens em cache são considerados expirados um pouco antes do prazo real
+TOKEN_EXPIRY_SKEW_SECONDS = 60
+
 class Vault:
     """
     Gerencia credenciais de forma centralizada e segura.
@@ -24,20 +35,40 @@ class Vault:
     """
     
     def __init__(self):
-        self.storage_path = "credentials/vault.json"
+        self.storage_path = "credentials/vault.db"
+        self.legacy_storage_path = "credentials/vault.json"
+        from cryptography.fernet import Fernet
+        
         self.encryption_key = self._get_or_create_encryption_key()
         self.cipher = Fernet(self.encryption_key)
         
-        # Criar diretório se não existir
-        os.makedirs(os.path.dirname(self.storage_path), exist_ok=True)
+        # Locks entre processos (vários workers compartilham o mesmo cofre)
+        self._process_lock = InterProcessLock("credentials/.vault.lock")
+        
+        # Armazenamento por registro (uma linha criptografada por credencial)
+        self.store = CredentialStore(self.storage_path, self.cipher)
+        
+        # Migrar o formato antigo (arquivo único) se ainda existir
+        with self._process_lock.hold("migrate"):
+            self.store.migrate_from_json(self.legacy_storage_path)
         
-        # Carregar dados existentes
-        self.data = self._load_data()
+        # Cache de access_tokens por (ferramenta, usuário)
+        self._token_cache: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.token_refresh_margin = float(os.getenv("TOKEN_REFRESH_MARGIN", "300"))
+        self.token_cache_idle_seconds = float(os.getenv("TOKEN_CACHE_IDLE", "3600"))
+        self._refresh_flights = SingleFlight()
+        
+        # Detecção de credenciais alteradas por outros processos
+        self.sync_interval = float(os.getenv("VAULT_SYNC_INTERVAL", "1"))
+        self._data_version = self.store.data_version()
+        self._last_sync = datetime.now()
         
         # Configurações OAuth Google
         self.google_client_id = os.getenv("GOOGLE_CLIENT_ID", "")
         self.google_client_secret = os.getenv("GOOGLE_CLIENT_SECRET", "")
         self.google_redirect_uri = os.getenv("GOOGLE_REDIRECT_URI", "http://localhost:8000/auth/google/callback")
+        # Endpoint de token (substituível por um servidor local nos testes de carga)
+        self.google_token_uri = os.getenv("GOOGLE_TOKEN_URI", "https://oauth2.googleapis.com/token")
         
         # Scopes do Google Calendar
         self.google_scopes = [
@@ -45,38 +76,28 @@ class Vault:
             "https://www.googleapis.com/auth/calendar.events"
         ]
     
+    async def flush(self):
+        """Aguarda até que todas as credenciais salvas estejam gravadas em disco"""
+        await asyncio.wrap_future(self.store.flush())
+    
+    def close(self):
+        """Grava atualizações pendentes e encerra a thread de escrita"""
+        self.store.close()
+    
     def _get_or_create_encryption_key(self) -> bytes:
         """Gera ou recupera chave de criptografia"""
         key_file = "credentials/.encryption_key"
         os.makedirs(os.path.dirname(key_file), exist_ok=True)
         
-        if os.path.exists(key_file):
-            with open(key_file, "rb") as f:
-                return f.read()
-        else:
+        if not os.path.exists(key_file):
+            from cryptography.fernet import Fernet
             key = Fernet.generate_key()
-            with open(key_file, "wb") as f:
-                f.write(key)
-            return key
-    
-    def _load_data(self) -> Dict[str, Any]:
-        """Carrega dados do cofre"""
-        if os.path.exists(self.storage_path):
-            try:
-                with open(self.storage_path, "rb") as f:
-                    encrypted_data = f.read()
-                decrypted_data = self.cipher.decrypt(encrypted_data)
-                return json.loads(decrypted_data.decode())
-            except:
-                return {"tools": {}, "users": {}}
-        return {"tools": {}, "users": {}}
-    
-    def _save_data(self):
-        """Salva dados no cofre (criptografado)"""
-        json_data = json.dumps(self.data)
-        encrypted_data = self.cipher.encrypt(json_data.encode())
-        with open(self.storage_path, "wb") as f:
-            f.write(encrypted_data)
+            # Se outro worker criou a chave ao mesmo tempo, usar a dele
+            if atomic_create(key_file, key):
+                return key
+        
+        with open(key_file, "rb") as f:
+            return f.read()
     
     def store_credentials(
         self,
@@ -84,39 +105,39 @@ class Vault:
         tool_type: str,
         credentials: Dict[str, Any],
         user_id: Optional[str] = None
-    ):
+    ) -> Future:
         """
         Armazena credenciais no cofre
         
+        A gravação em disco é feita em segundo plano (agrupada com outras
+        atualizações); a credencial já fica visível para leituras no retorno.
+        
         Args:
             tool_name: Nome da ferramenta (ex: "slack", "google_calendar")
             tool_type: "user_oauth" ou "system_static"
             credentials: Dicionário com credenciais
             user_id: ID do usuário (obrigatório para user_oauth)
+            
+        Returns:
+            Future resolvido quando a credencial estiver gravada de forma
+            durável (aguarde com asyncio.wrap_future apenas se precisar)
         """
         if tool_type == "user_oauth" and not user_id:
             raise ValueError("user_id é obrigatório para ferramentas user_oauth")
         
-        if tool_type == "user_oauth":
-            if "users" not in self.data:
-                self.data["users"] = {}
-            if user_id not in self.data["users"]:
-                self.data["users"][user_id] = {}
-            self.data["users"][user_id][tool_name] = {
-                "type": tool_type,
-                "credentials": credentials,
-                "created_at": datetime.now().isoformat()
-            }
-        else:  # system_static
-            if "tools" not in self.data:
-                self.data["tools"] = {}
-            self.data["tools"][tool_name] = {
-                "type": tool_type,
-                "credentials": credentials,
-                "created_at": datetime.now().isoformat()
-            }
+        saved = self.store.put(
+            user_id=user_id if tool_type == "user_oauth" else SYSTEM_USER,
+            tool_name=tool_name,
+            tool_type=tool_type,
+            credentials=credentials
+        )
         
-        self._save_data()
+        # Credencial alterada: descartar token em cache
+        self._token_cache.pop(
+            self._token_cache_key(tool_name, user_id or SYSTEM_USER),
+            None
+        )
+        return saved
     
     def get_credentials(
         self,
@@ -130,18 +151,135 @@ class Vault:
         Para system_static: busca chave estática
         """
         # Tentar buscar credenciais de usuário primeiro
-        if user_id and "users" in self.data:
-            if user_id in self.data["users"]:
-                if tool_name in self.data["users"][user_id]:
-                    return self.data["users"][user_id][tool_name]["credentials"]
+        if user_id:
+            record = self.store.get(user_id, tool_name)
+            if record:
+                return record["credentials"]
         
         # Buscar credenciais de sistema
-        if "tools" in self.data:
-            if tool_name in self.data["tools"]:
-                return self.data["tools"][tool_name]["credentials"]
+        record = self.store.get(SYSTEM_USER, tool_name)
+        if record:
+            return record["credentials"]
         
         return None
     
+    def _token_cache_key(self, tool_name: str, user_id: str) -> Tuple[str, str]:
+        """Chave do cache de tokens (credenciais de sistema não dependem do usuário)"""
+        if tool_name == "google_calendar":
+            return (tool_name, user_id)
+        return (tool_name, SYSTEM_USER)
+    
+    def _cache_token(self, key: Tuple[str, str], token: Optional[str], expiry: Optional[datetime]):
+        if token:
+            self._token_cache[key] = {
+                "token": token,
+                "expiry": expiry,
+                "last_used": time.monotonic()
+            }
+    
+    def get_cached_access_token(
+        self,
+        tool_name: str,
+        user_id: str
+    ) -> Optional[str]:
+        """
+        Caminho rápido: retorna o token em cache se ainda for válido
+        Não faz I/O nem chamadas de rede (apenas uma consulta ao dicionário)
+        """
+        entry = self._token_cache.get(self._token_cache_key(tool_name, user_id))
+        if entry is None:
+            return None
+        expiry = entry["expiry"]
+        if expiry is not None and datetime.utcnow() >= expiry - timedelta(seconds=TOKEN_EXPIRY_SKEW_SECONDS):
+            return None
+        entry["last_used"] = time.monotonic()
+        return entry["token"]
+    
+    @staticmethod
+    def _parse_expiry(value: Optional[str]) -> Optional[datetime]:
+        """Converte o expiry salvo (ISO 8601) para datetime UTC sem timezone, como o google-auth espera"""
+        if not value:
+            return None
+        try:
+            expiry = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+        if expiry.tzinfo is not None:
+            expiry = expiry.astimezone(timezone.utc).replace(tzinfo=None)
+        return expiry
+    
+    def _build_google_credentials(self, creds_data: Dict[str, Any]) -> "Credentials":
+        """Cria objeto Credentials do Google a partir do registro do cofre"""
+        from google.oauth2.credentials import Credentials
+        
+        return Credentials(
+            token=creds_data.get("token"),
+            refresh_token=creds_data.get("refresh_token"),
+            token_uri=self.google_token_uri,
+            client_id=self.google_client_id,
+            client_secret=self.google_client_secret,
+            scopes=self.google_scopes,
+            expiry=self._parse_expiry(creds_data.get("expiry"))
+        )
+    
+    def _refresh_google_token(
+        self,
+        user_id: str,
+        force: bool = False
+    ) -> Optional[str]:
+        """
+        Renova o access_token do Google, salva no cofre e atualiza o cache
+        
+        Renovações concorrentes para o mesmo usuário são deduplicadas: apenas
+        uma chamada vai ao endpoint de token e as demais recebem o resultado.
+        Entre processos, um lock por usuário serializa a renovação e o token
+        salvo por outro worker é reaproveitado se ainda estiver válido.
+        Sem force, um token válido que já esteja no cache (renovado por outra
+        chamada) é reaproveitado.
+        """
+        key = self._token_cache_key("google_calendar", user_id)
+        
+        def refresh() -> Optional[str]:
+            if not force:
+                cached_token = self.get_cached_access_token("google_calendar", user_id)
+                if cached_token:
+                    return cached_token
+            
+            # Lock entre processos: só um worker renova o token do usuário
+            with self._process_lock.hold(key):
+                # Reler do banco: outro worker pode ter acabado de renovar
+                creds_data = self.get_credentials("google_calendar", user_id)
+                if not creds_data:
+                    return None
+                current = self._build_google_credentials(creds_data)
+                fresh_for = self.token_refresh_margin if force else TOKEN_EXPIRY_SKEW_SECONDS
+                if (
+                    current.token and current.expiry
+                    and current.expiry > datetime.utcnow() + timedelta(seconds=fresh_for)
+                ):
+                    self._cache_token(key, current.token, current.expiry)
+                    return current.token
+                
+                from google.auth.transport.requests import Request
+                current.refresh(Request())
+                # Salvar token atualizado e aguardar a gravação antes de
+                # liberar o lock, para os outros workers lerem o token novo
+                self.store_credentials(
+                    tool_name="google_calendar",
+                    tool_type="user_oauth",
+                    credentials={
+                        "token": current.token,
+                        "refresh_token": current.refresh_token,
+                        "expiry": current.expiry.isoformat() if current.expiry else None
+                    },
+                    user_id=user_id
+                ).result()
+            
+            self._cache_token(key, current.token, current.expiry)
+            return current.token
+        
+        return self._refresh_flights.do(key, refresh)
+    
     def get_access_token(
         self,
         tool_name: str,
@@ -150,52 +288,130 @@ class Vault:
         """
         Obtém access_token válido para uma ferramenta
         
+        Primeiro consulta o cache em memória; em caso de falta:
+        
         Para Google Calendar:
         - Busca refresh_token do usuário
-        - Usa refresh_token para obter novo access_token
+        - Usa refresh_token para obter novo access_token (se expirado)
         - Retorna access_token temporário
         """
+        start = time.perf_counter()
+        token, source = self._get_access_token(tool_name, user_id)
+        TOKEN_SECONDS.labels(tool_name, source).observe(time.perf_counter() - start)
+        annotate(source=source)
+        return token
+    
+    def _get_access_token(
+        self,
+        tool_name: str,
+        user_id: str
+    ) -> Tuple[Optional[str], str]:
+        """Retorna (token, origem): cache, store, refresh ou missing"""
+        cached_token = self.get_cached_access_token(tool_name, user_id)
+        if cached_token:
+            return cached_token, "cache"
+        
         if tool_name == "google_calendar":
             creds_data = self.get_credentials(tool_name, user_id)
             if not creds_data:
-                return None
+                return None, "missing"
             
-            # Criar objeto Credentials do Google
-            creds = Credentials(
-                token=creds_data.get("token"),
-                refresh_token=creds_data.get("refresh_token"),
-                token_uri="https://oauth2.googleapis.com/token",
-                client_id=self.google_client_id,
-                client_secret=self.google_client_secret,
-                scopes=self.google_scopes
-            )
+            creds = self._build_google_credentials(creds_data)
             
-            # Atualizar token se necessário
-            if not creds.valid:
-                if creds.expired and creds.refresh_token:
-                    creds.refresh(Request())
-                    # Salvar token atualizado
-                    self.store_credentials(
-                        tool_name="google_calendar",
-                        tool_type="user_oauth",
-                        credentials={
-                            "token": creds.token,
-                            "refresh_token": creds.refresh_token,
-                            "expiry": creds.expiry.isoformat() if creds.expiry else None
-                        },
-                        user_id=user_id
-                    )
+            # Atualizar token se necessário (sem token ou expirado)
+            if not creds.valid and creds.refresh_token:
+                return self._refresh_google_token(user_id), "refresh"
             
-            return creds.token
+            self._cache_token(self._token_cache_key(tool_name, user_id), creds.token, creds.expiry)
+            return creds.token, "store"
         
         elif tool_name == "slack":
             # Para Slack, retorna o token estático diretamente
             creds_data = self.get_credentials(tool_name)
             if creds_data:
-                return creds_data.get("token")
-            return None
+                token = creds_data.get("token")
+                self._cache_token(self._token_cache_key(tool_name, user_id), token, None)
+                return token, "store"
+            return None, "missing"
         
-        return None
+        return None, "missing"
+    
+    def refresh_expiring_tokens(self) -> int:
+        """
+        Renova tokens em cache que expiram dentro da margem configurada
+        Entradas sem uso recente são descartadas em vez de renovadas
+        
+        Returns:
+            Quantidade de tokens renovados
+        """
+        now = time.monotonic()
+        refresh_before = datetime.utcnow() + timedelta(seconds=self.token_refresh_margin)
+        refreshed = 0
+        
+        for key, entry in list(self._token_cache.items()):
+            if now - entry["last_used"] > self.token_cache_idle_seconds:
+                self._token_cache.pop(key, None)
+                continue
+            
+            expiry = entry["expiry"]
+            if expiry is None or expiry > refresh_before:
+                continue
+            
+            tool_name, user_id = key
+            if tool_name != "google_calendar":
+                continue
+            try:
+                if self._refresh_google_token(user_id, force=True):
+                    refreshed += 1
+            except Exception:
+                # Deixa a próxima requisição tentar novamente no caminho normal
+                self._token_cache.pop(key, None)
+        
+        return refreshed
+    
+    async def run_token_refresher(self, interval_seconds: float = None):
+        """Loop em segundo plano que renova tokens antes de expirarem"""
+        if interval_seconds is None:
+            interval_seconds = float(os.getenv("TOKEN_REFRESH_INTERVAL", "60"))
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await asyncio.to_thread(self.refresh_expiring_tokens)
+            except Exception:
+                pass
+    
+    def sync_external_changes(self) -> int:
+        """
+        Descarta tokens em cache cujas credenciais foram alteradas por outro
+        processo (ex: callback OAuth tratado por outro worker)
+        
+        Returns:
+            Quantidade de credenciais alteradas desde a última verificação
+        """
+        version = self.store.data_version()
+        if version == self._data_version:
+            return 0
+        
+        # Margem para gravações com timestamp anterior que só foram
+        # confirmadas depois da última verificação
+        started = datetime.now()
+        since = self._last_sync - timedelta(seconds=max(5.0, self.sync_interval * 5))
+        changed = self.store.changed_since(since.isoformat())
+        for user_id, tool_name in changed:
+            self._token_cache.pop(self._token_cache_key(tool_name, user_id), None)
+        
+        self._data_version = version
+        self._last_sync = started
+        return len(changed)
+    
+    async def run_change_watcher(self):
+        """Loop em segundo plano que aplica alterações feitas por outros workers"""
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await asyncio.to_thread(self.sync_external_changes)
+            except Exception:
+                pass
     
     def get_google_oauth_url(self, state: Optional[str] = None) -> tuple:
         """
@@ -207,13 +423,15 @@ class Vault:
         if not self.google_client_id or not self.google_client_secret:
             raise ValueError("Google OAuth não configurado. Configure GOOGLE_CLIENT_ID e GOOGLE_CLIENT_SECRET no .env")
         
+        from google_auth_oauthlib.flow import Flow
+        
         flow = Flow.from_client_config(
             {
                 "web": {
                     "client_id": self.google_client_id,
                     "client_secret": self.google_client_secret,
                     "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                    "token_uri": "https://oauth2.googleapis.com/token",
+                    "token_uri": self.google_token_uri,
                     "redirect_uris": [self.google_redirect_uri]
                 }
             },
@@ -250,13 +468,15 @@ class Vault:
         if not self.google_client_id or not self.google_client_secret:
             raise ValueError("Google OAuth não configurado")
         
+        from google_auth_oauthlib.flow import Flow
+        
         flow = Flow.from_client_config(
             {
                 "web": {
                     "client_id": self.google_client_id,
                     "client_secret": self.google_client_secret,
                     "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                    "token_uri": "https://oauth2.googleapis.com/token",
+                    "token_uri": self.google_token_uri,
                     "redirect_uris": [self.google_redirect_uri]
                 }
             },
@@ -264,12 +484,12 @@ class Vault:
             redirect_uri=self.google_redirect_uri
         )
         
-        # Trocar código por tokens
-        flow.fetch_token(code=code)
+        # Trocar código por tokens (chamada de rede, fora do event loop)
+        await asyncio.to_thread(flow.fetch_token, code=code)
         creds = flow.credentials
         
-        # Salvar refresh_token no cofre
-        self.store_credentials(
+        # Salvar refresh_token no cofre e aguardar a gravação em disco
+        await asyncio.wrap_future(self.store_credentials(
             tool_name="google_calendar",
             tool_type="user_oauth",
             credentials={
@@ -278,7 +498,7 @@ class Vault:
                 "expiry": creds.expiry.isoformat() if creds.expiry else None
             },
             user_id=user_id
-        )
+        ))
         
         return {
             "token": creds.token,
@@ -286,13 +506,19 @@ class Vault:
             "expiry": creds.expiry.isoformat() if creds.expiry else None
         }
     
-    def list_tools(self) -> Dict[str, Any]:
-        """Lista todas as ferramentas configuradas"""
-        return {
-            "system_tools": list(self.data.get("tools", {}).keys()),
-            "user_tools": {
-                user_id: list(tools.keys())
-                for user_id, tools in self.data.get("users", {}).items()
-            }
-        }
-
+    def tools_generation(self) -> int:
+        """Muda sempre que a lista de ferramentas configuradas muda"""
+        return self.store.tools_generation()
+    
+    def list_tools(
+        self,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+        tool: Optional[str] = None,
+        user_prefix: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Lista as ferramentas configuradas, paginada por usuário
+        (ver CredentialStore.list_tools)
+        """
+        return self.store.list_tools(cursor, limit, tool, user_prefix)
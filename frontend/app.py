@@ -5,6 +5,7 @@ Passo 1: A "Vitrine" - onde o usuário digita comandos
 import streamlit as st
 import requests
 import json
+import uuid
 from typing import Optional
 
 # Configuração da página
@@ -16,6 +17,8 @@ st.set_page_config(
 
 # URL do backend
 BACKEND_URL = "http://localhost:8000"
+# Usuários por página na aba "Ferramentas Configuradas"
+TOOLS_PAGE_SIZE = 50
 
 
 def set_bg_color(hex_color: str = "#141C1A", btn_color: str = "#00AA97"):
@@ -110,32 +113,77 @@ def show_execute_page():
             st.error("Por favor, digite um comando.")
             return
 
-        with st.spinner("Processando comando..."):
-            try:
-                response = requests.post(
-                    f"{BACKEND_URL}/api/execute",
-                    json={"prompt": prompt, "user_id": user_id},
-                    timeout=60
-                )
+        # Mesma chave de idempotência enquanto o comando não for concluído:
+        # clicar de novo (ou tentar após uma falha de rede) não repete as ações
+        pending = st.session_state.get("pending_execution")
+        if not pending or pending["prompt"] != prompt or pending["user_id"] != user_id:
+            pending = {"prompt": prompt, "user_id": user_id, "key": uuid.uuid4().hex}
+            st.session_state["pending_execution"] = pending
 
-                if response.status_code == 200:
-                    data = response.json()
+        status = st.empty()
+        status.info("⏳ Planejando ações...")
+        progress_area = st.container()
+        st.markdown("### Resposta:")
+        response_area = st.empty()
 
-                    # Resposta consolidada
-                    st.success("✅ Comando executado com sucesso!")
-                    st.markdown("### Resposta:")
-                    st.info(data.get("response", "Comando executado."))
+        try:
+            with requests.post(
+                f"{BACKEND_URL}/api/execute/stream",
+                json={"prompt": prompt, "user_id": user_id},
+                headers={"Idempotency-Key": pending["key"]},
+                stream=True,
+                timeout=60
+            ) as response:
+                if response.status_code != 200:
+                    status.error(f"Erro: {response.text}")
+                    return
+
+                response_text = ""
+                details = []
+                for event, data in iter_sse_events(response):
+                    if event == "plan":
+                        total = len(data.get("actions", []))
+                        status.info(f"⚙️ Executando {total} ação(ões)...")
+                    elif event == "result":
+                        result = data.get("result", {})
+                        icon = "✅" if result.get("status") == "success" else "❌"
+                        progress_area.markdown(f"{icon} Ação {data.get('index', 0) + 1}: `{result.get('tool_name')}`")
+                    elif event == "response":
+                        response_text += data.get("text", "")
+                        response_area.info(response_text)
+                    elif event == "done":
+                        details = data.get("details", [])
+                        status.success("✅ Comando executado com sucesso!")
+                        st.session_state.pop("pending_execution", None)
+                    elif event == "error":
+                        status.error(f"Erro: {data.get('detail')}")
+                        return
+
+                if not response_text:
+                    response_area.info("Comando executado.")
+
+                # Detalhes (expansível)
+                with st.expander("📋 Ver detalhes técnicos"):
+                    st.json(details)
+
+        except requests.exceptions.ConnectionError:
+            st.error("❌ Não foi possível conectar ao backend. Certifique-se de que o servidor está rodando em http://localhost:8000")
+        except Exception as e:
+            st.error(f"Erro: {str(e)}")
 
-                    # Detalhes (expansível)
-                    with st.expander("📋 Ver detalhes técnicos"):
-                        st.json(data.get("details", []))
-                else:
-                    st.error(f"Erro: {response.text}")
 
-            except requests.exceptions.ConnectionError:
-                st.error("❌ Não foi possível conectar ao backend. Certifique-se de que o servidor está rodando em http://localhost:8000")
-            except Exception as e:
-                st.error(f"Erro: {str(e)}")
+def iter_sse_events(response):
+    """Lê um stream Server-Sent Events e produz tuplas (evento, dados)"""
+    event, data_lines = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            if data_lines:
+                yield event, json.loads("\n".join(data_lines))
+            event, data_lines = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
 
 
 def show_admin_panel():
@@ -217,33 +265,83 @@ def show_admin_panel():
     with tab3:
         st.subheader("Ferramentas Configuradas")
 
-        try:
-            response = requests.get(f"{BACKEND_URL}/api/admin/tools")
+        col1, col2 = st.columns(2)
+        with col1:
+            tool_filter = st.selectbox("Ferramenta", ["Todas", "google_calendar", "slack"], key="tools_filter_tool")
+        with col2:
+            user_prefix = st.text_input("Usuário (início do ID)", key="tools_filter_user")
+
+        # Filtros alterados voltam para a primeira página
+        filters = (tool_filter, user_prefix)
+        if st.session_state.get("tools_filters") != filters:
+            st.session_state["tools_filters"] = filters
+            st.session_state["tools_cursors"] = [None]
+        cursors = st.session_state["tools_cursors"]
+
+        params = {"limit": TOOLS_PAGE_SIZE}
+        if cursors[-1]:
+            params["cursor"] = cursors[-1]
+        if tool_filter != "Todas":
+            params["tool"] = tool_filter
+        if user_prefix:
+            params["user_prefix"] = user_prefix
 
-            if response.status_code == 200:
-                tools = response.json()
+        try:
+            tools = fetch_admin_tools(params)
 
+            if "system_tools" in tools:
                 st.markdown("### Ferramentas de Sistema")
-                if tools.get("system_tools"):
+                if tools["system_tools"]:
                     for tool in tools["system_tools"]:
                         st.success(f"✅ {tool}")
                 else:
                     st.info("Nenhuma ferramenta de sistema configurada.")
 
-                st.markdown("### Ferramentas de Usuário")
-                if tools.get("user_tools"):
-                    for user_id, user_tools in tools["user_tools"].items():
-                        st.markdown(f"**Usuário: {user_id}**")
-                        for tool in user_tools:
-                            st.success(f"✅ {tool}")
-                else:
-                    st.info("Nenhuma ferramenta de usuário configurada.")
+            st.markdown(f"### Ferramentas de Usuário (página {len(cursors)})")
+            if tools.get("user_tools"):
+                for user_id, user_tools in tools["user_tools"].items():
+                    st.markdown(f"**Usuário: {user_id}**")
+                    for tool in user_tools:
+                        st.success(f"✅ {tool}")
             else:
-                st.error("Erro ao carregar ferramentas.")
+                st.info("Nenhuma ferramenta de usuário configurada.")
+
+            col1, col2 = st.columns(2)
+            with col1:
+                if len(cursors) > 1 and st.button("◀ Anterior"):
+                    cursors.pop()
+                    st.rerun()
+            with col2:
+                if tools.get("next_cursor") and st.button("Próxima ▶"):
+                    cursors.append(tools["next_cursor"])
+                    st.rerun()
+        except requests.exceptions.HTTPError:
+            st.error("Erro ao carregar ferramentas.")
         except Exception as e:
             st.error(f"Erro: {str(e)}")
 
 
+def fetch_admin_tools(params: dict) -> dict:
+    """
+    Busca uma página de /api/admin/tools com GET condicional: a última
+    resposta de cada página fica na sessão e é reaproveitada quando o
+    backend responde 304 (nada mudou)
+    """
+    cache = st.session_state.setdefault("admin_tools_cache", {})
+    key = tuple(sorted(params.items()))
+    cached = cache.get(key)
+    headers = {"If-None-Match": cached["etag"]} if cached and cached["etag"] else {}
+
+    response = requests.get(f"{BACKEND_URL}/api/admin/tools", params=params, headers=headers)
+    if response.status_code == 304 and cached:
+        return cached["data"]
+    response.raise_for_status()
+
+    data = response.json()
+    cache[key] = {"etag": response.headers.get("ETag"), "data": data}
+    return data
+
+
 def show_status_page():
     """Página de status do sistema"""
     st.header("📊 Status do Sistema")
@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pytest
+
+# Permite "import backend..." rodando pytest a partir da raiz do projeto
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+@pytest.fixture
+def gateway_app(tmp_path, monkeypatch):
+    """
+    Módulo backend.main configurado para rodar em um diretório temporário
+    (cofre novo, credentials/ real não é tocado); o lifespan fica a cargo
+    do teste
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("GEMINI_API_KEY", "teste")
+    monkeypatch.setenv("PRELOAD_SDKS", "0")
+    monkeypatch.delenv("GATEWAY_WORKERS", raising=False)
+    import backend.main as main
+    return main
+
+
+@pytest.fixture
+def gateway(gateway_app):
+    """
+    Cliente do app FastAPI com o lifespan rodando. Os testes trocam o
+    modelo e os MCPs em backend.main depois da inicialização
+    """
+    from fastapi.testclient import TestClient
+
+    with TestClient(gateway_app.app) as client:
+        yield client
+
+
+@pytest.fixture
+def stub_credentials(gateway, monkeypatch):
+    """Dispensa o cofre: toda ferramenta recebe um token fixo"""
+    import backend.main as main
+
+    async def get_access_token(tool_name, user_id):
+        return "token", None
+
+    monkeypatch.setattr(main.mcp_hub, "_get_access_token", get_access_token)
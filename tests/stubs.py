@@ -0,0 +1,83 @@
+"""
+Dublês do modelo Gemini e dos MCPs para testes dos endpoints
+(sem rede: o plano e os resultados das ações são fixos)
+"""
+import asyncio
+import json
+import time
+
+# Plano padrão: um evento e um aviso no Slack, independentes
+DEFAULT_ACTIONS = [
+    {
+        "tool_name": "google_calendar",
+        "parameters": {"title": "Alinhamento", "start_time": "2026-10-20T10:00:00", "end_time": "2026-10-20T11:00:00"}
+    },
+    {"tool_name": "slack", "parameters": {"channel": "#geral", "message": "Alinhamento marcado"}}
+]
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    """
+    generate_content síncrono e lento, como o SDK do Gemini: responde ao
+    planejamento com o plano dado e à consolidação com um texto fixo (em
+    trechos, no modo stream)
+    """
+
+    def __init__(self, latency=0.0, actions=None, summary="Tudo certo, do modelo."):
+        self.latency = latency
+        self.actions = DEFAULT_ACTIONS if actions is None else actions
+        self.summary = summary
+        self.prompts = []
+
+    def generate_content(self, prompt, stream=False):
+        self.prompts.append(prompt)
+        time.sleep(self.latency)
+        if "COMANDO DO USUÁRIO" in prompt:
+            return StubResponse(json.dumps({"actions": self.actions, "reasoning": "teste"}))
+        if stream:
+            return [StubResponse(word + " ") for word in self.summary.split()]
+        return StubResponse(self.summary)
+
+
+class StubCalendar:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    async def execute(self, access_token, parameters):
+        await asyncio.sleep(self.latency)
+        return {
+            "event_id": "evt1",
+            "summary": parameters.get("title"),
+            "start": {"dateTime": parameters.get("start_time")},
+            "end": {"dateTime": parameters.get("end_time")}
+        }
+
+
+class StubSlack:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    async def execute(self, access_token, parameters):
+        await asyncio.sleep(self.latency)
+        if parameters.get("channels"):
+            return {"broadcast": [{"channel": c, "status": "success"} for c in parameters["channels"]]}
+        return {"channel": parameters["channel"], "ts": "1.0"}
+
+
+def install(monkeypatch, main, model=None, latency=0.0):
+    """Troca o modelo, os MCPs e o cofre do app já inicializado pelos dublês"""
+    model = model or StubModel()
+
+    async def get_access_token(tool_name, user_id):
+        return "token", None
+
+    monkeypatch.setattr(main.router, "_model", model)
+    monkeypatch.setitem(main.mcp_hub.mcps, "google_calendar", StubCalendar(latency))
+    monkeypatch.setitem(main.mcp_hub.mcps, "slack", StubSlack(latency))
+    monkeypatch.setattr(main.mcp_hub, "_get_access_token", get_access_token)
+    return model
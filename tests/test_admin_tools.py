@@ -0,0 +1,78 @@
+"""
+GET /api/admin/tools: paginação por cursor, filtros tool/user_prefix e
+ETag (304 enquanto a lista de ferramentas não muda)
+"""
+import pytest
+
+import backend.main as main
+
+
+@pytest.fixture
+def configured(gateway):
+    futures = [main.vault.store_credentials("slack", "system_static", {"token": "xoxb"})]
+    for i in range(5):
+        futures.append(main.vault.store_credentials("google_calendar", "user_oauth", {"token": f"t{i}"}, user_id=f"ana-{i}"))
+    futures.append(main.vault.store_credentials("slack", "user_oauth", {"token": "xoxp"}, user_id="ana-3"))
+    futures.append(main.vault.store_credentials("google_calendar", "user_oauth", {"token": "b"}, user_id="bia"))
+    for future in futures:
+        future.result(timeout=5)
+    return gateway
+
+
+def test_pages_across_cursor_boundary(configured):
+    pages = []
+    cursor = None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = configured.get("/api/admin/tools", params=params).json()
+        pages.append(page)
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert [list(page["user_tools"]) for page in pages] == [
+        ["ana-0", "ana-1"], ["ana-2", "ana-3"], ["ana-4", "bia"]
+    ]
+    assert pages[1]["user_tools"]["ana-3"] == ["google_calendar", "slack"]
+    # Ferramentas de sistema só na primeira página
+    assert pages[0]["system_tools"] == ["slack"]
+    assert "system_tools" not in pages[1]
+
+
+def test_tool_and_user_prefix_filters(configured):
+    by_tool = configured.get("/api/admin/tools", params={"tool": "slack"}).json()
+    assert by_tool["user_tools"] == {"ana-3": ["slack"]}
+    assert by_tool["system_tools"] == ["slack"]
+
+    by_prefix = configured.get("/api/admin/tools", params={"user_prefix": "ana-", "limit": 3}).json()
+    assert list(by_prefix["user_tools"]) == ["ana-0", "ana-1", "ana-2"]
+    rest = configured.get(
+        "/api/admin/tools",
+        params={"user_prefix": "ana-", "limit": 3, "cursor": by_prefix["next_cursor"]}
+    ).json()
+    assert list(rest["user_tools"]) == ["ana-3", "ana-4"]
+    assert rest["next_cursor"] is None
+
+
+def test_etag_returns_304_until_tools_change(configured):
+    first = configured.get("/api/admin/tools")
+    etag = first.headers["ETag"]
+
+    unchanged = configured.get("/api/admin/tools", headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+
+    # Renovar o conteúdo de uma credencial não muda a lista de ferramentas
+    main.vault.store_credentials("google_calendar", "user_oauth", {"token": "novo"}, user_id="bia").result(timeout=5)
+    assert configured.get("/api/admin/tools", headers={"If-None-Match": etag}).status_code == 304
+
+    response = configured.post("/api/admin/configure-tool", json={
+        "tool_name": "google_calendar",
+        "tool_type": "system_static",
+        "credentials": {"token": "sistema"}
+    })
+    assert response.status_code == 200
+
+    changed = configured.get("/api/admin/tools", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()["system_tools"] == ["google_calendar", "slack"]
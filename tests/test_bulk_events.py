@@ -0,0 +1,143 @@
+"""
+Criação de eventos em lote: leitura de .csv, divisão em requisições batch
+de até 50 inserts, erros por item e validação do arquivo enviado
+"""
+import asyncio
+
+import pytest
+
+import backend.main as main
+from backend.mcps.google_calendar_mcp import GoogleCalendarMCP
+from backend.utils import parse_events_csv
+
+
+class FakeBatch:
+    """Requisição batch simulada: títulos iniciados por "recusar" falham"""
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self, http=None):
+        for request_id, body in self.requests:
+            if body["summary"].startswith("recusar"):
+                self.callback(request_id, None, Exception("recusado pela API"))
+            else:
+                self.callback(request_id, {**body, "htmlLink": f"https://calendar.example/{request_id}"}, None)
+
+
+class FakeService:
+    def __init__(self):
+        self.batches = []
+
+    def events(self):
+        return self
+
+    def insert(self, calendarId, body):
+        return body
+
+    def new_batch_http_request(self, callback):
+        batch = FakeBatch(callback)
+        self.batches.append(batch)
+        return batch
+
+
+def test_csv_columns_aliases_and_default_end():
+    events = parse_events_csv(
+        "titulo,inicio,fim,descricao\n"
+        "Planning,2026-10-20T10:00:00,,Sprint 12\n"
+        "Retro,2026-10-21T15:00:00,2026-10-21T15:30:00,\n"
+        "Feriado,2026-11-02,,\n"
+    )
+    assert events == [
+        {"title": "Planning", "start_time": "2026-10-20T10:00:00", "end_time": "2026-10-20T11:00:00", "description": "Sprint 12"},
+        {"title": "Retro", "start_time": "2026-10-21T15:00:00", "end_time": "2026-10-21T15:30:00", "description": ""},
+        {"title": "Feriado", "start_time": "2026-11-02", "end_time": "2026-11-03", "description": ""},
+    ]
+
+
+def test_csv_extra_values_are_ignored():
+    [event] = parse_events_csv("title,start_time\nDemo,2026-10-20T10:00:00,sobrando,mais\n")
+    assert event["title"] == "Demo"
+    assert event["start_time"] == "2026-10-20T10:00:00"
+
+
+def test_bulk_create_splits_batches_and_reports_each_item(monkeypatch):
+    mcp = GoogleCalendarMCP()
+    service = FakeService()
+    monkeypatch.setattr(mcp, "_get_service", lambda access_token: (service, None))
+    monkeypatch.setattr(mcp, "_thread_http", lambda credentials: None)
+    events = [
+        {"title": f"Evento {i}", "start_time": "2026-10-20T10:00:00", "end_time": "2026-10-20T11:00:00"}
+        for i in range(120)
+    ]
+    events[7]["title"] = "recusar 7"
+    events[60]["start_time"] = ""
+
+    results = asyncio.run(mcp.bulk_create("token", events))
+
+    assert [len(batch.requests) for batch in service.batches] == [50, 50, 19]
+    assert [r["index"] for r in results] == list(range(120))
+    failed = {r["index"]: r["error"] for r in results if r["status"] == "error"}
+    assert failed == {7: "recusado pela API", 60: "start_time e end_time são obrigatórios"}
+    assert results[119]["details"]["summary"] == "Evento 119"
+
+
+class StubCalendar:
+    def __init__(self):
+        self.received = []
+
+    async def bulk_create(self, access_token, events):
+        self.received.extend(events)
+        return [{"index": i, "status": "success", "details": {}} for i in range(len(events))]
+
+
+@pytest.fixture
+def calendar(stub_credentials, monkeypatch):
+    stub = StubCalendar()
+    monkeypatch.setitem(main.mcp_hub.mcps, "google_calendar", stub)
+    return stub
+
+
+def upload(client, name, content):
+    return client.post(
+        "/api/calendar/events/bulk/upload",
+        files={"file": (name, content)},
+        data={"user_id": "ana"}
+    )
+
+
+def test_upload_csv_creates_events(gateway, calendar):
+    response = upload(gateway, "agenda.csv", "title,start_time\nPlanning,2026-10-20T10:00:00\n".encode("utf-8-sig"))
+
+    assert response.status_code == 200
+    assert response.json()["created"] == 1
+    assert calendar.received[0]["title"] == "Planning"
+
+
+def test_upload_rejects_non_utf8_file(gateway, calendar):
+    # CSV exportado pelo Excel em cp1252
+    response = upload(gateway, "agenda.csv", "title,start_time\nReunião,2026-10-20T10:00:00\n".encode("cp1252"))
+
+    assert response.status_code == 400
+    assert "UTF-8" in response.json()["detail"]
+    assert calendar.received == []
+
+
+def test_upload_rejects_oversized_file(gateway, calendar, monkeypatch):
+    monkeypatch.setattr(main, "UPLOAD_MAX_BYTES", 64)
+    response = upload(gateway, "agenda.csv", b"title,start_time\n" + b"Evento,2026-10-20T10:00:00\n" * 10)
+
+    assert response.status_code == 413
+    assert calendar.received == []
+
+
+def test_upload_rejects_too_many_events(gateway, calendar, monkeypatch):
+    monkeypatch.setattr(main, "BATCH_MAX_ITEMS", 3)
+    response = upload(gateway, "agenda.csv", b"title,start_time\n" + b"Evento,2026-10-20T10:00:00\n" * 4)
+
+    assert response.status_code == 400
+    assert calendar.received == []
@@ -0,0 +1,190 @@
+"""
+CredentialStore: escritas concorrentes agrupadas em um commit, falhas
+repetidas e propagadas a todos os futures, fechamento do banco e migração
+do vault.json antigo
+"""
+import json
+import os
+import sqlite3
+import threading
+
+import pytest
+from cryptography.fernet import Fernet
+
+from backend.credential_store import CredentialStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CredentialStore(str(tmp_path / "vault.db"), Fernet(Fernet.generate_key()), flush_window=0.2)
+    yield store
+    store.close()
+
+
+def spy_put_many(store, monkeypatch, fail_times=0):
+    """Registra o tamanho de cada lote gravado; as primeiras fail_times gravações falham"""
+    batches = []
+    put_many = store.put_many
+
+    def spy(records):
+        records = list(records)
+        batches.append(len(records))
+        if len(batches) <= fail_times:
+            raise sqlite3.OperationalError("database is locked")
+        put_many(records)
+
+    monkeypatch.setattr(store, "put_many", spy)
+    return batches
+
+
+def test_concurrent_puts_share_one_transaction(store, monkeypatch):
+    batches = spy_put_many(store, monkeypatch)
+    futures = []
+    barrier = threading.Barrier(20)
+
+    def put(i):
+        barrier.wait()
+        futures.append(store.put(f"user-{i}", "google_calendar", "user_oauth", {"token": f"t{i}"}))
+
+    threads = [threading.Thread(target=put, args=(i,)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for future in futures:
+        future.result(timeout=5)
+
+    assert batches == [20]
+    assert store.get("user-7", "google_calendar")["credentials"] == {"token": "t7"}
+
+
+def test_transient_failure_is_retried(store, monkeypatch):
+    batches = spy_put_many(store, monkeypatch, fail_times=1)
+    future = store.put("ana", "slack", "user_oauth", {"token": "xoxp"})
+
+    future.result(timeout=5)
+    assert batches == [1, 1]
+
+
+def test_persistent_failure_reaches_every_future(store, monkeypatch, caplog):
+    batches = spy_put_many(store, monkeypatch, fail_times=99)
+    futures = [
+        store.put("ana", "slack", "user_oauth", {"token": "a"}),
+        store.put("ana", "slack", "user_oauth", {"token": "b"}),
+        store.put("bia", "google_calendar", "user_oauth", {"token": "c"}),
+    ]
+    futures.append(store.flush())
+
+    for future in futures:
+        with pytest.raises(sqlite3.OperationalError):
+            future.result(timeout=5)
+    assert batches == [2] * store.write_attempts
+    assert "não gravadas" in caplog.text
+
+
+def test_close_flushes_and_closes_connection(tmp_path):
+    path = str(tmp_path / "vault.db")
+    cipher = Fernet(Fernet.generate_key())
+    store = CredentialStore(path, cipher)
+    store.put("ana", "slack", "user_oauth", {"token": "xoxp"})
+    store.close()
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        store._conn.execute("SELECT 1")
+    reopened = CredentialStore(path, cipher)
+    try:
+        assert reopened.get("ana", "slack")["credentials"] == {"token": "xoxp"}
+    finally:
+        reopened.close()
+
+
+LEGACY = {
+    "tools": {"slack": {"type": "system_static", "credentials": {"token": "xoxb"}, "created_at": "2024-01-01T00:00:00"}},
+    "users": {
+        "ana": {"google_calendar": {"type": "user_oauth", "credentials": {"refresh_token": "r-ana"}}},
+        "bia": {
+            "google_calendar": {"type": "user_oauth", "credentials": {"refresh_token": "r-bia"}},
+            "slack": {"type": "user_oauth", "credentials": {"token": "xoxp"}}
+        }
+    }
+}
+
+
+def write_legacy(path, cipher, data=LEGACY):
+    with open(path, "wb") as f:
+        f.write(cipher.encrypt(json.dumps(data).encode()))
+
+
+@pytest.fixture
+def cipher():
+    return Fernet(Fernet.generate_key())
+
+
+@pytest.fixture
+def empty_store(tmp_path, cipher):
+    store = CredentialStore(str(tmp_path / "vault.db"), cipher)
+    yield store
+    store.close()
+
+
+def test_migrates_legacy_json(tmp_path, cipher, empty_store):
+    legacy = str(tmp_path / "vault.json")
+    write_legacy(legacy, cipher)
+
+    assert empty_store.migrate_from_json(legacy) == 4
+
+    slack = empty_store.get("", "slack")
+    assert slack["type"] == "system_static"
+    assert slack["credentials"] == {"token": "xoxb"}
+    assert slack["created_at"] == "2024-01-01T00:00:00"
+    assert empty_store.get("bia", "slack")["credentials"] == {"token": "xoxp"}
+    assert empty_store.list_tools()["user_tools"] == {"ana": ["google_calendar"], "bia": ["google_calendar", "slack"]}
+    assert not os.path.exists(legacy)
+    assert os.path.exists(legacy + ".migrated")
+
+
+def test_migration_rerun_does_not_overwrite(tmp_path, cipher, empty_store):
+    legacy = str(tmp_path / "vault.json")
+    write_legacy(legacy, cipher)
+    empty_store.migrate_from_json(legacy)
+    # Já migrado: nada a fazer
+    assert empty_store.migrate_from_json(legacy) == 0
+
+    # Credencial renovada depois da migração; um vault.json antigo que
+    # reapareça (ex: restaurado de backup) não a sobrescreve
+    empty_store.put("ana", "google_calendar", "user_oauth", {"refresh_token": "novo"}).result(timeout=5)
+    write_legacy(legacy, cipher)
+    empty_store.migrate_from_json(legacy)
+    assert empty_store.get("ana", "google_calendar")["credentials"] == {"refresh_token": "novo"}
+
+
+@pytest.mark.parametrize("content", ["corrompido", "outra_chave"])
+def test_unreadable_legacy_file_is_kept_and_skipped(tmp_path, cipher, empty_store, caplog, content):
+    legacy = str(tmp_path / "vault.json")
+    if content == "corrompido":
+        with open(legacy, "wb") as f:
+            f.write(b"isto nao e um token fernet")
+    else:
+        write_legacy(legacy, Fernet(Fernet.generate_key()))
+
+    assert empty_store.migrate_from_json(legacy) == 0
+    assert "ilegível" in caplog.text
+    # O arquivo continua lá para uma nova tentativa com a chave certa
+    assert os.path.exists(legacy)
+    assert empty_store.list_tools()["user_tools"] == {}
+
+
+def test_vault_starts_with_unreadable_legacy_file(tmp_path, monkeypatch):
+    from backend.vault import Vault
+
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("credentials")
+    with open("credentials/vault.json", "wb") as f:
+        f.write(b"corrompido")
+
+    vault = Vault()
+    try:
+        assert vault.list_tools()["user_tools"] == {}
+    finally:
+        vault.close()
+    assert os.path.exists("credentials/vault.json")
@@ -0,0 +1,97 @@
+"""
+POST /api/execute com modelo e MCPs simulados: requisições concorrentes se
+sobrepõem no endpoint (nada serializa planejamento nem ações) e o modo
+debug devolve a árvore de tempos
+"""
+import asyncio
+import time
+
+import httpx
+
+import backend.main as main
+from stubs import StubModel, install
+
+LATENCY = 0.15
+REQUESTS = 8
+
+
+def test_concurrent_execute_requests_overlap(gateway_app, monkeypatch):
+    main = gateway_app
+
+    async def scenario():
+        async with main.app.router.lifespan_context(main.app):
+            install(monkeypatch, main, StubModel(latency=LATENCY), latency=LATENCY)
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://gateway") as client:
+                start = time.perf_counter()
+                responses = await asyncio.gather(*(
+                    client.post("/api/execute", json={
+                        # Distintos e fora do planejador rápido: cada um vai ao LLM
+                        "prompt": f"organize o roadmap número {i} com o time",
+                        "user_id": f"user-{i}"
+                    })
+                    for i in range(REQUESTS)
+                ))
+                return responses, time.perf_counter() - start
+
+    responses, elapsed = asyncio.run(scenario())
+
+    assert [r.status_code for r in responses] == [200] * REQUESTS
+    for response in responses:
+        assert [d["status"] for d in response.json()["details"]] == ["success", "success"]
+    # Cada requisição: planejamento (LATENCY) + ações em paralelo (LATENCY);
+    # em série seriam REQUESTS x 2 x LATENCY
+    per_request = 2 * LATENCY
+    assert elapsed < per_request * 2.5
+    assert elapsed < REQUESTS * per_request / 3
+
+
+def children(span):
+    return {child["name"]: child for child in span.get("children", [])}
+
+
+def test_debug_returns_nested_timing_tree(gateway, monkeypatch):
+    install(monkeypatch, main, StubModel(latency=0.05), latency=0.05)
+
+    response = gateway.post("/api/execute", json={
+        "prompt": "organize o roadmap com o time",
+        "user_id": "ana",
+        "debug": True
+    })
+
+    assert response.status_code == 200
+    timing = response.json()["timing"]
+    root = timing["spans"]
+    assert root["name"] == "execute"
+    assert root["attributes"]["user_id"] == "ana"
+    assert [child["name"] for child in root["children"]] == ["planning", "execution", "consolidation"]
+    assert timing["total_ms"] >= 100
+
+    planning, execution, consolidation = root["children"]
+    assert planning["attributes"]["source"] == "llm"
+    llm_call = children(planning)["llm_call"]
+    assert llm_call["duration_ms"] >= 50
+    assert "queue_ms" in llm_call["attributes"]
+
+    assert execution["attributes"]["actions"] == 2
+    actions = execution["children"]
+    assert sorted(action["attributes"]["tool"] for action in actions) == ["google_calendar", "slack"]
+    for action in actions:
+        steps = children(action)
+        assert {"rate_limit_wait", "credentials", "upstream"} <= set(steps)
+        assert steps["upstream"]["attributes"]["attempts"] == 1
+        assert steps["upstream"]["duration_ms"] >= 50
+    # Ações independentes: a segunda começa antes de a primeira terminar
+    first, second = sorted(actions, key=lambda action: action["start_ms"])
+    assert second["start_ms"] < first["start_ms"] + first["duration_ms"]
+
+    assert consolidation["attributes"]["mode"] == "template"
+    assert consolidation["start_ms"] >= execution["start_ms"] + execution["duration_ms"] - 0.01
+
+
+def test_timing_is_omitted_without_debug(gateway, monkeypatch):
+    install(monkeypatch, main)
+    response = gateway.post("/api/execute", json={"prompt": "organize o roadmap com o time"})
+
+    assert response.status_code == 200
+    assert "timing" not in response.json()
@@ -0,0 +1,106 @@
+"""
+PlanExecutor: ações independentes em paralelo, dependências respeitadas
+(hub de MCPs simulado, sem chamadas externas)
+"""
+import asyncio
+import time
+
+from backend.executor import PlanExecutor
+from backend.models import Action, ExecutionPlan
+
+LATENCY = 0.2
+
+
+class StubHub:
+    """Simula MCPHub.execute_action com latência fixa e registra os horários"""
+
+    def __init__(self, latency: float = LATENCY, failing=()):
+        self.latency = latency
+        self.failing = set(failing)
+        self.calls = {}
+
+    async def execute_action(self, tool_name, parameters, user_id):
+        name = parameters["name"]
+        start = time.perf_counter()
+        await asyncio.sleep(parameters.get("latency", self.latency))
+        self.calls[name] = (start, time.perf_counter())
+        if name in self.failing:
+            return {"status": "error", "tool_name": tool_name, "error": "falhou"}
+        return {"status": "success", "tool_name": tool_name, "details": {"name": name}}
+
+
+def make_plan(*actions):
+    return ExecutionPlan(
+        actions=[
+            Action(tool_name="slack", parameters={"name": name, **extra}, depends_on=depends_on)
+            for name, depends_on, extra in actions
+        ],
+        reasoning="teste"
+    )
+
+
+def run(executor, plan):
+    start = time.perf_counter()
+    results = asyncio.run(executor.execute(plan, "user"))
+    return results, time.perf_counter() - start
+
+
+def test_independent_actions_overlap():
+    hub = StubHub()
+    plan = make_plan(*[(f"a{i}", [], {}) for i in range(5)])
+
+    results, elapsed = run(PlanExecutor(hub, max_concurrency=5), plan)
+
+    assert [r["status"] for r in results] == ["success"] * 5
+    # Tempo total ≈ a maior latência, não a soma (5 x 0.2 s)
+    assert elapsed < LATENCY * 2
+    latest_start = max(start for start, _ in hub.calls.values())
+    earliest_end = min(end for _, end in hub.calls.values())
+    assert latest_start < earliest_end
+
+
+def test_results_follow_plan_order():
+    hub = StubHub()
+    plan = make_plan(("lenta", [], {"latency": 0.15}), ("rapida", [], {"latency": 0.01}))
+
+    results, _ = run(PlanExecutor(hub), plan)
+
+    assert [r["details"]["name"] for r in results] == ["lenta", "rapida"]
+
+
+def test_dependencies_are_respected():
+    hub = StubHub()
+    plan = make_plan(
+        ("evento", [], {}),
+        ("aviso", [0], {}),
+        ("independente", [], {})
+    )
+
+    results, elapsed = run(PlanExecutor(hub), plan)
+
+    assert [r["status"] for r in results] == ["success"] * 3
+    assert hub.calls["aviso"][0] >= hub.calls["evento"][1]
+    # A ação independente não espera a cadeia evento -> aviso
+    assert hub.calls["independente"][0] < hub.calls["evento"][1]
+    assert LATENCY * 2 <= elapsed < LATENCY * 3
+
+
+def test_failed_dependency_skips_dependent_action():
+    hub = StubHub(failing={"evento"})
+    plan = make_plan(("evento", [], {}), ("aviso", [0], {}))
+
+    results, _ = run(PlanExecutor(hub), plan)
+
+    assert results[0]["status"] == "error"
+    assert results[1]["status"] == "error"
+    assert "aviso" not in hub.calls
+
+
+def test_concurrency_cap():
+    hub = StubHub()
+    plan = make_plan(*[(f"a{i}", [], {}) for i in range(4)])
+
+    _, elapsed = run(PlanExecutor(hub, max_concurrency=2), plan)
+
+    # Duas levas de 2 ações
+    assert LATENCY * 2 <= elapsed < LATENCY * 3
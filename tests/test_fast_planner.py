@@ -0,0 +1,82 @@
+"""
+FastPlanner: comandos fora do padrão não podem sair com confiança alta
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.fast_planner import FastPlanner
+from backend.router import Router
+
+
+@pytest.fixture
+def planner():
+    return FastPlanner(threshold=0.8)
+
+
+def test_simple_command_is_confident(planner):
+    plan = planner.plan("Marque uma reunião amanhã às 10h e avise no canal #geral que a reunião foi marcada")
+    assert planner.is_confident(plan)
+    event, message = plan.actions
+    assert event.parameters["title"] == "Reunião"
+    assert event.parameters["start_time"].endswith("T10:00:00")
+    assert message.parameters["channel"] == "#geral"
+    assert message.depends_on == [0]
+
+
+def test_invalid_hour_is_not_planned(planner):
+    plan = planner.plan("marque reunião amanhã às 25h")
+    assert not planner.is_confident(plan)
+
+
+def test_one_on_one_is_not_read_as_time(planner):
+    plan = planner.plan("marque 1:1 com Ana amanhã às 10h")
+    event = plan.actions[0].parameters
+    assert event["start_time"].endswith("T10:00:00")
+    assert event["title"] == "1:1 com Ana"
+
+
+def test_comma_separates_slack_clause(planner):
+    plan = planner.plan("marque reunião amanhã às 10h, avise no #geral")
+    assert [a.tool_name for a in plan.actions] == ["google_calendar", "slack"]
+    assert plan.actions[0].parameters["title"] == "Reunião"
+
+
+def test_duration_sets_end_time(planner):
+    plan = planner.plan("marque reunião de 30 minutos amanhã às 10h")
+    event = plan.actions[0].parameters
+    assert planner.is_confident(plan)
+    assert event["title"] == "Reunião"
+    start = datetime.fromisoformat(event["start_time"])
+    assert datetime.fromisoformat(event["end_time"]) - start == timedelta(minutes=30)
+
+
+@pytest.mark.parametrize("prompt", [
+    "crie um evento amanhã às 15h chamado Planning",
+    "marque reunião amanhã às 10h com o time",
+    "avise o cliente no #geral que o deploy terminou",
+])
+def test_leftover_text_lowers_confidence(planner, prompt):
+    assert not planner.is_confident(planner.plan(prompt))
+
+
+def test_past_day_month_rolls_to_next_year(planner):
+    today = datetime.now()
+    past = today - timedelta(days=7)
+    if past.year != today.year:
+        pytest.skip("data de referência cai no ano anterior")
+    plan = planner.plan(f"marque reunião dia {past.day:02d}/{past.month:02d} às 10h")
+    start = datetime.fromisoformat(plan.actions[0].parameters["start_time"])
+    assert start.year == today.year + 1
+
+
+def test_router_falls_back_when_rules_raise(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    router = Router()
+
+    def broken(prompt):
+        raise ValueError("hour must be in 0..23")
+
+    monkeypatch.setattr(router.fast_planner, "plan", broken)
+    assert router._fast_plan("marque reunião") is None
+    assert router._fallback_plan("marque uma reunião").actions
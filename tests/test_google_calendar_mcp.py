@@ -0,0 +1,75 @@
+"""
+GoogleCalendarMCP: inserts do mesmo usuário não são serializados
+(API do Calendar simulada por um servidor local)
+"""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backend.mcps.google_calendar_mcp import GoogleCalendarMCP
+
+LATENCY = 0.1
+
+
+class CalendarEndpoint:
+    """Responde a events.insert ecoando o evento, com latência fixa"""
+
+    def __init__(self):
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                event = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                time.sleep(LATENCY)
+                event["htmlLink"] = f"https://calendar.example/{event['id']}"
+                body = json.dumps(event).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def test_same_token_inserts_run_in_parallel():
+    mcp = GoogleCalendarMCP()
+
+    async def scenario():
+        return await asyncio.gather(*(
+            mcp.execute("token-ana", {
+                "title": f"Evento {i}",
+                "start_time": "2026-10-18T10:00:00",
+                "end_time": "2026-10-18T11:00:00"
+            })
+            for i in range(8)
+        ))
+
+    with CalendarEndpoint() as endpoint:
+        mcp.api_endpoint = endpoint.url
+        # Discovery e serviço do token fora da medição
+        mcp._get_service("token-ana")
+        start = time.perf_counter()
+        results = asyncio.run(scenario())
+        elapsed = time.perf_counter() - start
+
+    assert [r["summary"] for r in results] == [f"Evento {i}" for i in range(8)]
+    assert len({r["event_id"] for r in results}) == 8
+    # Serializado levaria 8 x LATENCY
+    assert elapsed < 4 * LATENCY
@@ -0,0 +1,45 @@
+"""
+Importação de eventos .ics: fusos (TZID), dias inteiros e escapes de texto
+"""
+from backend.mcps.google_calendar_mcp import GoogleCalendarMCP
+from backend.utils import parse_events_ics
+
+
+def ics(*lines):
+    return "\r\n".join(["BEGIN:VCALENDAR", "BEGIN:VEVENT", *lines, "END:VEVENT", "END:VCALENDAR"])
+
+
+def test_tzid_keeps_zone_offset():
+    [event] = parse_events_ics(ics(
+        "SUMMARY:Planning",
+        "DTSTART;TZID=America/New_York:20240115T100000",
+        "DTEND;TZID=America/New_York:20240115T110000",
+    ))
+    assert event["start_time"] == "2024-01-15T10:00:00-05:00"
+    assert event["end_time"] == "2024-01-15T11:00:00-05:00"
+
+
+def test_utc_and_unknown_zone():
+    [event] = parse_events_ics(ics(
+        "DTSTART:20240115T100000Z",
+        "DTEND;TZID=Horario Inventado:20240115T110000",
+    ))
+    assert event["start_time"] == "2024-01-15T10:00:00+00:00"
+    assert event["end_time"] == "2024-01-15T11:00:00"
+
+
+def test_all_day_event_uses_dates():
+    [event] = parse_events_ics(ics("SUMMARY:Feriado", "DTSTART;VALUE=DATE:20241225"))
+    assert (event["start_time"], event["end_time"]) == ("2024-12-25", "2024-12-26")
+    body = GoogleCalendarMCP._event_body(event)
+    assert body["start"] == {"date": "2024-12-25"}
+    assert body["end"] == {"date": "2024-12-26"}
+
+
+def test_text_unescape_is_single_pass():
+    [event] = parse_events_ics(ics(
+        r"SUMMARY:Caminho C:\\novo\, revisado",
+        r"DESCRIPTION:linha 1\nlinha 2\; fim",
+    ))
+    assert event["title"] == "Caminho C:\\novo, revisado"
+    assert event["description"] == "linha 1\nlinha 2; fim"
@@ -0,0 +1,68 @@
+"""
+IdempotencyStore: repetições reaproveitam a execução; expirados saem pelo início da fila
+"""
+import asyncio
+
+import pytest
+
+from backend.idempotency import IdempotencyConflict, IdempotencyStore
+
+
+def run(coro_factory):
+    return asyncio.run(coro_factory())
+
+
+async def result(value, delay=0):
+    await asyncio.sleep(delay)
+    return value
+
+
+def test_repeated_key_joins_and_replays():
+    store = IdempotencyStore(ttl=60)
+
+    async def scenario():
+        first, started = await store.begin("ana", "k1", "f", lambda: result("ok", 0.05))
+        joined, joined_started = await store.begin("ana", "k1", "f", lambda: result("outro"))
+        assert started and not joined_started and joined is first
+        assert await first == "ok"
+        replay, replay_started = await store.begin("ana", "k1", "f", lambda: result("outro"))
+        assert not replay_started and await replay == "ok"
+        with pytest.raises(IdempotencyConflict):
+            await store.begin("ana", "k1", "g", lambda: result("outro"))
+
+    run(scenario)
+    assert store.stats()["hits"] == 1
+    assert store.stats()["joined"] == 1
+
+
+def test_expired_entries_are_popped_from_the_front(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("backend.idempotency.time.monotonic", lambda: clock[0])
+    store = IdempotencyStore(ttl=10, max_entries=1000)
+
+    async def scenario():
+        for i in range(5):
+            task, _ = await store.begin("ana", f"k{i}", "f", lambda: result(i))
+            await task
+            await asyncio.sleep(0)
+            clock[0] += 3
+        # k0 e k1 expiraram (concluídas em 100 e 103, agora 115)
+        await store.begin("ana", "novo", "f", lambda: result("x"))
+        return list(store._completed)
+
+    assert run(scenario) == [("ana", f"k{i}") for i in range(2, 5)]
+
+
+def test_max_entries_evicts_oldest_completed():
+    store = IdempotencyStore(ttl=60, max_entries=3)
+
+    async def scenario():
+        for i in range(5):
+            task, _ = await store.begin("ana", f"k{i}", "f", lambda: result(i))
+            await task
+            await asyncio.sleep(0)
+        return store.stats()["entries"], list(store._completed)
+
+    entries, completed = run(scenario)
+    assert entries == 3
+    assert completed == [("ana", "k2"), ("ana", "k3"), ("ana", "k4")]
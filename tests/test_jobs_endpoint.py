@@ -0,0 +1,21 @@
+"""
+POST /api/jobs: com a fila cheia, 429 com Retry-After (backpressure)
+"""
+import asyncio
+
+import backend.main as main
+
+
+def test_full_queue_returns_429_with_retry_after(gateway, monkeypatch):
+    # Fila de uma vaga já ocupada, que os workers não consomem
+    full_queue = asyncio.Queue(maxsize=1)
+    full_queue.put_nowait(("outro-job", None))
+    monkeypatch.setattr(main.job_manager, "_queue", full_queue)
+    rejected = main.job_manager.rejected
+
+    response = gateway.post("/api/jobs", json={"prompt": "avise no canal #geral: oi", "user_id": "ana"})
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert main.job_manager.rejected == rejected + 1
+    assert gateway.get("/api/admin/jobs").json()["rejected"] == rejected + 1
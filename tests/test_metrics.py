@@ -0,0 +1,70 @@
+"""
+Métricas: formato de texto do Prometheus (HELP/TYPE, séries de
+histograma, escape de labels) e exposição em GET /metrics
+"""
+import pytest
+
+import backend.main as main
+from backend import metrics
+from backend.metrics import Counter, Histogram
+
+from stubs import install
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Métricas criadas no teste ficam fora do registro global"""
+    monkeypatch.setattr(metrics, "REGISTRY", [])
+    return metrics.REGISTRY
+
+
+def test_labelled_counter_exposition(registry):
+    counter = Counter("test_requests_total", "Requisições\\nde teste", ["path", "code"])
+    counter.labels('/a"b\\c', 200).inc()
+    counter.labels('/a"b\\c', 200).inc(2)
+    counter.labels("linha\nnova", 500).inc()
+
+    assert metrics.render() == (
+        '# HELP test_requests_total Requisições\\\\nde teste\n'
+        '# TYPE test_requests_total counter\n'
+        'test_requests_total{path="/a\\"b\\\\c",code="200"} 3.0\n'
+        'test_requests_total{path="linha\\nnova",code="500"} 1.0\n'
+    )
+
+
+def test_labelled_histogram_exposition(registry):
+    histogram = Histogram("test_seconds", "Duração", ["tool"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.labels("slack").observe(value)
+
+    assert metrics.render() == (
+        '# HELP test_seconds Duração\n'
+        '# TYPE test_seconds histogram\n'
+        'test_seconds_bucket{tool="slack",le="0.1"} 2\n'
+        'test_seconds_bucket{tool="slack",le="1.0"} 3\n'
+        'test_seconds_bucket{tool="slack",le="+Inf"} 4\n'
+        'test_seconds_sum{tool="slack"} 3.65\n'
+        'test_seconds_count{tool="slack"} 4\n'
+    )
+
+
+def test_unlabelled_metric_and_wrong_label_count(registry):
+    Counter("test_total", "Sem labels")
+    assert metrics.render().splitlines()[-1] == "test_total 0.0"
+    with pytest.raises(ValueError):
+        Counter("test_labelled_total", "Com labels", ["tool"]).labels("a", "b")
+
+
+def test_metrics_endpoint_exposes_gateway_metrics(gateway, monkeypatch):
+    install(monkeypatch, main)
+    gateway.post("/api/execute", json={"prompt": "organize o roadmap com o time", "user_id": "ana"})
+
+    response = gateway.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert "# TYPE gateway_action_seconds histogram" in body
+    assert 'gateway_action_seconds_bucket{tool="slack",status="success",le="+Inf"}' in body
+    assert 'gateway_plan_seconds_count{source="llm"}' in body
+    assert "# TYPE gateway_requests_in_flight gauge" in body
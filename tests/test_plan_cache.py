@@ -0,0 +1,36 @@
+"""
+normalize_prompt: chaves de cache não podem reaproveitar horários vencidos
+"""
+from datetime import date
+
+import pytest
+
+from backend.plan_cache import normalize_prompt
+
+TODAY = date(2026, 10, 17)
+
+
+def test_relative_dates_are_resolved_into_key():
+    key = normalize_prompt("Marque reunião AMANHÃ às 10h!", today=TODAY)
+    assert key == "marque reuniao 2026-10-18 as 10h"
+    assert key != normalize_prompt("Marque reunião amanhã às 10h", today=date(2026, 10, 18))
+
+
+def test_weekday_expressions_pin_today():
+    assert normalize_prompt("reunião na sexta", today=TODAY).endswith("@2026-10-17")
+
+
+@pytest.mark.parametrize("prompt", [
+    "avise no #geral agora",
+    "marque reunião daqui a 2 horas",
+    "lembrete em 30 minutos",
+    "marque reunião em 2 dias",
+    "crie evento em uma semana",
+    "marque reunião dentro de 1 hora",
+])
+def test_prompts_relative_to_now_are_not_cacheable(prompt):
+    assert normalize_prompt(prompt, today=TODAY) is None
+
+
+def test_durations_stay_cacheable():
+    assert normalize_prompt("reunião amanhã às 10h por 30 minutos", today=TODAY) is not None
@@ -0,0 +1,119 @@
+"""
+RateLimiter: custos acima da rajada são divididos em pedaços e a fila é
+atendida em ordem de chegada
+"""
+import asyncio
+import time
+
+import pytest
+
+from backend.mcp_hub import MCPHub
+from backend.rate_limit import RateLimiter
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_GLOBAL", "0")
+    monkeypatch.setenv("RATE_LIMIT_TOOL_SLACK", "0")
+    monkeypatch.setenv("RATE_LIMIT_USER", "20/5")
+    monkeypatch.setenv("RATE_LIMIT_MAX_WAIT", "1")
+    monkeypatch.delenv("GATEWAY_WORKERS", raising=False)
+    return RateLimiter()
+
+
+def test_cost_above_burst_is_refused(limiter):
+    assert limiter.max_cost("slack", "ana") == 5
+    with pytest.raises(ValueError):
+        asyncio.run(limiter.acquire("slack", "ana", cost=6))
+    # Nada foi reservado
+    assert limiter.user_buckets[("slack", "ana")].tokens == 5
+
+
+class StubVault:
+    def get_cached_access_token(self, tool_name, user_id):
+        return "token"
+
+
+class StubCalendar:
+    """Cria eventos na hora e registra quando cada usuário foi atendido"""
+
+    def __init__(self):
+        self.served = []
+
+    async def execute(self, access_token, parameters):
+        self.served.append((parameters["user"], time.perf_counter()))
+        return {"summary": parameters["summary"]}
+
+    async def bulk_create(self, access_token, events):
+        self.served.extend((event["user"], time.perf_counter()) for event in events)
+        return [
+            {"index": index, "status": "success", "details": {"summary": event["summary"]}}
+            for index, event in enumerate(events)
+        ]
+
+
+def test_bulk_import_does_not_starve_other_users(monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_GLOBAL", "0")
+    monkeypatch.setenv("RATE_LIMIT_TOOL_GOOGLE_CALENDAR", "50/10")
+    monkeypatch.setenv("RATE_LIMIT_USER", "1000/1000")
+    monkeypatch.delenv("GATEWAY_WORKERS", raising=False)
+    hub = MCPHub(StubVault())
+    calendar = hub.mcps["google_calendar"] = StubCalendar()
+    events = [{"user": "ana", "summary": f"Evento {i}"} for i in range(60)]
+
+    async def other_user():
+        await asyncio.sleep(0.05)
+        start = time.perf_counter()
+        result = await hub.execute_action("google_calendar", {"user": "bia", "summary": "Reunião"}, "bia")
+        return result, time.perf_counter() - start
+
+    async def scenario():
+        return await asyncio.gather(
+            hub.execute_bulk("google_calendar", events, "ana"),
+            other_user()
+        )
+
+    bulk, (single, waited) = asyncio.run(scenario())
+
+    assert bulk["created"] == 60
+    assert [r["index"] for r in bulk["results"]] == list(range(60))
+    assert single["status"] == "success"
+    # Cobrando o lote de uma vez, bia esperaria as 50 fichas de dívida
+    # (~1 s); em pedaços de 10, só o pedaço já reservado
+    assert waited < 0.4
+    users = [user for user, _ in calendar.served]
+    assert users.index("bia") < len(users) - 10
+    # O balde compartilhado nunca fica abaixo de uma rajada de reservas
+    assert hub.rate_limiter.tool_buckets["google_calendar"].tokens > -20
+
+
+def test_waiters_are_served_in_arrival_order(limiter):
+    order = []
+
+    async def request(n):
+        await limiter.acquire("slack", "ana")
+        order.append(n)
+
+    async def scenario():
+        start = time.perf_counter()
+        await asyncio.gather(*(request(n) for n in range(15)))
+        return time.perf_counter() - start
+
+    elapsed = asyncio.run(scenario())
+    assert order == list(range(15))
+    # 5 na rajada + 10 a 20/s
+    assert 0.45 <= elapsed < 0.8
+
+
+def test_cancelled_waiter_returns_its_tokens(limiter):
+    async def scenario():
+        for _ in range(5):
+            await limiter.acquire("slack", "ana")
+        waiter = asyncio.create_task(limiter.acquire("slack", "ana"))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return limiter.user_buckets[("slack", "ana")].tokens
+
+    assert asyncio.run(scenario()) > -0.5
@@ -0,0 +1,141 @@
+"""
+Circuit breaker (closed → open → half_open → closed/open) e retentativas
+conforme o tipo de erro do MCP
+"""
+import asyncio
+
+import pytest
+
+from backend.mcps.errors import MCPError
+from backend.resilience import CircuitBreaker, CircuitOpenError, call_with_resilience
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("backend.resilience.time.monotonic", lambda: now[0])
+    return now
+
+
+def make_breaker():
+    return CircuitBreaker("teste", failure_rate_threshold=0.5, min_calls=4, window_size=4, open_seconds=30)
+
+
+def test_opens_after_failure_rate_reaches_threshold(clock):
+    breaker = make_breaker()
+    for outcome in (True, False, True):
+        breaker.record_success() if outcome else breaker.record_failure()
+    # Abaixo do mínimo de chamadas continua fechado
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.is_rejecting
+    assert not breaker.allow()
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_half_open_probe_success_closes(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record_failure()
+
+    clock[0] += 30
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Só uma chamada de teste por vez
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_half_open_probe_failure_reopens(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record_failure()
+
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.stats()["times_opened"] == 2
+    assert not breaker.allow()
+
+
+def test_ignored_call_frees_half_open_probe(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record_failure()
+
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record_ignored()
+    assert breaker.allow()
+
+
+def calls_failing_with(*errors):
+    """fn que levanta os erros dados em sequência e depois retorna "ok" """
+    calls = []
+
+    async def fn():
+        calls.append(len(calls))
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return "ok"
+
+    return fn, calls
+
+
+def resilient(fn, breaker=None, **kwargs):
+    breaker = breaker or make_breaker()
+    return asyncio.run(call_with_resilience(breaker, fn, base_delay=0, max_delay=0, **kwargs))
+
+
+def test_retryable_error_is_retried():
+    fn, calls = calls_failing_with(MCPError("timeout", retryable=True), MCPError("503", retryable=True))
+    assert resilient(fn, max_attempts=3) == "ok"
+    assert len(calls) == 3
+
+
+def test_retryable_error_gives_up_after_max_attempts():
+    fn, calls = calls_failing_with(*[MCPError("timeout", retryable=True)] * 5)
+    with pytest.raises(MCPError):
+        resilient(fn, max_attempts=3)
+    assert len(calls) == 3
+
+
+def test_zero_max_attempts_still_raises():
+    fn, calls = calls_failing_with(MCPError("timeout", retryable=True))
+    with pytest.raises(MCPError):
+        resilient(fn, max_attempts=0)
+    assert len(calls) == 1
+
+
+def test_transient_not_retryable_counts_but_is_not_retried():
+    breaker = make_breaker()
+    fn, calls = calls_failing_with(MCPError("falhou após enviar", transient=True))
+    with pytest.raises(MCPError):
+        resilient(fn, breaker, max_attempts=3)
+    assert len(calls) == 1
+    assert breaker.stats()["calls_in_window"] == 1
+
+
+def test_client_error_is_neither_retried_nor_counted():
+    breaker = make_breaker()
+    fn, calls = calls_failing_with(MCPError("canal não encontrado"))
+    with pytest.raises(MCPError):
+        resilient(fn, breaker, max_attempts=3)
+    assert len(calls) == 1
+    assert breaker.stats()["calls_in_window"] == 0
+
+
+def test_open_circuit_rejects_without_calling(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record_failure()
+    fn, calls = calls_failing_with()
+    with pytest.raises(CircuitOpenError):
+        resilient(fn, breaker)
+    assert calls == []
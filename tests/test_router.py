@@ -0,0 +1,167 @@
+"""
+Router: chamadas ao Gemini rodam no pool dedicado, sem bloquear o event
+loop, e planejamentos concorrentes se sobrepõem; consolidação por
+templates e pelo LLM, com fallback (modelo simulado)
+"""
+import asyncio
+import json
+import time
+
+import pytest
+
+from backend.router import Router
+from stubs import StubModel as SummaryModel
+
+LATENCY = 0.3
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    """generate_content síncrono e lento, como o SDK do Gemini"""
+
+    def generate_content(self, prompt, stream=False):
+        time.sleep(LATENCY)
+        return StubResponse(json.dumps({
+            "actions": [{"tool_name": "slack", "parameters": {"channel": "#geral", "message": "oi"}}],
+            "reasoning": "teste"
+        }))
+
+
+@pytest.fixture
+def router(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "teste")
+    monkeypatch.setenv("LLM_MAX_WORKERS", "8")
+    router = Router()
+    router._model = StubModel()
+    yield router
+    router._llm_executor.shutdown(wait=False)
+
+
+def test_concurrent_plans_overlap_without_blocking_loop(router):
+    # Comandos que o planejador rápido não reconhece (vão ao LLM), distintos
+    # para não passarem pelo cache de planos
+    prompts = [f"organize o roadmap número {i} com o time" for i in range(6)]
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticking = asyncio.create_task(ticker())
+        start = time.perf_counter()
+        plans = await asyncio.gather(*(router.plan_execution(p, "user") for p in prompts))
+        elapsed = time.perf_counter() - start
+        ticking.cancel()
+        return plans, elapsed, ticks
+
+    plans, elapsed, ticks = asyncio.run(main())
+
+    assert all(plan.actions[0].tool_name == "slack" for plan in plans)
+    # Em série seriam 6 x 0.3 s
+    assert elapsed < LATENCY * 2
+    # O event loop continuou rodando durante as chamadas
+    assert ticks >= LATENCY / 0.01 / 2
+
+
+def test_batch_fallback_plans_with_each_items_user(router, monkeypatch):
+    # O modelo simulado não responde no formato de lote: cada item cai em plan_execution
+    seen = []
+    plan_execution = router.plan_execution
+
+    async def recording(prompt, user_id):
+        seen.append((prompt, user_id))
+        return await plan_execution(prompt, user_id)
+
+    monkeypatch.setattr(router, "plan_execution", recording)
+    prompts = ["organize o roadmap com o time", "revise o backlog do sprint"]
+    plans = asyncio.run(router.plan_batch(prompts, ["ana", "bia"]))
+
+    assert len(plans) == 2
+    assert sorted(seen) == sorted(zip(prompts, ["ana", "bia"]))
+
+
+class FailingModel:
+    def generate_content(self, prompt, stream=False):
+        raise RuntimeError("cota excedida")
+
+
+def calendar(summary="Planning", **start):
+    return {"status": "success", "tool_name": "google_calendar", "details": {"summary": summary, "start": start}}
+
+
+def slack(**details):
+    return {"status": "success", "tool_name": "slack", "details": details}
+
+
+def consolidate(router, results, mode="template"):
+    return asyncio.run(router.consolidate_response("comando", results, mode=mode))
+
+
+@pytest.mark.parametrize("results, expected", [
+    (
+        [calendar(dateTime="2026-10-20T10:00:00")],
+        'Pronto! Criei "Planning" no seu Google Calendar para 20/10 às 10:00.'
+    ),
+    (
+        [calendar("Feriado", date="2026-11-02")],
+        'Pronto! Criei "Feriado" no seu Google Calendar para 02/11 (dia inteiro).'
+    ),
+    (
+        [slack(channel="C123", channel_name="#geral")],
+        "Pronto! Enviei a mensagem em #geral no Slack."
+    ),
+    (
+        [slack(broadcast=[{"channel": "#a", "status": "success"}, {"channel": "#b", "status": "success"}])],
+        "Pronto! Enviei a mensagem em 2 canal(is) do Slack: #a, #b."
+    ),
+    (
+        [slack(broadcast=[{"channel": "#a", "status": "success"}, {"channel": "#b", "status": "error"}])],
+        "Pronto! Enviei a mensagem em 1 de 2 canais do Slack; não consegui enviar em #b."
+    ),
+    (
+        [{"status": "success", "tool_name": "jira", "details": {}}],
+        "Pronto! Executei a ação em jira com sucesso."
+    ),
+    (
+        [calendar(dateTime="2026-10-20T10:00:00"), {"status": "error", "tool_name": "slack", "error": "canal não encontrado"}],
+        'Criei "Planning" no seu Google Calendar para 20/10 às 10:00. '
+        "Não consegui concluir a ação em slack: canal não encontrado."
+    ),
+    ([], "Não identifiquei nenhuma ação para executar nesse comando."),
+])
+def test_template_consolidation_per_action_type(router, results, expected):
+    # Sem chamada ao modelo (falharia)
+    router._model = FailingModel()
+    assert consolidate(router, results) == expected
+
+
+def test_none_mode_skips_consolidation(router):
+    assert consolidate(router, [calendar()], mode="none") is None
+
+
+def test_llm_mode_uses_model_and_falls_back_to_template(router):
+    model = router._model = SummaryModel(summary="Reunião marcada e time avisado.")
+    assert consolidate(router, [calendar()], mode="llm") == "Reunião marcada e time avisado."
+    assert "RESULTADOS DA EXECUÇÃO" in model.prompts[0]
+
+    router._model = FailingModel()
+    assert consolidate(router, [calendar()], mode="llm") == 'Pronto! Criei "Planning" no seu Google Calendar.'
+
+
+def test_streamed_llm_consolidation_falls_back_before_first_chunk(router):
+    async def collect():
+        return [chunk async for chunk in router.stream_consolidation("comando", [calendar()], mode="llm")]
+
+    router._model = SummaryModel(summary="Reunião marcada.")
+    assert asyncio.run(collect()) == ["Reunião ", "marcada. "]
+
+    router._model = FailingModel()
+    assert asyncio.run(collect()) == ['Pronto! Criei "Planning" no seu Google Calendar.']
@@ -0,0 +1,126 @@
+"""
+Vários workers: chaves de idempotência e jobs vistos por todos os processos
+(dois stores no mesmo banco simulam dois workers)
+"""
+import asyncio
+
+import pytest
+
+from backend.idempotency import IdempotencyConflict, IdempotencyStore
+from backend.jobs import JobManager, JobQueueFull
+from backend.shared_state import SharedStateStore
+
+
+@pytest.fixture
+def workers(tmp_path, monkeypatch):
+    monkeypatch.setenv("IDEMPOTENCY_POLL_INTERVAL", "0.02")
+    monkeypatch.setenv("JOB_POLL_INTERVAL", "0.02")
+    path = str(tmp_path / "shared_state.db")
+    stores = [SharedStateStore(path), SharedStateStore(path)]
+    yield stores
+    for store in stores:
+        store.close()
+
+
+def test_repeated_key_on_other_worker_waits_for_result(workers):
+    a, b = (IdempotencyStore(ttl=60, shared=store) for store in workers)
+    runs = []
+
+    async def execution(worker):
+        runs.append(worker)
+        await asyncio.sleep(0.1)
+        return {"success": True, "response": f"feito por {worker}"}
+
+    async def scenario():
+        first, first_started = await a.begin("ana", "k1", "f", lambda: execution("a"))
+        repeat, repeat_started = await b.begin("ana", "k1", "f", lambda: execution("b"))
+        assert first_started and not repeat_started
+        results = await asyncio.gather(first, repeat)
+        # Depois de concluída, a repetição recebe o resultado gravado
+        replay, replay_started = await b.begin("ana", "k1", "f", lambda: execution("b"))
+        with pytest.raises(IdempotencyConflict):
+            await b.begin("ana", "k1", "outro", lambda: execution("b"))
+        return results, await replay, replay_started
+
+    results, replay, replay_started = asyncio.run(scenario())
+    assert runs == ["a"]
+    assert results[0] == results[1] == replay == {"success": True, "response": "feito por a"}
+    assert not replay_started
+
+
+def test_failed_execution_releases_key_for_other_worker(workers):
+    a, b = (IdempotencyStore(ttl=60, shared=store) for store in workers)
+
+    async def failing():
+        await asyncio.sleep(0.05)
+        raise RuntimeError("falhou")
+
+    async def succeeding():
+        return {"success": True}
+
+    async def scenario():
+        first, _ = await a.begin("ana", "k1", "f", failing)
+        repeat, _ = await b.begin("ana", "k1", "f", succeeding)
+        with pytest.raises(RuntimeError):
+            await first
+        return await repeat
+
+    assert asyncio.run(scenario()) == {"success": True}
+
+
+def test_job_can_be_polled_from_any_worker(workers):
+    async def runner(payload):
+        await asyncio.sleep(0.1)
+        return {"success": True, "response": payload}
+
+    async def scenario():
+        owner = JobManager(runner, workers=1, ttl=60, shared=workers[0])
+        other = JobManager(runner, workers=1, ttl=60, shared=workers[1])
+        owner.start()
+        other.start()
+        try:
+            job = await owner.submit("olá", "ana")
+            queued = await other.wait(job["job_id"], 0)
+            finished = await other.wait(job["job_id"], 2)
+            missing = await other.wait("nao-existe", 0)
+        finally:
+            await owner.stop()
+            await other.stop()
+        return queued, finished, missing
+
+    queued, finished, missing = asyncio.run(scenario())
+    assert queued["status"] in ("queued", "running")
+    assert finished["status"] == "succeeded"
+    assert finished["result"] == {"success": True, "response": "olá"}
+    assert missing is None
+
+
+def test_job_rejected_while_publishing_leaves_no_shared_row(workers):
+    async def runner(payload):
+        return {"success": True}
+
+    async def scenario():
+        manager = JobManager(runner, workers=1, max_queue=1, ttl=60, shared=workers[0])
+        manager.start()
+        # Sem workers consumindo: a fila fica com o primeiro job
+        await manager.stop()
+        # As duas passam pela verificação de fila cheia antes de publicar;
+        # só a primeira cabe na fila
+        return await asyncio.gather(
+            manager.submit("a", "ana"),
+            manager.submit("b", "ana"),
+            return_exceptions=True
+        )
+
+    accepted, rejected = asyncio.run(scenario())
+    assert isinstance(rejected, JobQueueFull)
+    rows = workers[1]._conn.execute("SELECT job_id FROM jobs").fetchall()
+    assert rows == [(accepted["job_id"],)]
+
+
+def test_submit_before_start_is_a_clear_error():
+    async def runner(payload):
+        return {}
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(JobManager(runner).submit("a", "ana"))
@@ -0,0 +1,64 @@
+"""
+ChannelDirectory: índice publicado só após carga completa e backoff de falhas
+"""
+import pytest
+from slack_sdk.errors import SlackApiError
+
+from backend.mcps.slack_mcp import ChannelDirectory, SlackRateLimiter
+
+
+class FakeClient:
+    """conversations.list em duas páginas; falha enquanto failures > 0"""
+
+    def __init__(self, failures=0, fail_on_page=0):
+        self.failures = failures
+        self.fail_on_page = fail_on_page
+        self.calls = []
+
+    def conversations_list(self, types, exclude_archived, limit, cursor=None):
+        self.calls.append((types, cursor))
+        page = 1 if cursor else 0
+        if self.failures and page == self.fail_on_page:
+            self.failures -= 1
+            raise SlackApiError("falhou", {"ok": False, "error": "internal_error"})
+        if page == 0:
+            return {"channels": [{"name": "geral", "id": "C1"}], "response_metadata": {"next_cursor": "p2"}}
+        return {"channels": [{"name": "projetos", "id": "C2"}], "response_metadata": {"next_cursor": ""}}
+
+
+@pytest.fixture
+def directory(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("backend.mcps.slack_mcp.time.monotonic", lambda: clock[0])
+    directory = ChannelDirectory(ttl=600, min_reload_interval=30, limiter=SlackRateLimiter())
+    directory.failure_backoff = 5
+    directory.clock = clock
+    return directory
+
+
+def test_lists_public_channels_only_by_default(directory):
+    client = FakeClient()
+    assert directory.resolve(client, "xoxb", "projetos") == "C2"
+    assert {types for types, _ in client.calls} == {"public_channel"}
+
+
+def test_failed_load_is_not_published_and_backs_off(directory):
+    client = FakeClient(failures=2, fail_on_page=1)
+    with pytest.raises(SlackApiError):
+        directory.resolve(client, "xoxb", "geral")
+    # A primeira página não vira um índice parcial
+    assert "xoxb" not in directory._entries
+
+    calls = len(client.calls)
+    assert directory.resolve(client, "xoxb", "geral") is None
+    assert len(client.calls) == calls
+
+    # Após o backoff tenta de novo; nova falha dobra o backoff
+    directory.clock[0] += 5
+    with pytest.raises(SlackApiError):
+        directory.resolve(client, "xoxb", "geral")
+    directory.clock[0] += 5
+    assert directory.resolve(client, "xoxb", "geral") is None
+    directory.clock[0] += 5
+    assert directory.resolve(client, "xoxb", "geral") == "C1"
+    assert directory.resolve(client, "xoxb", "projetos") == "C2"
@@ -0,0 +1,71 @@
+"""
+POST /api/execute/stream: ordem dos eventos Server-Sent Events
+(plan → result por ação → response → done) e repetição idempotente
+"""
+import json
+
+import backend.main as main
+from stubs import StubModel, install
+
+
+def read_events(client, body, headers=None):
+    """Lista de (evento, dados) e o header Idempotent-Replayed"""
+    with client.stream("POST", "/api/execute/stream", json=body, headers=headers or {}) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        text = "".join(response.iter_text())
+    events = []
+    for block in text.strip().split("\n\n"):
+        name, data = block.split("\n", 1)
+        events.append((name.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events, response.headers.get("Idempotent-Replayed")
+
+
+def test_events_arrive_in_order(gateway, monkeypatch):
+    install(monkeypatch, main)
+
+    events, _ = read_events(gateway, {"prompt": "organize o roadmap com o time", "user_id": "ana"})
+
+    assert [name for name, _ in events] == ["plan", "result", "result", "response", "done"]
+    plan = events[0][1]
+    assert [action["tool_name"] for action in plan["actions"]] == ["google_calendar", "slack"]
+    assert sorted(data["index"] for name, data in events if name == "result") == [0, 1]
+    assert events[3][1]["text"].startswith("Pronto!")
+    done = events[-1][1]
+    assert done["success"] is True
+    assert [d["status"] for d in done["details"]] == ["success", "success"]
+
+
+def test_llm_response_is_streamed_in_chunks(gateway, monkeypatch):
+    install(monkeypatch, main, StubModel(summary="Reunião marcada e time avisado."))
+
+    events, _ = read_events(gateway, {"prompt": "organize o roadmap com o time", "response_mode": "llm"})
+
+    names = [name for name, _ in events]
+    assert names[:3] == ["plan", "result", "result"]
+    assert names[3:] == ["response"] * 5 + ["done"]
+    assert "".join(data["text"] for name, data in events if name == "response") == "Reunião marcada e time avisado. "
+
+
+def test_debug_done_event_carries_timing(gateway, monkeypatch):
+    install(monkeypatch, main)
+
+    events, _ = read_events(gateway, {"prompt": "organize o roadmap com o time", "debug": True})
+
+    assert events[-1][0] == "done"
+    assert events[-1][1]["timing"]["spans"]["name"] == "execute_stream"
+
+
+def test_replay_with_same_key_sends_response_and_done(gateway, monkeypatch):
+    install(monkeypatch, main)
+    body = {"prompt": "organize o roadmap com o time", "user_id": "ana"}
+    headers = {"Idempotency-Key": "stream-1"}
+
+    first, first_replayed = read_events(gateway, body, headers)
+    replay, replayed = read_events(gateway, body, headers)
+
+    assert first_replayed is None
+    assert replayed == "true"
+    assert [name for name, _ in replay] == ["response", "done"]
+    assert replay[0][1]["text"] == first[3][1]["text"]
+    assert replay[1][1]["details"] == first[-1][1]["details"]
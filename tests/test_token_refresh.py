@@ -0,0 +1,98 @@
+"""
+Renovação de token: requisições concorrentes de um mesmo usuário fazem uma
+única chamada ao endpoint de token (servidor local simulado)
+"""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from backend.mcp_hub import MCPHub
+from backend.vault import Vault
+
+
+class TokenEndpoint:
+    """Endpoint de token OAuth com latência fixa que conta as renovações"""
+
+    def __init__(self, latency: float = 0.2):
+        endpoint = self
+        self.refreshes = 0
+        self.latency = latency
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                endpoint.refreshes += 1
+                time.sleep(endpoint.latency)
+                body = json.dumps({
+                    "access_token": f"token-{endpoint.refreshes}",
+                    "expires_in": 3600,
+                    "token_type": "Bearer",
+                    "scope": "https://www.googleapis.com/auth/calendar https://www.googleapis.com/auth/calendar.events"
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/token"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def vault(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    vault = Vault()
+    yield vault
+    vault.close()
+
+
+def test_concurrent_requests_refresh_once(vault):
+    hub = MCPHub(vault)
+    vault_lookups = 0
+    get_access_token = vault.get_access_token
+
+    def counting_lookup(tool_name, user_id):
+        nonlocal vault_lookups
+        vault_lookups += 1
+        return get_access_token(tool_name, user_id)
+
+    vault.get_access_token = counting_lookup
+
+    async def scenario(endpoint):
+        vault.google_token_uri = endpoint.url
+        vault.store_credentials(
+            tool_name="google_calendar",
+            tool_type="user_oauth",
+            credentials={"token": None, "refresh_token": "refresh-1", "expiry": None},
+            user_id="ana"
+        )
+        await vault.flush()
+        return await asyncio.gather(*(
+            hub._get_access_token("google_calendar", "ana") for _ in range(100)
+        ))
+
+    with TokenEndpoint() as endpoint:
+        results = asyncio.run(scenario(endpoint))
+
+    assert endpoint.refreshes == 1
+    # Os que aguardavam não ocuparam threads: uma única busca no cofre
+    assert vault_lookups == 1
+    assert {token for token, error in results} == {"token-1"}
+    assert all(error is None for _, error in results)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Benchmark: custo de obter o serviço do Google Calendar por chamada.
+Compara o caminho antigo (build() a cada evento) com o cache de serviços do
+GoogleCalendarMCP (discovery estático + cache por token). Não faz chamadas de
+rede: mede apenas a construção do cliente.
+
+Uso: python tools/bench_calendar_service.py [iterações]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+
+from backend.mcps.google_calendar_mcp import GoogleCalendarMCP
+
+
+def measure(label, fn, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        fn(i)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<45} {elapsed / iterations * 1000:8.3f} ms/chamada")
+    return elapsed / iterations
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    mcp = GoogleCalendarMCP()
+
+    before = measure(
+        "Antes: build('calendar', 'v3') por chamada",
+        lambda i: build("calendar", "v3", credentials=Credentials(token="token"), static_discovery=True),
+        iterations
+    )
+    measure(
+        "Depois: cache (primeiro uso de cada token)",
+        lambda i: mcp._get_service(f"token-{i}"),
+        iterations
+    )
+    after = measure(
+        "Depois: cache (token já visto)",
+        lambda i: mcp._get_service("token-0"),
+        iterations
+    )
+    print(f"Ganho por chamada (token já visto): {before / after:,.0f}x")
+
+
+if __name__ == "__main__":
+    main()
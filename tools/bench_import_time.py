@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark: tempo de importação do backend (inicialização a frio dos workers).
+Roda `python -X importtime -c "import backend.main"` em processos novos,
+mostra os módulos mais caros e falha (código de saída 1) se o tempo passar
+do orçamento ou se algum SDK pesado for importado junto com o módulo (eles
+devem ser carregados apenas no primeiro uso).
+
+Uso: python tools/bench_import_time.py [--budget-ms 800] [--runs 3] [--top 15]
+(o orçamento padrão também pode vir de IMPORT_TIME_BUDGET_MS)
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Não podem ser importados por "import backend.main"
+HEAVY_MODULES = (
+    "google.generativeai",
+    "googleapiclient",
+    "google_auth_oauthlib",
+    "slack_sdk",
+    "cryptography",
+)
+
+
+def measure(module: str):
+    """
+    Importa o módulo em um processo novo
+
+    Returns:
+        (tempo total em ms, {módulo: tempo cumulativo em ms})
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        raise SystemExit(f"Falha ao importar {module}")
+
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumul_us, name = line[len("import time:"):].split("|")
+        cumulative[name.strip()] = int(cumul_us) / 1000
+    return cumulative.get(module, 0.0), cumulative
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo de importação do backend")
+    parser.add_argument("--module", default="backend.main")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_TIME_BUDGET_MS", "800")))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    # O menor tempo entre as execuções descarta ruído (cache de disco, etc.)
+    runs = [measure(args.module) for _ in range(max(1, args.runs))]
+    total, cumulative = min(runs, key=lambda run: run[0])
+
+    print(f"Módulos mais caros ao importar {args.module} (cumulativo):")
+    for name, ms in sorted(cumulative.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {ms:9.1f} ms  {name}")
+    print(f"Total: {total:.1f} ms (orçamento: {args.budget_ms:.0f} ms)")
+
+    failed = False
+    heavy = sorted(
+        name for name in cumulative
+        if any(name == heavy or name.startswith(heavy + ".") for heavy in HEAVY_MODULES)
+    )
+    if heavy:
+        print(f"ERRO: SDKs pesados importados na inicialização: {', '.join(heavy[:10])}")
+        failed = True
+    if total > args.budget_ms:
+        print("ERRO: tempo de importação acima do orçamento")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
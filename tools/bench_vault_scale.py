@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark: escala do cofre até 100 mil usuários.
+Preenche um CredentialStore (SQLite + Fernet, em diretório temporário) em
+etapas (ex: 1 mil, 10 mil e 100 mil usuários). Em cada etapa mede a busca
+de credenciais e a listagem paginada de /api/admin/tools (primeira página,
+página no meio e os filtros tool e user_prefix, que usam os índices
+ferramenta → usuários e usuário → ferramentas). Falha (código de saída 1) se alguma operação ficar mais de
+--max-ratio vezes mais lenta na maior etapa do que na menor. A listagem
+completa (sem paginação) aparece só como referência.
+
+Uso: python tools/bench_vault_scale.py [--users 100000] [--steps 3] [--max-ratio 3]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from cryptography.fernet import Fernet
+
+from backend.credential_store import CredentialStore, SYSTEM_USER
+
+PAGE_SIZE = 50
+FILL_CHUNK = 5000
+
+
+def user_id(i: int) -> str:
+    return f"user-{i:07d}"
+
+
+def fill(store: CredentialStore, start: int, end: int):
+    """Cria usuários [start, end): todos com Google Calendar, 1 em 10 também com Slack"""
+    for chunk_start in range(start, end, FILL_CHUNK):
+        records = []
+        for i in range(chunk_start, min(end, chunk_start + FILL_CHUNK)):
+            records.append((user_id(i), "google_calendar", "user_oauth", {
+                "token": f"token-{i}",
+                "refresh_token": f"refresh-{i}",
+                "expiry": None
+            }))
+            if i % 10 == 0:
+                records.append((user_id(i), "slack", "user_oauth", {"token": f"xoxp-{i}"}))
+        store.put_many(records)
+
+
+def measure(fn, iterations: int, repeats: int = 3) -> float:
+    """Melhor média (µs por chamada) entre as repetições"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for i in range(iterations):
+            fn(i)
+        best = min(best, (time.perf_counter() - start) / iterations)
+    return best * 1e6
+
+
+def operations(users: int, rng: random.Random):
+    """(nome, função, iterações, verificada) para um cofre com `users` usuários"""
+    picks = [rng.randrange(users) for _ in range(1000)]
+
+    def pick(i: int) -> str:
+        return user_id(picks[i % len(picks)])
+
+    return [
+        ("get (credencial)", lambda i, s: s.get(pick(i), "google_calendar"), 500, True),
+        ("tools_generation", lambda i, s: s.tools_generation(), 500, True),
+        ("list_tools (1ª página)", lambda i, s: s.list_tools(limit=PAGE_SIZE), 100, True),
+        ("list_tools (cursor no meio)", lambda i, s: s.list_tools(cursor=pick(i), limit=PAGE_SIZE), 100, True),
+        ("list_tools (tool=slack)", lambda i, s: s.list_tools(cursor=pick(i), limit=PAGE_SIZE, tool="slack"), 100, True),
+        ("list_tools (user_prefix)", lambda i, s: s.list_tools(limit=PAGE_SIZE, user_prefix=pick(i)[:-1]), 100, True),
+        ("list_tools completa (referência)", lambda i, s: s.list_tools(), 1, False),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Escala do cofre com muitos usuários")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--steps", type=int, default=3, help="etapas (cada uma 10x maior que a anterior)")
+    parser.add_argument("--max-ratio", type=float, default=3.0)
+    args = parser.parse_args()
+
+    sizes = [max(1, args.users // 10 ** k) for k in reversed(range(max(1, args.steps)))]
+    results = {}
+
+    with tempfile.TemporaryDirectory(prefix="vault-scale-") as workdir:
+        store = CredentialStore(os.path.join(workdir, "vault.db"), Fernet(Fernet.generate_key()))
+        store.put_many([(SYSTEM_USER, "slack", "system_static", {"token": "xoxb-sistema"})])
+        filled = 0
+        try:
+            for size in sizes:
+                start = time.perf_counter()
+                fill(store, filled, size)
+                filled = size
+                print(f"{size:>9,} usuários (preenchimento: {time.perf_counter() - start:.1f} s)")
+                rng = random.Random(size)
+                for name, fn, iterations, _ in operations(size, rng):
+                    results.setdefault(name, {})[size] = measure(lambda i: fn(i, store), iterations)
+        finally:
+            store.close()
+
+    header = "".join(f"{size:>12,}" for size in sizes)
+    print(f"\n{'µs por chamada':<34}{header}  {'razão':>7}")
+    failed = False
+    for name, fn, iterations, checked in operations(1, random.Random(0)):
+        timings = results[name]
+        ratio = timings[sizes[-1]] / timings[sizes[0]] if timings[sizes[0]] else 0.0
+        row = "".join(f"{timings[size]:>12,.1f}" for size in sizes)
+        flag = ""
+        if checked and ratio > args.max_ratio:
+            flag = "  ERRO"
+            failed = True
+        print(f"{name:<34}{row}  {ratio:>6.1f}x{flag}")
+
+    if failed:
+        print(f"ERRO: operações cresceram mais de {args.max_ratio:.0f}x com o número de usuários")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
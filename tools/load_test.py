@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Teste de carga offline do pipeline completo (plano → ações → consolidação).
+Roda o app FastAPI real em processo (httpx + ASGITransport, com o lifespan do
+app) contra os stubs locais de tools/stub_services.py, com concorrência
+controlada, e mostra vazão e latências p50/p95/p99 de /api/execute.
+
+O cofre é criado em um diretório temporário (credentials/ real não é
+tocado), com credenciais do Google para --users usuários (o primeiro uso de
+cada um passa pelo endpoint de token) e um token do Slack. Os limites de
+taxa do gateway (global, por ferramenta e por usuário) são desligados, salvo
+com --keep-rate-limits ou se as variáveis RATE_LIMIT_* já estiverem definidas.
+
+Uso: python tools/load_test.py [--requests 500] [--concurrency 32] [--users 50]
+     [--latency gemini=400] [--error-rate calendar=0.02] [--json resultado.json]
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, Any, List
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+
+from stub_services import StubServer, build_profiles, create_stub_app, parse_service_values, service_env
+
+# {n} é o número da requisição; {channel} um canal existente no Slack simulado.
+# O primeiro é resolvido pelo planejador rápido; o segundo vai ao LLM
+DEFAULT_PROMPTS = (
+    "Marque uma reunião amanhã às 10h e avise no canal #{channel} que a reunião foi marcada",
+    "Organize um alinhamento com o time de design sobre o roadmap {n} e conte para o #{channel}",
+)
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Percentil pelo método nearest-rank (valores já ordenados)"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def configure_environment(stub_url: str, keep_rate_limits: bool):
+    """Aponta o backend para os stubs (antes de importar backend.main)"""
+    os.environ.update(service_env(stub_url))
+    os.environ.setdefault("GEMINI_API_KEY", "stub-key")
+    os.environ.setdefault("GOOGLE_CLIENT_ID", "stub-client")
+    os.environ.setdefault("GOOGLE_CLIENT_SECRET", "stub-secret")
+    if not keep_rate_limits:
+        os.environ.setdefault("RATE_LIMIT_GLOBAL", "1000000/1000000")
+        os.environ.setdefault("RATE_LIMIT_USER", "1000000/1000000")
+        os.environ.setdefault("RATE_LIMIT_TOOL_SLACK", "1000000/1000000")
+        os.environ.setdefault("RATE_LIMIT_TOOL_GOOGLE_CALENDAR", "1000000/1000000")
+        os.environ.setdefault("SLACK_POST_PER_MINUTE", "1000000")
+
+
+async def seed_credentials(vault, users: int):
+    for i in range(users):
+        # Sem access_token: a primeira ação de cada usuário renova no endpoint de token
+        vault.store_credentials(
+            tool_name="google_calendar",
+            tool_type="user_oauth",
+            credentials={"token": None, "refresh_token": f"stub-refresh-{i}", "expiry": None},
+            user_id=f"user-{i}"
+        )
+    vault.store_credentials(
+        tool_name="slack",
+        tool_type="system_static",
+        credentials={"token": "xoxb-stub"}
+    )
+    await vault.flush()
+
+
+async def run_load(client: httpx.AsyncClient, args, total: int, offset: int = 0) -> Dict[str, Any]:
+    """Envia total requisições com args.concurrency em paralelo"""
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    action_errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, action_errors
+        while next_index < total:
+            n = offset + next_index
+            next_index += 1
+            prompt = args.prompts[n % len(args.prompts)].format(n=n, channel=f"canal-{n % args.channels}")
+            body = {
+                "prompt": prompt,
+                "user_id": f"user-{n % args.users}",
+                "response_mode": args.response_mode
+            }
+            start = time.perf_counter()
+            try:
+                response = await client.post("/api/execute", json=body)
+                status = str(response.status_code)
+                if response.status_code == 200:
+                    action_errors += sum(
+                        1 for result in response.json().get("details", [])
+                        if result.get("status") != "success"
+                    )
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, args.concurrency))))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "status_codes": statuses,
+        "action_errors": action_errors,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 1),
+            "p95": round(percentile(latencies, 95) * 1000, 1),
+            "p99": round(percentile(latencies, 99) * 1000, 1),
+            "mean": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0,
+            "max": round(latencies[-1] * 1000, 1) if latencies else 0.0
+        }
+    }
+
+
+async def run(args, stub_url: str) -> Dict[str, Any]:
+    # Importado só agora: a configuração do backend é lida na importação
+    import backend.main as gateway
+
+    async with gateway.app.router.lifespan_context(gateway.app):
+        await seed_credentials(gateway.vault, args.users)
+        transport = httpx.ASGITransport(app=gateway.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://gateway", timeout=args.timeout) as client:
+            if args.warmup:
+                await run_load(client, args, args.warmup, offset=args.requests)
+            async with httpx.AsyncClient(base_url=stub_url) as stubs:
+                before = (await stubs.get("/_stats")).json()
+                result = await run_load(client, args, args.requests)
+                after = (await stubs.get("/_stats")).json()
+
+    result["upstream_calls"] = {
+        name: {
+            "calls": after[name]["calls"] - before[name]["calls"],
+            "errors": after[name]["errors"] - before[name]["errors"]
+        }
+        for name in after
+    }
+    return result
+
+
+def print_report(result: Dict[str, Any], args):
+    latency = result["latency_ms"]
+    print(f"Requisições:   {result['requests']} (concorrência {args.concurrency}, {args.users} usuários)")
+    print(f"Duração:       {result['elapsed_s']:.2f} s")
+    print(f"Vazão:         {result['throughput_rps']:.1f} req/s")
+    print(f"Latência (ms): p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']}  "
+          f"média {latency['mean']}  máx {latency['max']}")
+    print(f"Status HTTP:   {', '.join(f'{code}: {count}' for code, count in sorted(result['status_codes'].items()))}")
+    print(f"Ações com erro: {result['action_errors']}")
+    print("Chamadas aos stubs:")
+    for name, calls in result["upstream_calls"].items():
+        print(f"  {name:<10} {calls['calls']:6d} chamadas, {calls['errors']} com erro")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga offline de /api/execute")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--warmup", type=int, default=20, help="requisições antes da medição (não contadas)")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--channels", type=int, default=200, help="canais no Slack simulado")
+    parser.add_argument("--prompt", action="append", dest="prompts", help="comando (aceita {n} e {channel}); repetível")
+    parser.add_argument("--response-mode", choices=["template", "llm", "none"], default="template")
+    parser.add_argument("--latency", action="append", metavar="SERVIÇO=MS", help="latência média por serviço")
+    parser.add_argument("--error-rate", action="append", metavar="SERVIÇO=FRAÇÃO", help="fração de chamadas com erro")
+    parser.add_argument("--jitter", type=float, default=0.2, help="variação relativa da latência dos stubs")
+    parser.add_argument("--token-ttl", type=int, default=3600, help="validade dos tokens emitidos pelo stub")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--keep-rate-limits", action="store_true", help="mantém os limites de taxa do gateway")
+    parser.add_argument("--json", metavar="ARQUIVO", help="grava o resultado em JSON (para comparar versões)")
+    args = parser.parse_args()
+    args.prompts = args.prompts or list(DEFAULT_PROMPTS)
+
+    profiles = build_profiles(
+        parse_service_values(args.latency, "--latency"),
+        parse_service_values(args.error_rate, "--error-rate"),
+        args.jitter
+    )
+    stubs = StubServer(create_stub_app(profiles, args.channels, args.token_ttl))
+    stubs.start()
+    configure_environment(stubs.url, args.keep_rate_limits)
+
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory(prefix="gateway-load-") as workdir:
+            # O cofre usa caminhos relativos (credentials/)
+            os.chdir(workdir)
+            try:
+                result = asyncio.run(run(args, stubs.url))
+            finally:
+                os.chdir(cwd)
+    finally:
+        stubs.stop()
+
+    result["config"] = {
+        "concurrency": args.concurrency,
+        "users": args.users,
+        "response_mode": args.response_mode,
+        "stubs": {name: {"latency_ms": p.latency_ms, "error_rate": p.error_rate} for name, p in profiles.items()}
+    }
+    print_report(result, args)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
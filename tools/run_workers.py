@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Inicia o backend com vários workers (processos) do uvicorn.
+
+Antes de criar os workers, o processo principal prepara o estado
+compartilhado (chave de criptografia, banco do cofre, migração do formato
+antigo e o banco de jobs/chaves de idempotência), para que os workers não
+disputem essa inicialização. Define também GATEWAY_WORKERS, usado para
+dividir os limites de taxa entre os processos e para ativar o estado
+compartilhado de jobs e idempotência.
+
+Uso: python tools/run_workers.py [--workers N] [--host 0.0.0.0] [--port 8000]
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import uvicorn
+
+
+def prepare_shared_state():
+    """Cria chave e bancos e migra o cofre antigo uma única vez"""
+    from backend.shared_state import SharedStateStore
+    from backend.vault import Vault
+
+    vault = Vault()
+    vault.close()
+    SharedStateStore().close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend com vários workers")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    # Os caminhos do cofre (credentials/) são relativos à raiz do projeto
+    os.chdir(ROOT)
+    prepare_shared_state()
+
+    os.environ["GATEWAY_WORKERS"] = str(args.workers)
+    uvicorn.run("backend.main:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Servidores locais que substituem as APIs externas nos testes de carga.
+Um único app FastAPI responde no lugar de:
+
+- Gemini (REST): POST /v1beta/models/{modelo}:generateContent
+- Google OAuth: POST /token
+- Google Calendar: POST /calendar/v3/calendars/{calendarId}/events (events.insert)
+- Slack: /api/conversations.list e /api/chat.postMessage
+
+Cada serviço tem latência (com variação) e taxa de erro configuráveis. O
+backend é apontado para cá pelas variáveis GEMINI_API_ENDPOINT,
+GOOGLE_TOKEN_URI, GOOGLE_CALENDAR_API_ENDPOINT e SLACK_API_URL (ver
+service_env).
+
+Uso isolado: python tools/stub_services.py [--port 9100] [--latency gemini=400] [--error-rate slack=0.01]
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import socket
+import threading
+import time
+import uuid
+from typing import Dict, Any, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+import uvicorn
+
+SERVICES = ("gemini", "token", "calendar", "slack")
+
+# Latência média (ms) por serviço, próxima da observada nas APIs reais
+DEFAULT_LATENCY_MS = {"gemini": 400.0, "token": 80.0, "calendar": 150.0, "slack": 60.0}
+
+_CHANNEL_RE = re.compile(r"#([\w-]+)")
+
+
+class ServiceProfile:
+    """Latência e taxa de erro de um serviço, com contadores de chamadas"""
+
+    def __init__(self, latency_ms: float, jitter: float = 0.2, error_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.calls = 0
+        self.errors = 0
+
+    async def respond(self) -> bool:
+        """
+        Aguarda a latência simulada
+
+        Returns:
+            True se esta chamada deve falhar
+        """
+        self.calls += 1
+        delay = self.latency_ms * random.uniform(1 - self.jitter, 1 + self.jitter)
+        await asyncio.sleep(max(0.0, delay) / 1000)
+        if random.random() < self.error_rate:
+            self.errors += 1
+            return True
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "latency_ms": self.latency_ms,
+            "error_rate": self.error_rate,
+            "calls": self.calls,
+            "errors": self.errors
+        }
+
+
+def _plan_for(text: str) -> Dict[str, Any]:
+    """Plano fixo (evento + aviso no Slack) usando o canal citado no comando"""
+    channels = _CHANNEL_RE.findall(text)
+    channel = f"#{channels[-1]}" if channels else "#general"
+    start = time.strftime("%Y-%m-%dT10:00:00", time.localtime(time.time() + 86400))
+    end = time.strftime("%Y-%m-%dT11:00:00", time.localtime(time.time() + 86400))
+    return {
+        "actions": [
+            {
+                "tool_name": "google_calendar",
+                "parameters": {"title": "Reunião", "start_time": start, "end_time": end},
+                "depends_on": []
+            },
+            {
+                "tool_name": "slack",
+                "parameters": {"channel": channel, "message": "Reunião marcada para amanhã às 10h"},
+                "depends_on": [0]
+            }
+        ],
+        "reasoning": "Plano gerado pelo servidor local de testes"
+    }
+
+
+def create_stub_app(
+    profiles: Dict[str, ServiceProfile],
+    channels: int = 200,
+    token_ttl: int = 3600
+) -> FastAPI:
+    """
+    Cria o app com os serviços simulados
+
+    Args:
+        profiles: ServiceProfile por serviço (SERVICES)
+        channels: canais existentes no Slack simulado (canal-0 ... canal-N)
+        token_ttl: validade (segundos) dos access_tokens emitidos
+    """
+    app = FastAPI(title="Stubs de APIs externas")
+    slack_channels = [{"id": f"C{i:08d}", "name": f"canal-{i}"} for i in range(channels)]
+    slack_channels.append({"id": "C99999999", "name": "general"})
+    channel_names = {ch["id"]: ch["name"] for ch in slack_channels}
+
+    @app.post("/v1beta/models/{model_action}")
+    async def gemini_generate(model_action: str, request: Request):
+        if not model_action.endswith(":generateContent"):
+            return JSONResponse({"error": {"code": 404, "message": "Método não simulado"}}, status_code=404)
+        body = await request.json()
+        text = " ".join(
+            part.get("text", "")
+            for content in body.get("contents", [])
+            for part in content.get("parts", [])
+        )
+        if await profiles["gemini"].respond():
+            return JSONResponse(
+                {"error": {"code": 503, "message": "The model is overloaded", "status": "UNAVAILABLE"}},
+                status_code=503
+            )
+        if "FERRAMENTAS DISPONÍVEIS" in text:
+            answer = json.dumps(_plan_for(text), ensure_ascii=False)
+        else:
+            answer = "Evento criado e aviso enviado no Slack."
+        return {
+            "candidates": [{
+                "content": {"parts": [{"text": answer}], "role": "model"},
+                "finishReason": "STOP",
+                "index": 0
+            }],
+            "usageMetadata": {"promptTokenCount": len(text) // 4, "candidatesTokenCount": len(answer) // 4}
+        }
+
+    @app.post("/token")
+    async def oauth_token():
+        if await profiles["token"].respond():
+            return JSONResponse({"error": "temporarily_unavailable"}, status_code=503)
+        return {
+            "access_token": f"stub-{uuid.uuid4().hex}",
+            "expires_in": token_ttl,
+            "token_type": "Bearer",
+            "scope": "https://www.googleapis.com/auth/calendar https://www.googleapis.com/auth/calendar.events"
+        }
+
+    @app.post("/calendar/v3/calendars/{calendar_id}/events")
+    async def calendar_insert(calendar_id: str, request: Request):
+        body = await request.json()
+        if await profiles["calendar"].respond():
+            return JSONResponse(
+                {"error": {"code": 503, "message": "Backend Error", "errors": [{"reason": "backendError"}]}},
+                status_code=503
+            )
+        event_id = body.get("id") or uuid.uuid4().hex
+        return {
+            **body,
+            "id": event_id,
+            "status": "confirmed",
+            "htmlLink": f"https://calendar.google.com/calendar/event?eid={event_id}",
+            "organizer": {"email": "stub@example.com", "self": True}
+        }
+
+    async def slack_params(request: Request) -> Dict[str, Any]:
+        # O slack_sdk envia parâmetros na query string, como form ou como JSON
+        params: Dict[str, Any] = dict(request.query_params)
+        content_type = request.headers.get("content-type", "")
+        if "application/json" in content_type:
+            params.update(await request.json())
+        elif "form" in content_type:
+            params.update(dict(await request.form()))
+        return params
+
+    @app.api_route("/api/conversations.list", methods=["GET", "POST"])
+    async def slack_conversations_list(request: Request):
+        params = await slack_params(request)
+        if await profiles["slack"].respond():
+            return {"ok": False, "error": "service_unavailable"}
+        offset = int(params.get("cursor") or 0)
+        limit = int(params.get("limit") or 100)
+        page = slack_channels[offset:offset + limit]
+        next_offset = offset + limit
+        return {
+            "ok": True,
+            "channels": page,
+            "response_metadata": {"next_cursor": str(next_offset) if next_offset < len(slack_channels) else ""}
+        }
+
+    @app.api_route("/api/chat.postMessage", methods=["GET", "POST"])
+    async def slack_post_message(request: Request):
+        params = await slack_params(request)
+        if await profiles["slack"].respond():
+            return {"ok": False, "error": "service_unavailable"}
+        channel = params.get("channel", "")
+        if channel not in channel_names:
+            return {"ok": False, "error": "channel_not_found"}
+        ts = f"{time.time():.6f}"
+        return {
+            "ok": True,
+            "channel": channel,
+            "ts": ts,
+            "message": {"type": "message", "text": params.get("text", ""), "ts": ts}
+        }
+
+    @app.get("/_stats")
+    async def stats():
+        return {name: profile.stats() for name, profile in profiles.items()}
+
+    return app
+
+
+def build_profiles(
+    latencies: Dict[str, float] = None,
+    error_rates: Dict[str, float] = None,
+    jitter: float = 0.2
+) -> Dict[str, ServiceProfile]:
+    latencies = {**DEFAULT_LATENCY_MS, **(latencies or {})}
+    error_rates = error_rates or {}
+    return {
+        name: ServiceProfile(latencies[name], jitter, error_rates.get(name, 0.0))
+        for name in SERVICES
+    }
+
+
+def parse_service_values(values: List[str], option: str) -> Dict[str, float]:
+    """Converte ["gemini=300", "slack=50"] em {"gemini": 300.0, "slack": 50.0}"""
+    parsed = {}
+    for value in values or []:
+        name, _, number = value.partition("=")
+        if name not in SERVICES or not number:
+            raise SystemExit(f"{option}: use SERVIÇO=VALOR com SERVIÇO em {', '.join(SERVICES)}")
+        parsed[name] = float(number)
+    return parsed
+
+
+class StubServer:
+    """Roda o app dos stubs com uvicorn em uma thread (porta livre escolhida pelo sistema)"""
+
+    def __init__(self, app: FastAPI, host: str = "127.0.0.1", port: int = 0):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind((host, port))
+        self.host, self.port = self.socket.getsockname()
+        self.server = uvicorn.Server(uvicorn.Config(app, log_level="warning", access_log=False))
+        self._thread = threading.Thread(
+            target=self.server.run,
+            kwargs={"sockets": [self.socket]},
+            name="stub-services",
+            daemon=True
+        )
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self, timeout: float = 10):
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError("Servidor de stubs não iniciou")
+            time.sleep(0.01)
+
+    def stop(self):
+        self.server.should_exit = True
+        self._thread.join(timeout=10)
+
+
+def service_env(url: str) -> Dict[str, str]:
+    """Variáveis de ambiente que apontam o backend para os stubs em url"""
+    return {
+        "GEMINI_API_ENDPOINT": url,
+        "GOOGLE_TOKEN_URI": f"{url}/token",
+        "GOOGLE_CALENDAR_API_ENDPOINT": f"{url}/calendar/v3/",
+        "SLACK_API_URL": f"{url}/api/"
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stubs locais de Gemini, Google e Slack")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", action="append", metavar="SERVIÇO=MS", help="latência média por serviço")
+    parser.add_argument("--error-rate", action="append", metavar="SERVIÇO=FRAÇÃO", help="fração de chamadas com erro")
+    parser.add_argument("--jitter", type=float, default=0.2, help="variação relativa da latência")
+    parser.add_argument("--channels", type=int, default=200)
+    parser.add_argument("--token-ttl", type=int, default=3600)
+    args = parser.parse_args()
+
+    profiles = build_profiles(
+        parse_service_values(args.latency, "--latency"),
+        parse_service_values(args.error_rate, "--error-rate"),
+        args.jitter
+    )
+    app = create_stub_app(profiles, args.channels, args.token_ttl)
+    url = f"http://{args.host}:{args.port}"
+    print("Aponte o backend para os stubs com:")
+    for name, value in service_env(url).items():
+        print(f"  export {name}={value}")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()